@@ -2,6 +2,8 @@ import requests
 import pandas as pd
 from datetime import datetime, timedelta
 
+from delta_publisher import DeltaPublisher
+
 def get_actual_disasters():
     """Focus on REAL disasters happening RIGHT NOW that emergency managers care about"""
     
@@ -122,6 +124,9 @@ def generate_emergency_report():
     """Generate actionable emergency management report"""
     disasters = get_actual_disasters()
     
+    # Dashboards poll feed/manifest.json and only download what changed
+    DeltaPublisher().publish(disasters)
+    
     if not disasters:
         print("✅ No major disasters currently active")
         return
@@ -1,27 +1,46 @@
+import os
 import pandas as pd
 import folium
 from folium import plugins
 import numpy as np
 from risk_engine import DisasterRiskEngine
+from geojson_layers import PopupShards, point_layer
+from cluster_tiles import ClusterIndex, ClusterTileLayer
+from grid_aggregate import GridHeatMap, aggregate_bands
+from event_index import ensure_event_ids
+from incidents import incident_zones
+from instrumentation import stage
 
-def create_professional_map(csv_file="combined_disaster_feed.csv", output_file="professional_map.html"):
+def create_professional_map(csv_file="combined_disaster_feed.csv", output_file="professional_map.html",
+                            df=None, layer_cache=None, popup_shards=None, cube=None, incidents=None):
     """
-    Create a professional disaster intelligence map with advanced features
+    Create a professional disaster intelligence map with advanced features.
+    Overlapping footprints are drawn as incident zones (pass `incidents` from
+    incidents.incident_zones to reuse them; df then needs incident_id).
     """
-    # Load and enrich data
-    df = pd.read_csv(csv_file)
-    df = DisasterRiskEngine.enrich_disaster_data(df)
+    # Load and enrich data (unless an enriched snapshot was passed in)
+    if df is None:
+        df = pd.read_csv(csv_file)
+    if 'threat_score' not in df.columns:
+        with stage("enrich", "risk") as span:
+            df = DisasterRiskEngine.enrich_disaster_data(df)
+            span.rows_in = span.rows_out = len(df)
     df = df.dropna(subset=["lat", "lon"])
     
     if df.empty:
         print("⚠️ No valid data found")
         return
+    if incidents is None:
+        with stage("correlate", "incidents") as span:
+            df, incidents = incident_zones(df)
+            span.rows_in, span.rows_out = len(df), len(incidents)
     
     # Create base map with satellite and street views
     m = folium.Map(
         location=[38, -97], 
         zoom_start=5,
-        tiles=None
+        tiles=None,
+        prefer_canvas=True
     )
     
     # Add multiple tile layers
@@ -42,93 +61,113 @@ def create_professional_map(csv_file="combined_disaster_feed.csv", output_file="
         'EXTREME': '#dc3545'   # Red
     }
     
-    # Size based on threat score
-    def get_marker_size(threat_score):
-        if threat_score >= 70:
-            return 12
-        elif threat_score >= 50:
-            return 9
-        elif threat_score >= 30:
-            return 7
-        else:
-            return 5
-    
-    # Create feature groups by risk level
-    groups = {}
-    for risk in ['LOW', 'MODERATE', 'HIGH', 'EXTREME']:
-        groups[risk] = folium.FeatureGroup(name=f"{risk} Risk Events")
+    # Size based on threat score (resolved per marker in the browser)
+    marker_style = {
+        "radius": {"field": "threat_score", "breaks": [[70, 12], [50, 9], [30, 7]], "default": 5},
+        "color": "white",
+        "weight": 2,
+        "fill": True,
+        "fillColor": {"field": "risk_level", "map": risk_colors, "default": "#6c757d"},
+        "fillOpacity": 0.8,
+    }
     
-    # Add markers with enhanced popups
-    for _, row in df.iterrows():
-        risk = row.get('risk_level', 'LOW')
-        color = risk_colors.get(risk, '#6c757d')
-        
-        # Enhanced popup with professional styling
-        popup_html = f"""
-        <div style="font-family: Arial, sans-serif; width: 300px;">
-            <h4 style="margin: 0; color: {color}; border-bottom: 2px solid {color}; padding-bottom: 5px;">
-                🚨 {row.get('source', 'Unknown')} Alert
-            </h4>
-            <table style="width: 100%; margin-top: 10px; font-size: 12px;">
-                <tr><td><b>Event:</b></td><td>{row.get('event', 'N/A')}</td></tr>
-                <tr><td><b>Risk Level:</b></td><td><span style="color: {color}; font-weight: bold;">{risk}</span></td></tr>
-                <tr><td><b>Threat Score:</b></td><td>{row.get('threat_score', 0)}/100</td></tr>
-                <tr><td><b>Impact Radius:</b></td><td>{row.get('impact_radius_km', 0):.1f} km</td></tr>
-        """
-        
-        # Add source-specific data
-        if row.get('source') == 'USGS':
-            popup_html += f"<tr><td><b>Magnitude:</b></td><td>{row.get('magnitude', 'N/A')}</td></tr>"
-            popup_html += f"<tr><td><b>Location:</b></td><td>{row.get('place', 'N/A')}</td></tr>"
-        elif row.get('source') == 'NOAA':
-            popup_html += f"<tr><td><b>Severity:</b></td><td>{row.get('severity', 'N/A')}</td></tr>"
-            popup_html += f"<tr><td><b>Area:</b></td><td>{row.get('area', 'N/A')}</td></tr>"
-        elif row.get('source') == 'NASA-FIRMS':
-            popup_html += f"<tr><td><b>Confidence:</b></td><td>{row.get('confidence', 'N/A')}%</td></tr>"
-            popup_html += f"<tr><td><b>Brightness:</b></td><td>{row.get('brightness', 'N/A')}K</td></tr>"
-        
-        popup_html += f"""
-                <tr><td><b>Urgency:</b></td><td>{row.get('urgency', 'N/A')}</td></tr>
-                <tr><td><b>Coordinates:</b></td><td>{row['lat']:.3f}, {row['lon']:.3f}</td></tr>
-            </table>
-        </div>
-        """
-        
-        # Create marker with impact radius circle
-        marker = folium.CircleMarker(
-            location=[row["lat"], row["lon"]],
-            radius=get_marker_size(row.get('threat_score', 0)),
-            color='white',
-            weight=2,
-            fill=True,
-            fillColor=color,
-            fillOpacity=0.8,
-            popup=folium.Popup(popup_html, max_width=320)
-        )
+    # Impact radius circle (meters) for high-risk events
+    impact_style = {
+        "kind": "circle",
+        "radius": {"field": "impact_radius_km", "scale": 1000, "default": 10000},
+        "color": {"field": "risk_level", "map": risk_colors, "default": "#6c757d"},
+        "weight": 1,
+        "fill": True,
+        "fillOpacity": 0.1,
+    }
+    
+    # Enhanced popup with professional styling, built on click
+    popup = {
+        "wrapper": '<div style="font-family: Arial, sans-serif; width: 300px;">{body}</div>',
+        "title": """<h4 style="margin: 0; color: {_color}; border-bottom: 2px solid {_color}; padding-bottom: 5px;">
+                🚨 {source} Alert
+            </h4>""",
+        "table": True,
+        "skip_missing": True,
+        "max_width": 320,
+        "rows": [
+            ["Event", "event"],
+            ["Risk Level", "risk_level"],
+            ["Threat Score", "threat_score", {"suffix": "/100"}],
+            ["Impact Radius", "impact_radius_km", {"digits": 1, "suffix": " km"}],
+            # Source-specific data (only present on that source's rows)
+            ["Magnitude", "magnitude"],
+            ["Location", "place"],
+            ["Severity", "severity"],
+            ["Area", "area"],
+            ["Confidence", "confidence", {"suffix": "%"}],
+            ["Brightness", "brightness", {"suffix": "K"}],
+            ["Urgency", "urgency"],
+            ["Incident", "incident_id"],
+            ["Coordinates", "_coords"],
+        ],
+    }
+    
+    # Popup details are written to JSON shards next to the HTML and fetched on click
+    shards = popup_shards or PopupShards(os.path.splitext(output_file)[0] + "_popups")
+
+    # One feature group per risk level, each holding two GeoJSON layers
+    for risk in ['LOW', 'MODERATE', 'HIGH', 'EXTREME']:
+        group = folium.FeatureGroup(name=f"{risk} Risk Events")
+        risk_df = df[df['risk_level'] == risk]
         
-        # Add impact radius circle for high-risk events
-        if row.get('threat_score', 0) >= 50:
-            folium.Circle(
-                location=[row["lat"], row["lon"]],
-                radius=row.get('impact_radius_km', 10) * 1000,  # Convert to meters
-                color=color,
-                weight=1,
-                fill=True,
-                fillOpacity=0.1
-            ).add_to(groups[risk])
+        high_threat = risk_df[risk_df['threat_score'] >= 50]
+        if not high_threat.empty:
+            point_layer(high_threat, impact_style, control=False,
+                        cache=layer_cache, cache_key=f"risk={risk}&threat>=50").add_to(group)
+        point_layer(risk_df, marker_style, popup, control=False,
+                    cache=layer_cache, cache_key=f"risk={risk}", shards=shards).add_to(group)
         
-        marker.add_to(groups[risk])
+        group.add_to(m)
     
-    # Add all groups to map
-    for group in groups.values():
+    # Incident zones: footprints that overlap, drawn together in the worst member's color
+    zones = incidents[incidents['events'] > 1]
+    if not zones.empty:
+        group = folium.FeatureGroup(name=f"Incident Zones ({len(zones)})")
+        zone_risk = zones.set_index('incident_id')['risk_level']
+        members = df[df['incident_id'].isin(zone_risk.index)].assign(
+            incident_risk=lambda d: d['incident_id'].map(zone_risk))
+        footprint_style = dict(impact_style, weight=2, fillOpacity=0.15,
+                               color={"field": "incident_risk", "map": risk_colors, "default": "#6c757d"})
+        point_layer(members, footprint_style, control=False).add_to(group)
+        zone_style = {
+            "radius": {"field": "events", "breaks": [[20, 16], [5, 12]], "default": 9},
+            "color": "#212529",
+            "weight": 2,
+            "fill": True,
+            "fillColor": {"field": "risk_level", "map": risk_colors, "default": "#6c757d"},
+            "fillOpacity": 0.9,
+        }
+        zone_popup = {
+            "wrapper": '<div style="font-family: Arial, sans-serif; width: 280px;">{body}</div>',
+            "title": '<h4 style="margin: 0; color: {_color};">🧯 Incident {incident_id}</h4>',
+            "table": True,
+            "skip_missing": True,
+            "max_width": 300,
+            "rows": [
+                ["Events", "events"],
+                ["Sources", "sources"],
+                ["Types", "event_types"],
+                ["Risk Level", "risk_level"],
+                ["Worst Threat", "threat_score", {"suffix": "/100"}],
+                ["Total Threat", "threat_total"],
+                ["Area", "area_km2", {"digits": 0, "suffix": " km²"}],
+            ],
+        }
+        point_layer(zones, zone_style, zone_popup, control=False).add_to(group)
         group.add_to(m)
     
-    # Add heat map layer for threat density
-    heat_data = [[row['lat'], row['lon'], row.get('threat_score', 10)/10] 
-                 for _, row in df.iterrows()]
+    # Add heat map layer for threat density (threat summed per hex cell, per zoom band)
+    heat_bands = aggregate_bands(df, 'threat_score', scale=0.1)
     
-    heat_map = plugins.HeatMap(
-        heat_data,
+    heat_map = GridHeatMap(
+        heat_bands,
+        initial_zoom=5,
         name='Threat Density Heat Map',
         radius=25,
         blur=15,
@@ -136,12 +175,23 @@ def create_professional_map(csv_file="combined_disaster_feed.csv", output_file="
     )
     heat_map.add_to(m)
     
-    # Add marker clustering for better performance
-    marker_cluster = plugins.MarkerCluster(name='Clustered View').add_to(m)
+    # Server-side clustering: per-zoom tiles next to the HTML, loaded by viewport
+    tiles_dir = os.path.splitext(output_file)[0] + "_tiles"
+    tile_count = ClusterIndex().load(ensure_event_ids(df)).write_tiles(tiles_dir)
+    ClusterTileLayer(os.path.basename(tiles_dir), name='Clustered View', show=False).add_to(m)
     
     # Professional header with real-time stats
-    high_risk_count = len(df[df['risk_level'].isin(['HIGH', 'EXTREME'])])
-    avg_threat = df['threat_score'].mean()
+    # RenderPipeline passes its shared cube; a standalone run just reads the columns
+    if cube is not None:
+        total = len(cube)
+        high_risk_count = cube.count(risk_level=['HIGH', 'EXTREME'])
+        avg_threat = cube.mean_threat()
+        immediate_count = cube.count(urgency='IMMEDIATE')
+    else:
+        total = len(df)
+        high_risk_count = int(df['risk_level'].isin(['HIGH', 'EXTREME']).sum())
+        avg_threat = df['threat_score'].mean()
+        immediate_count = int((df['urgency'] == 'IMMEDIATE').sum())
     
     header_html = f"""
     <div style="position: fixed; top: 10px; left: 10px; right: 10px; z-index:9999; 
@@ -156,7 +206,7 @@ def create_professional_map(csv_file="combined_disaster_feed.csv", output_file="
                 </p>
             </div>
             <div style="text-align: right;">
-                <div style="font-size: 24px; font-weight: bold; color: #ffeb3b;">{len(df)}</div>
+                <div style="font-size: 24px; font-weight: bold; color: #ffeb3b;">{total}</div>
                 <div style="font-size: 11px;">Active Events</div>
             </div>
         </div>
@@ -170,9 +220,13 @@ def create_professional_map(csv_file="combined_disaster_feed.csv", output_file="
                 <div style="font-size: 10px;">Avg Threat</div>
             </div>
             <div style="text-align: center;">
-                <div style="font-size: 20px; font-weight: bold; color: #4caf50;">{len(df[df['urgency'] == 'IMMEDIATE'])}</div>
+                <div style="font-size: 20px; font-weight: bold; color: #4caf50;">{immediate_count}</div>
                 <div style="font-size: 10px;">Immediate</div>
             </div>
+            <div style="text-align: center;">
+                <div style="font-size: 20px; font-weight: bold; color: #80deea;">{len(incidents)}</div>
+                <div style="font-size: 10px;">Incidents</div>
+            </div>
         </div>
     </div>
     """
@@ -193,7 +247,8 @@ def create_professional_map(csv_file="combined_disaster_feed.csv", output_file="
         <hr style="margin: 10px 0;">
         <div style="font-size: 10px; color: #666;">
             Circle size = Threat score<br>
-            Impact radius shown for high-risk events
+            Impact radius shown for high-risk events<br>
+            Incident zones join overlapping footprints
         </div>
     </div>
     """
@@ -211,9 +266,14 @@ def create_professional_map(csv_file="combined_disaster_feed.csv", output_file="
     plugins.Fullscreen().add_to(m)
     
     # Save map
-    m.save(output_file)
+    with stage("render", "save", map="professional_map") as span:
+        m.save(output_file)
+        if popup_shards is None:
+            shards.write()
+        span.rows_in, span.bytes_out = len(df), os.path.getsize(output_file)
     print(f"🗺️ Professional disaster map saved to {output_file}")
-    print(f"📊 Analyzed {len(df)} events with {high_risk_count} high-risk situations")
+    print(f"📊 Analyzed {len(df)} events in {len(incidents)} incidents with {high_risk_count} high-risk situations")
+    print(f"🧩 {tile_count} cluster tiles written to {tiles_dir}/")
 
 if __name__ == "__main__":
     create_professional_map()
\ No newline at end of file
@@ -0,0 +1,179 @@
+import math
+from datetime import datetime
+
+import pandas as pd
+
+from event_index import ensure_event_ids, event_id
+
+# Cube axes; 'hour' is the event time floored to the hour
+CUBE_DIMENSIONS = ('source', 'event', 'severity', 'risk_level', 'urgency', 'hour')
+
+
+def _value(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+
+def _hour(value):
+    if hasattr(value, 'strftime'):
+        return None if pd.isna(value) else value.strftime('%Y-%m-%dT%H')
+    try:
+        return datetime.fromisoformat(str(value)).strftime('%Y-%m-%dT%H')
+    except ValueError:
+        stamp = pd.to_datetime(value, errors='coerce')
+        return None if pd.isna(stamp) else stamp.strftime('%Y-%m-%dT%H')
+
+
+def hour_bucket(event):
+    """Event time (USGS `time` or FIRMS `acq_datetime`) floored to the hour, as 'YYYY-MM-DDTHH'"""
+    for field in ('time', 'acq_datetime'):
+        value = _value(event.get(field))
+        if value is None:
+            continue
+        hour = _hour(value)
+        if hour is not None:
+            return hour
+    return None
+
+
+def hour_buckets(df):
+    """hour_bucket for every row of a frame, parsed once per column"""
+    hours = pd.Series(None, index=df.index, dtype=object)
+    for field in ('time', 'acq_datetime'):
+        if field not in df.columns:
+            continue
+        try:
+            stamps = pd.to_datetime(df[field], errors='coerce')
+            column = stamps.dt.floor('h').dt.strftime('%Y-%m-%dT%H')
+            column = column.astype(object).where(stamps.notna(), None)
+        except (ValueError, TypeError):     # mixed time zones etc.: parse row by row
+            column = df[field].map(lambda v: None if _value(v) is None else _hour(v))
+        hours = hours.where(hours.notna(), column)
+    return hours
+
+
+def _column(df, dim):
+    """A cube axis as a list, missing values as None"""
+    if dim not in df.columns:
+        return [None] * len(df)
+    values = df[dim].astype(object)
+    return values.where(values.notna(), None).tolist()
+
+
+class AggregateCube:
+    """
+    Event counts and threat sums per (source, event, severity, risk_level,
+    urgency, hour) cell, maintained incrementally as events are added and
+    expired. Per-dimension marginals are kept alongside the cells so the
+    usual header counters (per source, per risk level, ...) are O(1).
+    """
+
+    def __init__(self, dims=CUBE_DIMENSIONS):
+        self.dims = tuple(dims)
+        self.cells = {}         # key tuple -> [count, threat_sum]
+        self.marginals = {dim: {} for dim in self.dims}   # dim -> value -> [count, threat_sum]
+        self.total = [0, 0.0]
+        self._members = {}      # event_id -> (key, threat)
+
+    def __len__(self):
+        return self.total[0]
+
+    def __contains__(self, eid):
+        return eid in self._members
+
+    def _key(self, event):
+        return tuple(hour_bucket(event) if dim == 'hour' else _value(event.get(dim)) for dim in self.dims)
+
+    def _bump(self, key, threat, sign):
+        for bucket in [self.cells.setdefault(key, [0, 0.0]), self.total] + \
+                [self.marginals[dim].setdefault(value, [0, 0.0]) for dim, value in zip(self.dims, key)]:
+            bucket[0] += sign
+            bucket[1] += sign * threat
+        if self.cells[key][0] == 0:
+            del self.cells[key]
+        for dim, value in zip(self.dims, key):
+            if self.marginals[dim][value][0] == 0:
+                del self.marginals[dim][value]
+
+    def add(self, event):
+        """Add (or re-add, replacing the old cell) one event dict; returns its ID"""
+        eid = event.get('event_id') or event_id(event)
+        return self._place(eid, self._key(event), float(_value(event.get('threat_score')) or 0.0))
+
+    def _place(self, eid, key, threat):
+        old = self._members.get(eid)
+        if old == (key, threat):
+            return eid
+        if old is not None:
+            self._bump(*old, -1)
+        self._members[eid] = (key, threat)
+        self._bump(key, threat, 1)
+        return eid
+
+    def expire(self, eid):
+        """Remove one event; returns True if it was present"""
+        old = self._members.pop(eid, None)
+        if old is None:
+            return False
+        self._bump(*old, -1)
+        return True
+
+    def sync(self, df):
+        """Make the cube match a snapshot: add/update its rows, expire anything missing"""
+        df = ensure_event_ids(df)
+        # Keys are built column-wise; rows whose ID and cell are unchanged are no-ops
+        columns = [hour_buckets(df).tolist() if dim == 'hour' else _column(df, dim) for dim in self.dims]
+        threats = (pd.to_numeric(df['threat_score'], errors='coerce').fillna(0.0).astype(float).tolist()
+                   if 'threat_score' in df.columns else [0.0] * len(df))
+        seen = set()
+        for eid, threat, *key in zip(df['event_id'].tolist(), threats, *columns):
+            seen.add(self._place(eid, tuple(key), threat))
+        for eid in [eid for eid in self._members if eid not in seen]:
+            self.expire(eid)
+        return self
+
+    @classmethod
+    def from_frame(cls, df, dims=CUBE_DIMENSIONS):
+        return cls(dims).sync(df)
+
+    def _select(self, filters):
+        """Cells matching {dim: value or list of values}"""
+        wanted = {self.dims.index(dim): (set(v) if isinstance(v, (list, tuple, set)) else {v})
+                  for dim, v in filters.items()}
+        for key, bucket in self.cells.items():
+            if all(key[i] in values for i, values in wanted.items()):
+                yield key, bucket
+
+    def _sum(self, filters):
+        if not filters:
+            return self.total
+        if len(filters) == 1:
+            (dim, value), = filters.items()
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            marginal = self.marginals[dim]
+            buckets = [marginal[v] for v in values if v in marginal]
+        else:
+            buckets = [bucket for _, bucket in self._select(filters)]
+        return [sum(b[0] for b in buckets), sum(b[1] for b in buckets)]
+
+    def count(self, **filters):
+        """Events matching the filters, e.g. count(source='NOAA', risk_level=['HIGH', 'EXTREME'])"""
+        return self._sum(filters)[0]
+
+    def threat_sum(self, **filters):
+        return self._sum(filters)[1]
+
+    def mean_threat(self, **filters):
+        count, total = self._sum(filters)
+        return total / count if count else float('nan')
+
+    def counts_by(self, dim, **filters):
+        """{value: count} along one dimension"""
+        if not filters:
+            return {value: bucket[0] for value, bucket in self.marginals[dim].items()}
+        i = self.dims.index(dim)
+        counts = {}
+        for key, bucket in self._select(filters):
+            counts[key[i]] = counts.get(key[i], 0) + bucket[0]
+        return counts
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Headless benchmark for the map generators.
+
+Builds synthetic disaster feeds of increasing size, renders each map
+generator from them, then serves the output directory over a local
+http.server (popup shards and cluster tiles are fetch()ed, which file://
+pages can't do), opens every HTML file in headless Chromium and records
+generation time, HTML bytes, DOM nodes, Leaflet marker count, time to
+first render and JS heap. Results go to a JSON
+file so runs on different commits can be diffed.
+
+    python benchmark_maps.py --sizes 500 2000 10000 --out benchmark_results.json
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from risk_engine import DisasterRiskEngine
+
+DEFAULT_SIZES = (500, 2000, 10000)
+DEFAULT_RESULTS_FILE = "benchmark_results.json"
+
+NOAA_EVENTS = ['Flood Warning', 'Tornado Warning', 'Severe Thunderstorm Warning',
+               'Heat Advisory', 'Winter Storm Warning', 'Flood Advisory']
+SEVERITIES = ['Minor', 'Moderate', 'Severe', 'Extreme']
+STATES = ['CA', 'TX', 'FL', 'NY', 'CO', 'OK', 'LA', 'WA', 'AZ', 'NC']
+
+
+def synthetic_feed(n, seed=0):
+    """A combined-feed-shaped DataFrame with n events spread over the US (NOAA/USGS/FIRMS mix)"""
+    rng = np.random.default_rng(seed)
+    source = rng.choice(['NOAA', 'USGS', 'NASA-FIRMS'], size=n, p=[0.2, 0.3, 0.5])
+    df = pd.DataFrame({
+        'source': source,
+        'lat': rng.uniform(25, 49, n),
+        'lon': rng.uniform(-124, -67, n),
+    })
+    noaa, usgs, fire = source == 'NOAA', source == 'USGS', source == 'NASA-FIRMS'
+
+    df['event'] = np.where(noaa, rng.choice(NOAA_EVENTS, n), np.where(usgs, 'Earthquake', 'Wildfire'))
+    df['severity'] = np.where(noaa, rng.choice(SEVERITIES, n), None)
+    df['area'] = np.where(noaa, [f"County {i % 300}, {STATES[i % len(STATES)]}" for i in range(n)], None)
+    df['headline'] = np.where(noaa, df['event'].astype(str) + " issued by NWS", None)
+
+    df['magnitude'] = np.where(usgs, np.round(rng.gamma(2.0, 1.0, n), 1), np.nan)
+    df['place'] = np.where(usgs, [f"{i % 50} km N of Town {i % 97}, {STATES[i % len(STATES)]}" for i in range(n)], None)
+    now = pd.Timestamp.now().floor('s')
+    df['time'] = np.where(usgs, (now - pd.to_timedelta(rng.integers(0, 86400, n), unit='s')).astype(str), None)
+
+    df['acq_datetime'] = np.where(fire, (now - pd.Timedelta(hours=6)).strftime('%Y-%m-%d %H:%M:%S'), None)
+    df['brightness'] = np.where(fire, np.round(rng.uniform(300, 400, n), 1), np.nan)
+    df['confidence'] = np.where(fire, rng.integers(0, 100, n), np.nan)
+    df['frp'] = np.where(fire, np.round(rng.exponential(50, n), 1), np.nan)
+    return df
+
+
+def _generators():
+    # Imported here so synthetic_feed() is usable without the map stack
+    from make_map import make_map
+    from clean_map import make_clean_map
+    from advanced_map import create_professional_map
+    from intelligence_dashboard import create_intelligence_dashboard
+
+    empty = pd.DataFrame()
+    return {
+        'disaster_map': lambda df, out: make_map(output_file=out, df=df),
+        'clean_map': lambda df, out: make_clean_map(output_file=out, df=df),
+        'professional_map': lambda df, out: create_professional_map(output_file=out, df=df),
+        'intelligence_dashboard': lambda df, out: create_intelligence_dashboard(
+            output_file=out, disasters=df, news_data=empty, correlations=empty),
+    }
+
+
+# Runs in the page: finds the folium map object and counts vector markers
+MEASURE_JS = """
+() => new Promise(resolve => requestAnimationFrame(() => {
+    var markers = 0, maps = 0;
+    for (var key in window) {
+        var obj;
+        try { obj = window[key]; } catch (e) { continue; }
+        if (obj instanceof L.Map) {
+            maps++;
+            obj.eachLayer(function(layer) {
+                if (layer instanceof L.CircleMarker || layer instanceof L.Marker) markers++;
+            });
+        }
+    }
+    resolve({
+        first_render_ms: performance.now(),
+        dom_nodes: document.getElementsByTagName('*').length,
+        markers: markers,
+        maps: maps,
+    });
+}))
+"""
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve_directory(root):
+    """Serve `root` over HTTP on a free local port; yields the base URL"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(_QuietHandler, directory=root))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+async def measure_pages(paths, timeout_ms=60000):
+    """
+    Serve the pages' directory over HTTP, open each one in headless
+    Chromium and collect page metrics
+    """
+    from playwright.async_api import async_playwright
+
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+    results = {}
+    with serve_directory(root) as base_url:
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True)
+            for path in paths:
+                page = await browser.new_page(viewport={"width": 1920, "height": 1080})
+                # Basemap tiles are blocked so numbers measure our payload, not the tile server
+                await page.route("**/*", lambda route: route.abort()
+                                 if route.request.resource_type == "image"
+                                 and route.request.url.startswith("http")
+                                 and not route.request.url.startswith(base_url)
+                                 else route.continue_())
+                cdp = await page.context.new_cdp_session(page)
+                await cdp.send("Performance.enable")
+                try:
+                    url = base_url + "/" + quote(os.path.relpath(os.path.abspath(path), root).replace(os.sep, "/"))
+                    await page.goto(url, wait_until="load", timeout=timeout_ms)
+                    await page.wait_for_function("window.L && document.querySelector('.leaflet-container')",
+                                                 timeout=timeout_ms)
+                    # Cluster tiles / popup shards are fetched after load
+                    await page.wait_for_load_state("networkidle", timeout=timeout_ms)
+                    metrics = await page.evaluate(MEASURE_JS)
+                    perf = {m['name']: m['value'] for m in (await cdp.send("Performance.getMetrics"))['metrics']}
+                    metrics['js_heap_bytes'] = int(perf.get('JSHeapUsedSize', 0))
+                    metrics['first_render_ms'] = round(metrics['first_render_ms'], 1)
+                except Exception as e:
+                    metrics = {'error': str(e)[:200]}
+                results[path] = metrics
+                await page.close()
+            await browser.close()
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, generators=None, out_file=DEFAULT_RESULTS_FILE,
+                  work_dir=None, browser=True, seed=0):
+    work_dir = work_dir or tempfile.mkdtemp(prefix="map_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    available = _generators()
+    generators = generators or list(available)
+    rows = []
+
+    for n in sizes:
+        df = DisasterRiskEngine.enrich_disaster_data(synthetic_feed(n, seed))
+        for name in generators:
+            out = os.path.join(work_dir, f"{name}_{n}.html")
+            start = time.perf_counter()
+            error = None
+            try:
+                available[name](df, out)
+            except Exception as e:
+                error = str(e)[:200]
+            row = {
+                'generator': name,
+                'events': n,
+                'gen_seconds': round(time.perf_counter() - start, 3),
+                'html_bytes': os.path.getsize(out) if os.path.exists(out) else None,
+                'path': out,
+            }
+            if error:
+                row['error'] = error
+            rows.append(row)
+            if row['html_bytes'] is None:
+                print(f"⚠️ {name} @ {n:,} events: no output after {row['gen_seconds']}s ({error or 'file missing'})")
+            else:
+                print(f"⏱️ {name} @ {n:,} events: {row['gen_seconds']}s, {row['html_bytes']:,} bytes")
+
+    rendered = [row['path'] for row in rows if row['html_bytes'] is not None]
+    if browser and rendered:
+        try:
+            page_metrics = asyncio.run(measure_pages(rendered))
+        except Exception as e:
+            print(f"⚠️ Browser metrics skipped: {str(e).splitlines()[0]}")
+            page_metrics = {}
+        for row in rows:
+            row.update(page_metrics.get(row['path'], {}))
+
+    report = {
+        'commit': _git_commit(),
+        'generated': datetime.now().isoformat(),
+        'sizes': list(sizes),
+        'results': [{k: v for k, v in row.items() if k != 'path'} for row in rows],
+    }
+    with open(out_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Benchmark results saved to {out_file}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark map generators in headless Chromium")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--generators", nargs="+", default=None)
+    parser.add_argument("--out", default=DEFAULT_RESULTS_FILE)
+    parser.add_argument("--work-dir", default=None)
+    parser.add_argument("--no-browser", action="store_true", help="only record generation time and size")
+    args = parser.parse_args()
+    run_benchmark(args.sizes, args.generators, args.out, args.work_dir, browser=not args.no_browser)
@@ -0,0 +1,134 @@
+import math
+import time
+
+
+class RateWindow:
+    """
+    Counts for one key in a ring buffer of fixed-width time buckets, plus an
+    exponentially weighted baseline of the per-bucket rate. Every operation
+    touches at most `n_buckets` slots, so observe() is O(1).
+    """
+
+    def __init__(self, n_buckets, bucket_seconds, baseline_alpha, prior_rate):
+        self.counts = [0] * n_buckets
+        self.bucket_seconds = bucket_seconds
+        self.alpha = baseline_alpha
+        self.baseline = prior_rate        # expected events per bucket
+        self.window_total = 0
+        self.current = None               # absolute index of the newest bucket
+        self.bursting = False
+
+    def advance(self, ts):
+        bucket = int(ts // self.bucket_seconds)
+        if self.current is None:
+            self.current = bucket
+            return
+        steps = bucket - self.current
+        if steps <= 0:
+            return
+
+        n = len(self.counts)
+        # Close the buckets that fall out of the window and fold them into the baseline
+        for step in range(1, min(steps, n) + 1):
+            slot = (self.current + step) % n
+            closed = self.counts[slot]
+            self.window_total -= closed
+            self.counts[slot] = 0
+            self.baseline += self.alpha * (closed - self.baseline)
+        if steps > n:
+            # Idle gap longer than the window: the extra buckets were all empty
+            self.baseline *= (1 - self.alpha) ** (steps - n)
+        self.current = bucket
+
+    def add(self, ts, count=1):
+        self.advance(ts)
+        bucket = int(ts // self.bucket_seconds)
+        if bucket < self.current - len(self.counts) + 1:
+            return  # older than the window
+        self.counts[bucket % len(self.counts)] += count
+        self.window_total += count
+
+    def expected(self, floor_rate):
+        return max(self.baseline, floor_rate) * len(self.counts)
+
+
+class BurstDetector:
+    """
+    Sliding-window spike detection for keyword and location mentions.
+
+    Each key's window count is compared with its baseline under a Poisson
+    model: z = (observed - expected) / sqrt(expected). A key is flagged once
+    when it crosses z_threshold and re-armed when it drops back below.
+    """
+
+    def __init__(self, window_seconds=3600, bucket_seconds=300, baseline_hours=24,
+                 z_threshold=3.0, min_count=5, floor_rate_per_hour=0.5):
+        # The floor keeps sqrt(expected) away from zero for keys never seen before
+        if floor_rate_per_hour <= 0:
+            raise ValueError(f"floor_rate_per_hour must be positive, got {floor_rate_per_hour}")
+        self.bucket_seconds = bucket_seconds
+        self.n_buckets = max(1, int(window_seconds // bucket_seconds))
+        buckets_per_baseline = max(1.0, baseline_hours * 3600 / bucket_seconds)
+        self.alpha = 1.0 / buckets_per_baseline
+        self.z_threshold = z_threshold
+        self.min_count = min_count
+        self.floor_rate = floor_rate_per_hour * bucket_seconds / 3600
+        self.windows = {}
+
+    def _window(self, key):
+        window = self.windows.get(key)
+        if window is None:
+            window = RateWindow(self.n_buckets, self.bucket_seconds, self.alpha, self.floor_rate)
+            self.windows[key] = window
+        return window
+
+    def score(self, key, ts=None):
+        """Current (window count, expected count, z-score) for a key"""
+        window = self.windows.get(key)
+        if window is None:
+            return 0, 0.0, 0.0
+        window.advance(ts if ts is not None else time.time())
+        expected = window.expected(self.floor_rate)
+        z = (window.window_total - expected) / math.sqrt(expected)
+        return window.window_total, expected, z
+
+    def observe(self, key, ts=None):
+        """Record one mention of `key`; returns a burst dict if it just started spiking"""
+        ts = ts if ts is not None else time.time()
+        window = self._window(key)
+        window.add(ts)
+
+        count, expected, z = self.score(key, ts)
+        spiking = count >= self.min_count and z >= self.z_threshold
+        if spiking and not window.bursting:
+            window.bursting = True
+            return {'key': key, 'count': count, 'expected': round(expected, 2),
+                    'z_score': round(z, 2), 'window_minutes': self.n_buckets * self.bucket_seconds // 60,
+                    'detected_at': ts}
+        if not spiking:
+            window.bursting = False
+        return None
+
+    def observe_item(self, keywords=(), locations=(), ts=None):
+        """Record one news/social item; returns any bursts it triggered"""
+        bursts = []
+        for key in [f"kw:{k}" for k in keywords] + [f"loc:{l}" for l in locations]:
+            burst = self.observe(key, ts)
+            if burst:
+                bursts.append(burst)
+        return bursts
+
+    def active_bursts(self, ts=None):
+        """Keys currently above threshold, strongest first"""
+        ts = ts if ts is not None else time.time()
+        active = []
+        for key, window in self.windows.items():
+            if not window.bursting:
+                continue
+            count, expected, z = self.score(key, ts)
+            if count >= self.min_count and z >= self.z_threshold:
+                active.append({'key': key, 'count': count, 'expected': round(expected, 2),
+                               'z_score': round(z, 2)})
+            else:
+                window.bursting = False
+        return sorted(active, key=lambda b: b['z_score'], reverse=True)
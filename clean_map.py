@@ -1,75 +1,70 @@
+import os
 import pandas as pd
 import folium
+from geojson_layers import PopupShards, point_layer
+from instrumentation import stage
 
-def make_clean_map(csv_file="combined_disaster_feed.csv", output_file="clean_map.html"):
+def make_clean_map(csv_file="combined_disaster_feed.csv", output_file="clean_map.html", df=None, layer_cache=None,
+                   popup_shards=None, cube=None, fit_bounds=False):
     """
     Clean, honest presentation of real disaster data.
     No BS risk scores or fake intelligence - just the facts.
     """
-    df = pd.read_csv(csv_file)
+    if df is None:
+        df = pd.read_csv(csv_file)
     df = df.dropna(subset=["lat", "lon"])
     
     # Simple, clear colors by source
     colors = {"NOAA": "red", "USGS": "orange", "NASA-FIRMS": "darkred"}
     
-    m = folium.Map(location=[38, -97], zoom_start=5, tiles="OpenStreetMap")
+    m = folium.Map(location=[38, -97], zoom_start=5, tiles="OpenStreetMap", prefer_canvas=True)
     
-    # Group by source for toggle
-    groups = {
-        "NOAA": folium.FeatureGroup(name="NOAA Weather Alerts"),
-        "USGS": folium.FeatureGroup(name="USGS Earthquakes"), 
-        "NASA-FIRMS": folium.FeatureGroup(name="NASA Fire Detections")
+    style = {
+        "radius": 6,
+        "color": {"field": "source", "map": colors, "default": "gray"},
+        "fillColor": {"field": "source", "map": colors, "default": "gray"},
+        "fill": True,
+        "fillOpacity": 0.7,
     }
     
-    for _, row in df.iterrows():
-        source = row.get("source", "Unknown")
-        
-        # Build popup with actual data only
-        popup_parts = [f"<b>{source}</b>"]
-        
-        if source == "NOAA":
-            popup_parts.append(f"Event: {row.get('event', 'N/A')}")
-            if pd.notna(row.get('severity')):
-                popup_parts.append(f"Severity: {row['severity']}")
-            if pd.notna(row.get('area')):
-                popup_parts.append(f"Area: {row['area']}")
-                
-        elif source == "USGS":
-            popup_parts.append(f"Magnitude: {row.get('magnitude', 'N/A')}")
-            if pd.notna(row.get('place')):
-                popup_parts.append(f"Location: {row['place']}")
-                
-        elif source == "NASA-FIRMS":
-            popup_parts.append("Wildfire Detection")
-            if pd.notna(row.get('confidence')):
-                popup_parts.append(f"Confidence: {row['confidence']}%")
-        
-        popup_parts.append(f"Coordinates: {row['lat']:.3f}, {row['lon']:.3f}")
-        popup_text = "<br>".join(popup_parts)
-        
-        marker = folium.CircleMarker(
-            location=[row["lat"], row["lon"]],
-            radius=6,
-            color=colors.get(source, "gray"),
-            fill=True,
-            fillColor=colors.get(source, "gray"),
-            fillOpacity=0.7,
-            popup=popup_text
-        )
-        
-        if source in groups:
-            marker.add_to(groups[source])
-        else:
-            marker.add_to(m)
+    # Popups with actual data only, per source
+    coords_row = ["Coordinates", "_coords"]
+    popups = {
+        "NOAA": {"title": "<b>{source}</b><br>Event: {event}<br>",
+                 "rows": [["Severity", "severity"], ["Area", "area"], coords_row]},
+        "USGS": {"title": "<b>{source}</b><br>Magnitude: {magnitude}<br>",
+                 "rows": [["Location", "place"], coords_row]},
+        "NASA-FIRMS": {"title": "<b>{source}</b><br>Wildfire Detection<br>",
+                       "rows": [["Confidence", "confidence", {"suffix": "%"}], coords_row]},
+    }
+    names = {
+        "NOAA": "NOAA Weather Alerts",
+        "USGS": "USGS Earthquakes",
+        "NASA-FIRMS": "NASA Fire Detections"
+    }
     
-    # Add groups to map
-    for group in groups.values():
-        group.add_to(m)
+    # Popup details are written to JSON shards next to the HTML and fetched on click
+    shards = popup_shards or PopupShards(os.path.splitext(output_file)[0] + "_popups")
+
+    # Group by source for toggle
+    for source, popup in popups.items():
+        popup = dict(popup, skip_missing=True)
+        point_layer(df[df["source"] == source], style, popup, name=names[source],
+                    cache=layer_cache, cache_key=f"source={source}", shards=shards).add_to(m)
+    
+    other = df[~df["source"].isin(list(popups))]
+    if not other.empty:
+        other_popup = {"title": "<b>{source}</b><br>", "rows": [coords_row]}
+        point_layer(other, style, other_popup, control=False,
+                    cache=layer_cache, cache_key="source=other", shards=shards).add_to(m)
     
     # Simple header with real counts
-    noaa_count = len(df[df['source'] == 'NOAA'])
-    usgs_count = len(df[df['source'] == 'USGS']) 
-    fire_count = len(df[df['source'] == 'NASA-FIRMS'])
+    # RenderPipeline passes its shared cube; a standalone run just counts the column
+    if cube is not None:
+        noaa_count, usgs_count, fire_count = (cube.count(source=s) for s in ('NOAA', 'USGS', 'NASA-FIRMS'))
+    else:
+        counts = df['source'].value_counts()
+        noaa_count, usgs_count, fire_count = (int(counts.get(s, 0)) for s in ('NOAA', 'USGS', 'NASA-FIRMS'))
     
     header = f"""
     <div style="position: fixed; top: 10px; left: 50%; transform: translateX(-50%);
@@ -98,7 +93,15 @@ def make_clean_map(csv_file="combined_disaster_feed.csv", output_file="clean_map
     
     folium.LayerControl().add_to(m)
     
-    m.save(output_file)
+    # Regional views zoom to their own events instead of CONUS
+    if fit_bounds and not df.empty:
+        m.fit_bounds([[df["lat"].min(), df["lon"].min()], [df["lat"].max(), df["lon"].max()]])
+    
+    with stage("render", "save", map="clean_map") as span:
+        m.save(output_file)
+        if popup_shards is None:
+            shards.write()
+        span.rows_in, span.bytes_out = len(df), os.path.getsize(output_file)
     print(f"✅ Clean map saved: {output_file}")
     print(f"📊 Real data: {noaa_count} weather + {usgs_count} earthquakes + {fire_count} fires")
 
@@ -0,0 +1,299 @@
+import json
+import math
+import os
+import shutil
+
+import numpy as np
+from branca.element import Template
+from folium.map import Layer
+
+from spatial_index import KDTree
+
+
+def project(lat, lon):
+    """Lat/lon (degrees) -> Web Mercator x/y in [0, 1]"""
+    lat, lon = np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+    x = lon / 360.0 + 0.5
+    sin = np.clip(np.sin(np.radians(lat)), -0.9999, 0.9999)
+    y = 0.5 - 0.25 * np.log((1 + sin) / (1 - sin)) / math.pi
+    return np.clip(x, 0, 1), np.clip(y, 0, 1)
+
+
+def unproject(x, y):
+    """Web Mercator x/y in [0, 1] -> lat/lon (degrees)"""
+    lon = (np.asarray(x) - 0.5) * 360.0
+    lat = np.degrees(2 * np.arctan(np.exp((0.5 - np.asarray(y)) * 2 * math.pi))) - 90.0
+    return lat, lon
+
+
+# Points whose 3x3 cell neighbourhood holds more candidates than this (a dense
+# fire cluster) are left to KDTree radius queries, keeping pair generation linear
+MAX_CELL_CANDIDATES = 64
+
+
+def _neighbor_pairs(x, y, r, max_candidates=MAX_CELL_CANDIDATES):
+    """
+    (i, j, dense): all (i, j), i != j, with distance <= r, found by bucketing
+    points into r-sized cells - except for the `dense` points, whose
+    neighbourhood is too crowded to enumerate pairwise (no pairs are listed
+    with a dense point as i; it still shows up as j for its sparse neighbours)
+    """
+    cx = np.floor(x / r).astype(np.int64)
+    cy = np.floor(y / r).astype(np.int64)
+    keys = (cx << 32) + cy
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    ranges = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            target = ((cx + dx) << 32) + (cy + dy)
+            lo = np.searchsorted(sorted_keys, target, 'left')
+            hi = np.searchsorted(sorted_keys, target, 'right')
+            ranges.append((lo, hi - lo))
+    dense = sum(counts for _, counts in ranges) > max_candidates
+
+    pairs_i, pairs_j = [], []
+    for lo, counts in ranges:
+        counts = np.where(dense, 0, counts)
+        if not counts.any():
+            continue
+        i = np.repeat(np.arange(len(x)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        j = order[np.repeat(lo, counts) + offsets]
+        pairs_i.append(i)
+        pairs_j.append(j)
+
+    if not pairs_i:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), dense
+    i, j = np.concatenate(pairs_i), np.concatenate(pairs_j)
+    keep = (i != j) & ((x[i] - x[j]) ** 2 + (y[i] - y[j]) ** 2 <= r * r)
+    return i[keep], j[keep], dense
+
+
+class ClusterIndex:
+    """
+    Supercluster-style hierarchical point clustering.
+
+    Points are clustered greedily zoom by zoom from max_zoom down to
+    min_zoom, each level merging the level above within `radius` pixels.
+    Every zoom level keeps its own KDTree so viewport queries and tile
+    export only touch the items visible at that zoom.
+    """
+
+    def __init__(self, radius=60, extent=512, min_zoom=0, max_zoom=10, min_points=2):
+        self.radius = radius
+        self.extent = extent
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.min_points = min_points
+        self.levels = {}
+        self.trees = {}
+
+    def load(self, df, weight_col='threat_score', id_col='event_id'):
+        """Build every zoom level from a DataFrame with lat/lon columns"""
+        x, y = project(df['lat'].values, df['lon'].values)
+        n = len(df)
+        weights = (df[weight_col].fillna(0).values.astype(np.float64)
+                   if weight_col in df.columns else np.zeros(n))
+        level = {
+            'x': x, 'y': y,
+            'count': np.ones(n, dtype=np.int64),
+            'threat_max': weights,
+            'point': np.arange(n),                      # source row, -1 for clusters
+            'expansion_zoom': np.full(n, -1, dtype=np.int64),
+        }
+        self.ids = df[id_col].astype(str).values if id_col in df.columns else None
+
+        for z in range(self.max_zoom, self.min_zoom - 1, -1):
+            level = self._cluster(level, z)
+            self.levels[z] = level
+            self.trees[z] = KDTree(np.column_stack([level['x'], level['y']]))
+        return self
+
+    def _cluster(self, prev, zoom):
+        r = self.radius / (self.extent * 2 ** zoom)
+        x, y, count = prev['x'], prev['y'], prev['count']
+        pi, pj, dense = _neighbor_pairs(x, y, r)
+        tree = KDTree(np.column_stack([x, y])) if dense.any() else None
+
+        # Items with no neighbor within r are carried down unchanged
+        # (dense items are looked up in the tree when their turn comes)
+        has_neighbor = dense.copy()
+        has_neighbor[pi] = True
+        carried = list(np.flatnonzero(~has_neighbor))
+
+        order = np.argsort(pi, kind='stable')
+        pi, pj = pi[order], pj[order]
+        starts = np.searchsorted(pi, np.arange(len(x) + 1))
+
+        processed = ~has_neighbor
+        merged = []   # (members array)
+        for i in np.flatnonzero(has_neighbor):
+            if processed[i]:
+                continue
+            processed[i] = True
+            if dense[i]:
+                neighbors = tree.within((x[i], y[i]), r)
+                neighbors = neighbors[neighbors != i]
+            else:
+                neighbors = pj[starts[i]:starts[i + 1]]
+            neighbors = neighbors[~processed[neighbors]]
+            if count[i] + count[neighbors].sum() >= self.min_points and len(neighbors):
+                processed[neighbors] = True
+                merged.append(np.concatenate([[i], neighbors]))
+            else:
+                carried.append(i)
+
+        carried = np.array(sorted(carried), dtype=np.int64)
+        out = {key: prev[key][carried] for key in prev}
+        if merged:
+            members = np.concatenate(merged)
+            group = np.repeat(np.arange(len(merged)), [len(m) for m in merged])
+            w = count[members].astype(np.float64)
+            total = np.bincount(group, weights=w)
+            cluster = {
+                'x': np.bincount(group, weights=x[members] * w) / total,
+                'y': np.bincount(group, weights=y[members] * w) / total,
+                'count': total.astype(np.int64),
+                'threat_max': np.full(len(merged), -np.inf),
+                'point': np.full(len(merged), -1, dtype=np.int64),
+                'expansion_zoom': np.full(len(merged), zoom + 1, dtype=np.int64),
+            }
+            np.maximum.at(cluster['threat_max'], group, prev['threat_max'][members])
+            out = {key: np.concatenate([out[key], cluster[key]]) for key in out}
+        return out
+
+    def _items(self, zoom, idx):
+        level = self.levels[zoom]
+        lat, lon = unproject(level['x'][idx], level['y'][idx])
+        items = []
+        for k, i in enumerate(idx.tolist()):
+            point = int(level['point'][i])
+            ident = self.ids[point] if (point >= 0 and self.ids is not None) else None
+            ez = int(level['expansion_zoom'][i])
+            items.append([round(float(lon[k]), 5), round(float(lat[k]), 5), int(level['count'][i]),
+                          round(float(level['threat_max'][i]), 1), ez if ez >= 0 else None, ident])
+        return items
+
+    def get_clusters(self, bbox, zoom):
+        """Items visible in bbox (west, south, east, north) at a zoom:
+        [lon, lat, count, max_threat, expansion_zoom, event_id]"""
+        zoom = max(self.min_zoom, min(self.max_zoom, int(zoom)))
+        west, south, east, north = bbox
+        x0, y1 = project(south, west)
+        x1, y0 = project(north, east)
+        idx = self.trees[zoom].range([x0, y0], [x1, y1])
+        return self._items(zoom, idx)
+
+    def write_tiles(self, out_dir):
+        """
+        Write static tiles as out_dir/{z}/{x}/{y}.json plus out_dir/index.json
+        listing the zoom range and which tiles exist.
+        """
+        if os.path.exists(out_dir):
+            shutil.rmtree(out_dir)
+        index = {'min_zoom': self.min_zoom, 'max_zoom': self.max_zoom, 'tiles': {}}
+        for z in range(self.min_zoom, self.max_zoom + 1):
+            level = self.levels[z]
+            n = 2 ** z
+            tx = np.minimum((level['x'] * n).astype(np.int64), n - 1)
+            ty = np.minimum((level['y'] * n).astype(np.int64), n - 1)
+            keys, inverse = np.unique(tx * n + ty, return_inverse=True)
+            order = np.argsort(inverse, kind='stable')
+            bounds = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+
+            index['tiles'][z] = []
+            for t, key in enumerate(keys.tolist()):
+                x, y = divmod(key, n)
+                path = os.path.join(out_dir, str(z), str(x))
+                os.makedirs(path, exist_ok=True)
+                with open(os.path.join(path, f"{y}.json"), 'w') as f:
+                    json.dump(self._items(z, order[bounds[t]:bounds[t + 1]]), f, separators=(',', ':'))
+                index['tiles'][z].append(f"{x}/{y}")
+
+        with open(os.path.join(out_dir, 'index.json'), 'w') as f:
+            json.dump(index, f, separators=(',', ':'))
+        return sum(len(v) for v in index['tiles'].values())
+
+
+class ClusterTileLayer(Layer):
+    """Map layer that loads pre-clustered tiles for the current viewport and zoom"""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.layerGroup();
+            (function(group, baseUrl) {
+                var cache = {}, index = null, token = 0, map = null;
+                function color(t) {
+                    return t >= 70 ? '#dc3545' : t >= 50 ? '#fd7e14' : t >= 30 ? '#ffc107' : '#28a745';
+                }
+                function load(key) {
+                    if (!(key in cache)) {
+                        cache[key] = fetch(baseUrl + '/' + key + '.json')
+                            .then(function(r) { return r.ok ? r.json() : []; })
+                            .catch(function() { return []; });
+                    }
+                    return cache[key];
+                }
+                function draw() {
+                    if (!map || !index) return;
+                    var z = Math.max(index.min_zoom, Math.min(index.max_zoom, map.getZoom()));
+                    var n = Math.pow(2, z), b = map.getBounds(), have = index.tiles[z] || {};
+                    function tx(lon) { return Math.floor((lon + 180) / 360 * n); }
+                    function ty(lat) {
+                        var s = Math.min(Math.max(Math.sin(lat * Math.PI / 180), -0.9999), 0.9999);
+                        return Math.floor((0.5 - 0.25 * Math.log((1 + s) / (1 - s)) / Math.PI) * n);
+                    }
+                    var keys = [];
+                    for (var x = Math.max(0, tx(b.getWest())); x <= Math.min(n - 1, tx(b.getEast())); x++) {
+                        for (var y = Math.max(0, ty(b.getNorth())); y <= Math.min(n - 1, ty(b.getSouth())); y++) {
+                            if (have[x + '/' + y]) keys.push(z + '/' + x + '/' + y);
+                        }
+                    }
+                    var mine = ++token;
+                    Promise.all(keys.map(load)).then(function(tiles) {
+                        if (mine !== token) return;
+                        group.clearLayers();
+                        tiles.forEach(function(items) {
+                            items.forEach(function(it) {
+                                var ll = [it[1], it[0]], isCluster = it[2] > 1;
+                                var m = L.circleMarker(ll, {
+                                    radius: isCluster ? 8 + 4 * Math.log10(it[2]) : 6,
+                                    color: 'white', weight: 2, fill: true,
+                                    fillColor: color(it[3]), fillOpacity: 0.8
+                                });
+                                if (isCluster) {
+                                    m.bindTooltip(it[2] + ' events (max threat ' + it[3] + ')');
+                                    m.on('click', function() { map.setView(ll, it[4]); });
+                                }
+                                group.addLayer(m);
+                            });
+                        });
+                    });
+                }
+                group.on('add', function() {
+                    map = group._map;
+                    map.on('moveend', draw);
+                    if (index) { draw(); return; }
+                    fetch(baseUrl + '/index.json').then(function(r) { return r.json(); }).then(function(idx) {
+                        index = {min_zoom: idx.min_zoom, max_zoom: idx.max_zoom, tiles: {}};
+                        for (var z in idx.tiles) {
+                            index.tiles[z] = {};
+                            idx.tiles[z].forEach(function(k) { index.tiles[z][k] = true; });
+                        }
+                        draw();
+                    });
+                });
+                group.on('remove', function() {
+                    if (map) map.off('moveend', draw);
+                    map = null;
+                });
+            })({{ this.get_name() }}, {{ this.url|tojson }});
+        {% endmacro %}
+        """)
+
+    def __init__(self, url, name=None, overlay=True, control=True, show=True):
+        super().__init__(name=name, overlay=overlay, control=control, show=show)
+        self._name = "ClusterTileLayer"
+        self.url = url.rstrip('/')
@@ -0,0 +1,181 @@
+import glob
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from event_index import event_id
+
+DEFAULT_FEED_DIR = "feed"
+MANIFEST_FILE = "manifest.json"
+
+
+def _clean(record):
+    """JSON-safe copy of a record: NaN/None dropped, timestamps as strings"""
+    out = {}
+    for key, value in record.items():
+        if not isinstance(value, (str, list, dict)) and pd.isna(value):     # None / NaN / NaT / pd.NA
+            continue
+        if hasattr(value, 'item') and not hasattr(value, 'isoformat'):
+            value = value.item()                # numpy scalars
+        if not isinstance(value, (str, int, float, bool, list, dict)):
+            value = str(value)
+        out[key] = value
+    return out
+
+
+def _dump(path, payload):
+    """Write JSON atomically so pollers never see a half-written file"""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, separators=(",", ":"))
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+
+class DeltaPublisher:
+    """
+    Publishes the active event set as a versioned base snapshot plus small
+    delta files, so static pages can refresh by downloading only what changed.
+
+    Layout under out_dir:
+        manifest.json        {version, base_version, base, deltas: [{from, to, file}]}
+        base-<v>.json        {version, events: {event_id: record}}
+        delta-<v>.json       {from, version, added: {...}, updated: {...}, expired: [ids]}
+
+    A client at version v applies every delta with from >= v in order; a
+    client older than the base (or a first visit) loads the base instead.
+    A new base is written once the deltas since the last one add up to
+    `compact_ratio` of the base size, or there are more than `max_deltas`.
+    Files that drop out of the manifest are deleted one publish later.
+    """
+
+    def __init__(self, out_dir=DEFAULT_FEED_DIR, max_deltas=50, compact_ratio=0.5):
+        self.out_dir = out_dir
+        self.max_deltas = max_deltas
+        self.compact_ratio = compact_ratio
+        os.makedirs(out_dir, exist_ok=True)
+        self.manifest = self._read(MANIFEST_FILE) or {
+            'version': 0, 'base_version': 0, 'base': None, 'base_bytes': 0,
+            'delta_bytes': 0, 'deltas': [],
+        }
+        self.events = self._replay()
+
+    def _read(self, name):
+        try:
+            with open(os.path.join(self.out_dir, name), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _replay(self):
+        """Rebuild the published event set from the base and its deltas"""
+        base = self._read(self.manifest['base']) if self.manifest.get('base') else None
+        events = dict(base['events']) if base else {}
+        for entry in self.manifest['deltas']:
+            delta = self._read(entry['file'])
+            if delta:
+                events = self.apply(events, delta)
+        return events
+
+    @staticmethod
+    def apply(events, delta):
+        """Apply one delta to an {event_id: record} dict (same logic as the browser)"""
+        events = dict(events)
+        for eid in delta.get('expired', []):
+            events.pop(eid, None)
+        events.update(delta.get('added', {}))
+        events.update(delta.get('updated', {}))
+        return events
+
+    @staticmethod
+    def keyed(records, id_field='event_id'):
+        """{event_id: clean record} from a DataFrame or iterable of dicts"""
+        if hasattr(records, 'to_dict'):
+            records = records.to_dict('records')
+        keyed = {}
+        for record in records:
+            record = _clean(record)
+            eid = record.get(id_field) or event_id(record)
+            record[id_field] = eid
+            keyed[eid] = record
+        return keyed
+
+    def diff(self, current):
+        """added / updated / expired between the published set and `current`"""
+        previous = self.events
+        added = {eid: rec for eid, rec in current.items() if eid not in previous}
+        updated = {eid: rec for eid, rec in current.items()
+                   if eid in previous and previous[eid] != rec}
+        expired = sorted(eid for eid in previous if eid not in current)
+        return added, updated, expired
+
+    def publish(self, records, id_field='event_id'):
+        """
+        Publish the current active set. Writes a delta (or a fresh base when
+        due) and the manifest; does nothing if no event changed.
+        Returns the manifest.
+        """
+        current = self.keyed(records, id_field)
+        added, updated, expired = self.diff(current)
+        if self.manifest['base'] and not (added or updated or expired):
+            return self.manifest
+        previous_files = self._referenced()
+
+        version = self.manifest['version'] + 1
+        needs_base = (
+            not self.manifest['base'] or
+            len(self.manifest['deltas']) >= self.max_deltas or
+            self.manifest['delta_bytes'] >= self.compact_ratio * max(self.manifest['base_bytes'], 1)
+        )
+
+        if needs_base:
+            name = f"base-{version}.json"
+            size = _dump(os.path.join(self.out_dir, name), {'version': version, 'events': current})
+            self.manifest.update(base_version=version, base=name, base_bytes=size,
+                                 delta_bytes=0, deltas=[])
+        else:
+            name = f"delta-{version}.json"
+            size = _dump(os.path.join(self.out_dir, name), {
+                'from': self.manifest['version'], 'version': version,
+                'added': added, 'updated': updated, 'expired': expired,
+            })
+            self.manifest['deltas'].append({'from': self.manifest['version'], 'to': version, 'file': name})
+            self.manifest['delta_bytes'] += size
+
+        self.manifest['version'] = version
+        self.manifest['count'] = len(current)
+        self.manifest['generated'] = datetime.now().isoformat()
+        self.events = current
+        _dump(os.path.join(self.out_dir, MANIFEST_FILE), self.manifest)
+        self._prune(keep=previous_files)
+        print(f"📦 Feed v{version}: +{len(added)} ~{len(updated)} -{len(expired)} "
+              f"({'base' if needs_base else 'delta'} {size:,} bytes)")
+        return self.manifest
+
+    def _referenced(self):
+        """Base and delta files the current manifest points to"""
+        return {self.manifest['base']} | {d['file'] for d in self.manifest['deltas']}
+
+    def _prune(self, keep=()):
+        """
+        Remove bases and deltas referenced neither by the manifest nor by
+        `keep`. publish() passes the previous manifest's files, so a client
+        that read that manifest just before the swap can still fetch them;
+        they go on the following publish.
+        """
+        keep = self._referenced() | set(keep)
+        for path in glob.glob(os.path.join(self.out_dir, "base-*.json")) + \
+                glob.glob(os.path.join(self.out_dir, "delta-*.json")):
+            if os.path.basename(path) not in keep:
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    import sys
+
+    import pandas as pd
+
+    csv_file = sys.argv[1] if len(sys.argv) > 1 else 'active_emergencies.csv'
+    DeltaPublisher().publish(pd.read_csv(csv_file))
@@ -0,0 +1,222 @@
+"""
+disaster-tracker: one entry point for the fetch / merge / enrich / map /
+report / news / serve tools.
+
+Only the standard library is imported up front; each subcommand imports
+what it needs (pandas, folium, requests, ...) when it runs, so `--help`
+and dispatch stay fast. `disaster_tracker.py check` measures that.
+"""
+import argparse
+import sys
+
+IMPORT_BUDGET_MS = 100
+# Must not be loaded just by starting the CLI
+HEAVY_MODULES = ('pandas', 'numpy', 'folium', 'requests', 'plotly', 'branca')
+
+FETCH_STAGES = {'noaa': 'fetch_noaa', 'usgs': 'fetch_usgs', 'wildfire': 'fetch_wildfire'}
+MAP_STAGES = {'disaster': 'disaster_map', 'clean': 'clean_map', 'professional': 'professional_map',
+              'summary': 'summary', 'dashboard': 'intelligence_dashboard'}
+
+
+def _run_stages(stages, args, only=True):
+    from pipeline import Pipeline
+
+    result = Pipeline(workers=args.workers).run(stages, force=args.force, only=only)
+    return 1 if any(v in ('failed', 'blocked') for v in result.values()) else 0
+
+
+def _pick(names, table, what):
+    """Stage names for the chosen keys (all when none given); None after reporting unknown keys"""
+    unknown = [n for n in names if n not in table]
+    if unknown:
+        print(f"❌ Unknown {what}: {', '.join(unknown)} (choose from {', '.join(table)})", file=sys.stderr)
+        return None
+    return [table[n] for n in names or table]
+
+
+def cmd_fetch(args):
+    stages = _pick(args.sources, FETCH_STAGES, 'source')
+    return 2 if stages is None else _run_stages(stages, args)
+
+
+def cmd_merge(args):
+    return _run_stages(['merge'], args)
+
+
+def cmd_enrich(args):
+    return _run_stages(['enrich'], args)
+
+
+def cmd_news(args):
+    return _run_stages(['news'], args)
+
+
+def cmd_map(args):
+    if args.regions:
+        from regional_render import RegionalRenderer
+
+        manifest = RegionalRenderer(args.feed, by=args.regions, workers=args.workers).run(force=args.force)
+        return 1 if any('error' in r for r in manifest['regions'].values()) else 0
+    stages = _pick(args.maps, MAP_STAGES, 'map')
+    return 2 if stages is None else _run_stages(stages, args)
+
+
+def cmd_run(args):
+    return _run_stages(args.stages or None, args, only=False)
+
+
+def cmd_report(args):
+    from red_cross_tool import RedCrossDisasterTool
+
+    tool = RedCrossDisasterTool()
+    events = tool.generate_shelter_deployment_report()
+    if events and not args.no_map:
+        tool.create_deployment_map(events)
+    return 0
+
+
+def cmd_serve(args):
+    options = {'host': args.host}
+    if args.port:
+        options['port'] = args.port
+    if args.service == 'api':
+        from event_api import serve
+
+        serve(args.feed, **options)
+    elif args.service == 'stream':
+        import asyncio
+
+        from event_stream import EventBroadcaster
+
+        try:
+            asyncio.run(EventBroadcaster().serve(csv_file=args.feed, **options))
+        except KeyboardInterrupt:
+            print("\n🛑 Event stream stopped")
+    else:
+        from upstream_proxy import DEFAULT_PORT, UPSTREAMS, UpstreamCache, make_server
+
+        server = make_server(UpstreamCache(dict(UPSTREAMS)), args.host, args.port or DEFAULT_PORT)
+        print(f"🛰️ Upstream proxy on http://{args.host}:{args.port or DEFAULT_PORT}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n🛑 Upstream proxy stopped")
+        finally:
+            server.server_close()
+    return 0
+
+
+def _unparsable_commands():
+    """Subcommands that fail to parse with no positional arguments (their documented default)"""
+    import contextlib
+    import io
+
+    parser = build_parser()
+    commands = next(a for a in parser._actions if isinstance(a, argparse._SubParsersAction)).choices
+    failed = {}
+    for name in commands:
+        stderr = io.StringIO()
+        try:
+            with contextlib.redirect_stderr(stderr):
+                parser.parse_args([name])
+        except SystemExit:
+            failed[name] = stderr.getvalue().strip().splitlines()[-1]
+    return failed
+
+
+def cmd_check(args):
+    """
+    Import-time budget: start the CLI cold in fresh interpreters (`--help`,
+    best of N) and fail if it takes longer than the budget or pulls in a
+    heavy module. Also parses every subcommand with its defaults. The repo
+    has no test suite, so this lives here.
+    """
+    import os
+    import subprocess
+    import time
+
+    failed = _unparsable_commands()
+    for name, error in failed.items():
+        print(f"❌ `{name}` does not parse without arguments: {error}")
+
+    here = os.path.abspath(__file__)
+    probe = ("import sys, runpy; sys.argv = [sys.argv[0], '--help']\n"
+             "try:\n    runpy.run_path(%r, run_name='__main__')\nexcept SystemExit:\n    pass\n"
+             "print('LOADED', ' '.join(m for m in %r if m in sys.modules))" % (here, HEAVY_MODULES))
+    timings, loaded = [], ''
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True).stdout
+        timings.append((time.perf_counter() - start) * 1000)
+        loaded = out.rsplit('LOADED', 1)[-1].strip()
+    baseline = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'])
+        baseline.append((time.perf_counter() - start) * 1000)
+
+    cold, interpreter = min(timings), min(baseline)
+    print(f"⏱️ Cold start {cold:.0f} ms (interpreter alone {interpreter:.0f} ms, CLI {cold - interpreter:.0f} ms); "
+          f"budget {args.budget_ms:.0f} ms")
+    ok = cold <= args.budget_ms and not loaded and not failed
+    if loaded:
+        print(f"❌ Heavy modules imported at startup: {loaded}")
+    elif cold > args.budget_ms:
+        print("❌ Over budget - run `python -X importtime disaster_tracker.py --help` to see why")
+    elif not failed:
+        print("✅ Within budget, no heavy imports at startup, every subcommand parses")
+    return 0 if ok else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='disaster-tracker',
+                                     description='Fetch, process, map and serve US disaster data')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def stage_command(name, handler, help_text):
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument('--force', action='store_true', help='rerun even if inputs are unchanged')
+        cmd.add_argument('--workers', type=int)
+        cmd.set_defaults(handler=handler)
+        return cmd
+
+    cmd = stage_command('fetch', cmd_fetch, 'fetch NOAA / USGS / FIRMS feeds')
+    cmd.add_argument('sources', nargs='*', metavar='SOURCE',
+                     help=f"one or more of {', '.join(FETCH_STAGES)} (default: all)")
+    stage_command('merge', cmd_merge, 'merge the fetched feeds into combined_disaster_feed.csv')
+    stage_command('enrich', cmd_enrich, 'add risk levels and threat scores (enriched_disaster_feed.csv)')
+    stage_command('news', cmd_news, 'collect news and correlate it with the current events')
+    cmd = stage_command('map', cmd_map, 'render maps from the current feed')
+    cmd.add_argument('maps', nargs='*', metavar='MAP',
+                     help=f"one or more of {', '.join(MAP_STAGES)} (default: all)")
+    cmd.add_argument('--regions', choices=['state', 'region', 'chapter'],
+                     help='render one map + deployment report per region instead')
+    cmd.add_argument('--feed', default='combined_disaster_feed.csv')
+    cmd = stage_command('run', cmd_run, 'run the whole pipeline (or the named stages and their upstream)')
+    cmd.add_argument('stages', nargs='*')
+
+    cmd = sub.add_parser('report', help='Red Cross shelter deployment report')
+    cmd.add_argument('--no-map', action='store_true', help='skip red_cross_deployment_map.html')
+    cmd.set_defaults(handler=cmd_report)
+
+    cmd = sub.add_parser('serve', help='serve events over HTTP / SSE, or run the upstream proxy')
+    cmd.add_argument('service', nargs='?', choices=['api', 'stream', 'proxy'], default='api')
+    cmd.add_argument('--host', default='127.0.0.1')
+    cmd.add_argument('--port', type=int)
+    cmd.add_argument('--feed', default='combined_disaster_feed.csv')
+    cmd.set_defaults(handler=cmd_serve)
+
+    cmd = sub.add_parser('check', help=f'verify the CLI cold-starts within {IMPORT_BUDGET_MS} ms')
+    cmd.add_argument('--budget-ms', type=float, default=IMPORT_BUDGET_MS)
+    cmd.add_argument('--repeat', type=int, default=5)
+    cmd.set_defaults(handler=cmd_check)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from event_store import DEFAULT_PAGE_SIZE, EventStore, parse_bbox, parse_since, watch_csv
+from http_encoding import choose_encoding, compress
+
+DEFAULT_PORT = 8765
+
+
+class ResponseCache:
+    """Small LRU of encoded responses keyed by (version, query, encoding)"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class EventAPIHandler(BaseHTTPRequestHandler):
+    """
+    GET /events?bbox=w,s,e,n&since=6h&source=NOAA,USGS&min_threat=50&offset=0&limit=500
+    GET /version
+
+    Responses are JSON, compressed per Accept-Encoding, and carry an ETag
+    derived from the store version, the query and the encoding, so unchanged
+    polls get a bodyless 304.
+    """
+
+    server_version = "DisasterEventAPI/1.0"
+    store = None
+    cache = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _error(self, status, message):
+        body = json.dumps({'error': message}).encode('utf-8')
+        self._send(status, body, {'Content-Type': 'application/json'})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/version':
+            body = json.dumps({'version': self.store.version, 'events': len(self.store)}).encode('utf-8')
+            return self._send(200, body, {'Content-Type': 'application/json', 'Cache-Control': 'no-cache'})
+        if url.path != '/events':
+            return self._error(404, 'not found')
+
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            filters = {
+                'bbox': parse_bbox(params.get('bbox')),
+                'since': parse_since(params.get('since')),
+                'sources': [s for s in params.get('source', '').split(',') if s] or None,
+                'min_threat': float(params['min_threat']) if params.get('min_threat') else None,
+                'offset': int(params.get('offset', 0)),
+                'limit': int(params.get('limit', DEFAULT_PAGE_SIZE)),
+            }
+        except ValueError as e:
+            return self._error(400, str(e))
+
+        # Key on the parsed filters (relative 'since' resolves to the minute)
+        canonical = json.dumps({k: str(v) for k, v in filters.items()}, sort_keys=True)
+        encoding = choose_encoding(self.headers.get('Accept-Encoding'))
+        # Each encoding is a different representation, so it is part of the tag
+        digest = f'{zlib.crc32(canonical.encode()):08x}-{encoding}'
+        version = self.store.version
+        headers = {'ETag': f'"v{version}-{digest}"', 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+        if headers['ETag'] in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            return self._send(304, headers=headers)
+
+        body = self.cache.get((version, canonical, encoding))
+        if body is None:
+            # Key and tag on the version the query actually read, not the one
+            # seen above: a reload may have landed in between
+            result = self.store.query(**filters)
+            raw = json.dumps(result, separators=(',', ':'), default=str).encode('utf-8')
+            body = compress(raw, encoding)
+            self.cache.put((result['version'], canonical, encoding), body)
+            headers['ETag'] = f'"v{result["version"]}-{digest}"'
+
+        headers['Content-Type'] = 'application/json'
+        headers['Access-Control-Allow-Origin'] = '*'
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        self._send(200, body, headers)
+
+    do_HEAD = do_GET
+
+
+def make_server(store, host='127.0.0.1', port=DEFAULT_PORT):
+    handler = type('BoundEventAPIHandler', (EventAPIHandler,), {'store': store, 'cache': ResponseCache()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(csv_file='combined_disaster_feed.csv', host='127.0.0.1', port=DEFAULT_PORT, poll_seconds=30):
+    """Serve the event store over HTTP, reloading it whenever the feed file changes"""
+    store = EventStore()
+    server = make_server(store, host, port)
+    stop = threading.Event()
+    threading.Thread(target=watch_csv, args=(store, csv_file, poll_seconds, stop), daemon=True).start()
+    print(f"🌐 Event API on http://{host}:{port}/events (feed: {csv_file})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Event API stopped")
+    finally:
+        stop.set()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    serve(*sys.argv[1:2])
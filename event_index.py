@@ -0,0 +1,162 @@
+import hashlib
+import math
+import re
+
+# Grid cell size (degrees) for the spatial index
+DEFAULT_CELL_DEG = 1.0
+
+# Words that show up in NWS area descriptions / USGS place strings
+# but carry no location meaning on their own
+LOCATION_STOPWORDS = {
+    'county', 'counties', 'parish', 'city', 'coastal', 'inland', 'northern',
+    'southern', 'eastern', 'western', 'central', 'north', 'south', 'east',
+    'west', 'upper', 'lower', 'island', 'islands', 'region', 'area', 'including',
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text):
+    """Lowercase word tokens from free text"""
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+def location_tokens(*texts):
+    """Tokens worth matching on from area/place strings (len > 3, no filler words)"""
+    tokens = set()
+    for text in texts:
+        if text is None or (isinstance(text, float) and math.isnan(text)):
+            continue
+        for tok in tokenize(text):
+            if len(tok) > 3 and tok not in LOCATION_STOPWORDS and tok != 'nan':
+                tokens.add(tok)
+    return tokens
+
+
+def event_id(row):
+    """
+    Stable ID for a disaster event row (dict or pandas Series).
+    Built from the source plus the fields that identify the event upstream,
+    so the same alert/quake/fire pixel gets the same ID on every fetch.
+    Records without a source (actual_disasters, red_cross_tool) are told
+    apart by their `type`, and fires by `detection_time`.
+    """
+    get = row.get
+    source = get('source')
+    parts = [str(source if source is not None else get('type', ''))]
+    for field in ['event', 'headline', 'place', 'time', 'acq_datetime', 'detection_time']:
+        value = get(field)
+        if value is not None and not (isinstance(value, float) and math.isnan(value)):
+            parts.append(str(value))
+    parts.append(f"{float(get('lat', 0) or 0):.4f}")
+    parts.append(f"{float(get('lon', 0) or 0):.4f}")
+    return hashlib.sha1("|".join(parts).encode('utf-8')).hexdigest()[:12]
+
+
+def ensure_event_ids(df):
+    """Add an `event_id` column to a DataFrame if it doesn't have one"""
+    if 'event_id' not in df.columns:
+        df = df.copy()
+        df['event_id'] = [event_id(row) for row in df.to_dict('records')]
+    return df
+
+
+def grid_cell(lat, lon, cell_deg=DEFAULT_CELL_DEG):
+    """Grid cell key containing a point"""
+    return (int(math.floor(lat / cell_deg)), int(math.floor(lon / cell_deg)))
+
+
+def cells_for_radius(lat, lon, radius_km, cell_deg=DEFAULT_CELL_DEG):
+    """All grid cells touched by a circle (bounding-box approximation)"""
+    dlat = radius_km / 111.0
+    dlon = radius_km / (111.0 * max(math.cos(math.radians(lat)), 0.01))
+    lat0, lon0 = grid_cell(lat - dlat, lon - dlon, cell_deg)
+    lat1, lon1 = grid_cell(lat + dlat, lon + dlon, cell_deg)
+    return [(i, j) for i in range(lat0, lat1 + 1) for j in range(lon0, lon1 + 1)]
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometers"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2 +
+         math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 6371.0 * 2 * math.asin(math.sqrt(min(1.0, a)))
+
+
+class EventIndex:
+    """In-memory set of active events with spatial (grid) and location-token indexes"""
+
+    def __init__(self, cell_deg=DEFAULT_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.events = {}        # event_id -> event dict
+        self.tokens = {}        # token -> set(event_id)
+        self.cells = {}         # (i, j) -> set(event_id)
+        self._event_tokens = {}
+        self._event_cell = {}
+
+    def __len__(self):
+        return len(self.events)
+
+    def __contains__(self, eid):
+        return eid in self.events
+
+    def upsert(self, event):
+        """Add or replace an event; returns its ID"""
+        event = dict(event)
+        eid = event.get('event_id') or event_id(event)
+        event['event_id'] = eid
+        if eid in self.events:
+            self.remove(eid)
+
+        self.events[eid] = event
+        toks = location_tokens(event.get('area'), event.get('place'))
+        self._event_tokens[eid] = toks
+        for tok in toks:
+            self.tokens.setdefault(tok, set()).add(eid)
+
+        lat, lon = event.get('lat'), event.get('lon')
+        if lat is not None and lon is not None and not (math.isnan(lat) or math.isnan(lon)):
+            cell = grid_cell(lat, lon, self.cell_deg)
+            self._event_cell[eid] = cell
+            self.cells.setdefault(cell, set()).add(eid)
+        return eid
+
+    def remove(self, eid):
+        """Drop an event; returns the removed event or None"""
+        event = self.events.pop(eid, None)
+        if event is None:
+            return None
+        for tok in self._event_tokens.pop(eid, ()):
+            ids = self.tokens.get(tok)
+            if ids is not None:
+                ids.discard(eid)
+                if not ids:
+                    del self.tokens[tok]
+        cell = self._event_cell.pop(eid, None)
+        if cell is not None:
+            ids = self.cells[cell]
+            ids.discard(eid)
+            if not ids:
+                del self.cells[cell]
+        return event
+
+    def event_tokens(self, eid):
+        return self._event_tokens.get(eid, set())
+
+    def match_tokens(self, tokens):
+        """Event IDs sharing at least one location token -> {event_id: matched tokens}"""
+        hits = {}
+        for tok in tokens:
+            for eid in self.tokens.get(tok, ()):
+                hits.setdefault(eid, set()).add(tok)
+        return hits
+
+    def near(self, lat, lon, radius_km):
+        """Event IDs within radius_km of a point"""
+        found = []
+        for cell in cells_for_radius(lat, lon, radius_km, self.cell_deg):
+            for eid in self.cells.get(cell, ()):
+                event = self.events[eid]
+                if haversine_km(lat, lon, event['lat'], event['lon']) <= radius_km:
+                    found.append(eid)
+        return found
@@ -0,0 +1,201 @@
+import os
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from delta_publisher import DeltaPublisher
+from spatial_index import KDTree
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+
+def parse_since(value):
+    """'2025-10-15T06:00', an epoch number, or a relative '6h' / '90m' -> UTC-naive Timestamp"""
+    if value is None or value == '':
+        return None
+    value = str(value).strip()
+    if value[-1:] in ('h', 'm') and value[:-1].replace('.', '', 1).isdigit():
+        unit = 'hours' if value[-1] == 'h' else 'minutes'
+        # Floored to the minute so repeated polls share a cache key / ETag
+        return (pd.Timestamp.now(tz='UTC').tz_localize(None) -
+                pd.Timedelta(**{unit: float(value[:-1])})).floor('min')
+    if value.replace('.', '', 1).isdigit():
+        return pd.Timestamp(float(value), unit='s')
+    stamp = pd.to_datetime(value, errors='coerce')
+    if pd.isna(stamp):
+        raise ValueError(f"Bad 'since' value: {value}")
+    return stamp.tz_convert(None) if stamp.tzinfo else stamp
+
+
+def parse_bbox(value):
+    """'west,south,east,north' -> tuple of floats"""
+    if not value:
+        return None
+    parts = [float(p) for p in str(value).split(',')]
+    if len(parts) != 4:
+        raise ValueError("bbox must be west,south,east,north")
+    return tuple(parts)
+
+
+class EventStore:
+    """
+    Versioned in-memory set of active events, shared by the query API and the
+    push channel.
+
+    update() diffs a new snapshot against the current one by event ID; if
+    anything changed the version is bumped and the added / updated / expired
+    events are appended to a bounded change log (for replay). Each version
+    also gets a column snapshot (ordered newest first) with a KD-tree over
+    lon/lat, so a query is a box lookup plus a few vectorized masks.
+    """
+
+    def __init__(self, max_versions=500):
+        self.version = 0
+        self.events = {}
+        self.log = deque(maxlen=max_versions)   # (version, [change, ...])
+        self._lock = threading.Lock()
+        self._snapshot = self._build_snapshot({})
+
+    def __len__(self):
+        return len(self.events)
+
+    # ---- updates ----
+
+    def update(self, records):
+        """Replace the active set (DataFrame or dicts); returns the list of changes"""
+        current = DeltaPublisher.keyed(records)
+        previous = self.events
+        changes = [{'op': 'add', 'event_id': eid, 'event': rec}
+                   for eid, rec in current.items() if eid not in previous]
+        # Updates keep the prior record so push subscribers can tell when an
+        # event moved into or out of their filters
+        changes += [{'op': 'update', 'event_id': eid, 'event': rec, 'previous': previous[eid]}
+                    for eid, rec in current.items() if eid in previous and previous[eid] != rec]
+        changes += [{'op': 'expire', 'event_id': eid, 'event': previous[eid]}
+                    for eid in previous if eid not in current]
+        if not changes:
+            return []
+
+        snapshot = self._build_snapshot(current)
+        with self._lock:
+            self.version += 1
+            for change in changes:
+                change['version'] = self.version
+            self.events = current
+            self._snapshot = snapshot
+            self.log.append((self.version, changes))
+        return changes
+
+    def load_csv(self, csv_file='combined_disaster_feed.csv'):
+        """Read and enrich a merged feed file into the store"""
+        from risk_engine import DisasterRiskEngine
+
+        df = DisasterRiskEngine.enrich_disaster_data(pd.read_csv(csv_file))
+        # hours_ago drifts on every reload; clients derive age from the event time
+        df = df.drop(columns=['hours_ago'], errors='ignore')
+        return self.update(df.dropna(subset=['lat', 'lon']))
+
+    def changes_since(self, version):
+        """Changes after `version`, or None if the log no longer reaches back that far"""
+        with self._lock:
+            if version == self.version:
+                return []
+            # Client is ahead (store restarted) or behind what the log keeps
+            if version > self.version or not self.log or self.log[0][0] > version + 1:
+                return None
+            return [change for v, batch in self.log if v > version for change in batch]
+
+    # ---- queries ----
+
+    @staticmethod
+    def _build_snapshot(events):
+        ids = list(events)
+        records = [events[eid] for eid in ids]
+        lat = np.array([r.get('lat', np.nan) for r in records], dtype=np.float64)
+        lon = np.array([r.get('lon', np.nan) for r in records], dtype=np.float64)
+        threat = np.array([r.get('threat_score', 0.0) for r in records], dtype=np.float64)
+        when = pd.to_datetime(pd.Series([r.get('time') or r.get('acq_datetime') for r in records],
+                                        dtype=object), errors='coerce')
+        stamps = when.values.astype('datetime64[ns]')
+
+        # Newest first (events without a time last), ties by ID for stable paging
+        # (~ flips the int64 order without overflow; NaT is the minimum so it sorts last)
+        order = np.lexsort((np.array(ids, dtype=str), ~stamps.astype('int64'))) if ids else np.zeros(0, dtype=np.int64)
+        return {
+            'ids': [ids[i] for i in order],
+            'records': [records[i] for i in order],
+            'lat': lat[order], 'lon': lon[order], 'threat': threat[order],
+            'time': stamps[order],
+            'source': np.array([str(records[i].get('source', '')) for i in order], dtype=object),
+            'tree': KDTree(np.column_stack([lon[order], lat[order]])) if len(ids) else None,
+        }
+
+    def query(self, bbox=None, since=None, sources=None, min_threat=None, offset=0, limit=DEFAULT_PAGE_SIZE):
+        """
+        Page of events matching the filters:
+        {'version', 'total', 'offset', 'next_offset', 'events': [...]}
+        """
+        with self._lock:
+            snap, version = self._snapshot, self.version
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        offset = max(0, int(offset))
+
+        n = len(snap['ids'])
+        if bbox is not None and snap['tree'] is not None:
+            west, south, east, north = bbox
+            hits = snap['tree'].range([west, south], [east, north])
+            mask = np.zeros(n, dtype=bool)
+            mask[hits] = True
+        else:
+            mask = np.ones(n, dtype=bool) if bbox is None else np.zeros(n, dtype=bool)
+        if since is not None:
+            mask &= snap['time'] >= np.datetime64(pd.Timestamp(since))
+        if sources:
+            mask &= np.isin(snap['source'], list(sources))
+        if min_threat is not None:
+            mask &= snap['threat'] >= float(min_threat)
+
+        positions = np.flatnonzero(mask)
+        page = positions[offset:offset + limit]
+        return {
+            'version': version,
+            'total': int(len(positions)),
+            'offset': offset,
+            'next_offset': offset + limit if offset + limit < len(positions) else None,
+            'events': [snap['records'][i] for i in page],
+        }
+
+    def matches(self, event, bbox=None, sources=None, min_threat=None):
+        """Same filters as query(), for a single event dict (used by push subscribers)"""
+        if sources and str(event.get('source', '')) not in sources:
+            return False
+        if min_threat is not None and float(event.get('threat_score', 0.0)) < float(min_threat):
+            return False
+        if bbox is not None:
+            west, south, east, north = bbox
+            lat, lon = event.get('lat'), event.get('lon')
+            if lat is None or lon is None or not (west <= lon <= east and south <= lat <= north):
+                return False
+        return True
+
+
+def watch_csv(store, csv_file='combined_disaster_feed.csv', poll_seconds=30, stop=None, on_change=None):
+    """Reload the store whenever the feed file changes (run in a thread)"""
+    stop = stop or threading.Event()
+    last_mtime = None
+    while not stop.is_set():
+        mtime = os.path.getmtime(csv_file) if os.path.exists(csv_file) else None
+        if mtime is not None and mtime != last_mtime:
+            try:
+                changes = store.load_csv(csv_file)
+                last_mtime = mtime
+                if changes:
+                    print(f"🔄 Event store v{store.version}: {len(store)} events ({len(changes)} changes)")
+                    if on_change:
+                        on_change(changes)
+            except (OSError, ValueError, pd.errors.ParserError) as e:
+                print(f"⚠️ Could not reload {csv_file}: {e}")
+        stop.wait(poll_seconds)
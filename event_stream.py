@@ -0,0 +1,247 @@
+import asyncio
+import json
+import os
+from urllib.parse import parse_qs, urlsplit
+
+from event_store import MAX_PAGE_SIZE, EventStore, parse_bbox
+
+DEFAULT_PORT = 8766
+HEARTBEAT_SECONDS = 20
+MAX_QUEUED_BATCHES = 256
+
+
+def _sse(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, separators=(',', ':'), default=str))
+    return ("\n".join(lines) + "\n\n").encode('utf-8')
+
+
+class Subscriber:
+    """One connected client: its filters and a bounded queue of (version, changes) batches"""
+
+    def __init__(self, bbox=None, sources=None, min_threat=None):
+        self.bbox = bbox
+        self.sources = sources
+        self.min_threat = min_threat
+        self.queue = asyncio.Queue(maxsize=MAX_QUEUED_BATCHES)
+        self.after = 0          # highest version already sent
+        self.overflowed = False
+
+    def filters(self):
+        return {'bbox': self.bbox, 'sources': self.sources, 'min_threat': self.min_threat}
+
+
+class EventBroadcaster:
+    """
+    Server-sent events over a shared EventStore, on a single asyncio loop.
+
+    An idle subscriber costs one coroutine waiting on its queue, so hundreds
+    of ops screens can stay connected. Each store version is pushed as one
+    batch of add / update / expire messages filtered per subscriber; the last
+    message of a batch carries `id: <version>`, so a reconnecting EventSource
+    sends Last-Event-ID and gets only what it missed (or a fresh snapshot if
+    the change log no longer reaches back that far). A subscriber that falls
+    too far behind is sent `reset` and disconnected rather than buffered.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or EventStore()
+        self.subscribers = set()
+
+    # ---- fan-out ----
+
+    def _visible(self, changes, sub):
+        """
+        The changes one subscriber should see. An update that moves an event
+        out of its filters is sent as expire (of the record it was shown),
+        one that moves an event in as add.
+        """
+        batch = []
+        for change in changes:
+            shown = self.store.matches(change['event'], **sub.filters())
+            if change['op'] != 'update':
+                if shown:
+                    batch.append(change)
+                continue
+            was_shown = self.store.matches(change['previous'], **sub.filters())
+            if shown and was_shown:
+                batch.append(change)
+            elif was_shown:
+                batch.append(dict(change, op='expire', event=change['previous']))
+            elif shown:
+                batch.append(dict(change, op='add'))
+        return batch
+
+    def publish(self, changes):
+        """Queue one store update for every subscriber (call from the loop)"""
+        if not changes:
+            return
+        version = changes[-1]['version']
+        for sub in list(self.subscribers):
+            if sub.overflowed:
+                continue
+            batch = self._visible(changes, sub)
+            try:
+                sub.queue.put_nowait((version, batch))
+            except asyncio.QueueFull:
+                # Too far behind: drop the backlog and tell the client to resync
+                sub.overflowed = True
+                while not sub.queue.empty():
+                    sub.queue.get_nowait()
+                sub.queue.put_nowait(None)
+
+    async def ingest(self, csv_file='combined_disaster_feed.csv', poll_seconds=30):
+        """Reload the feed file when it changes and push the differences"""
+        loop = asyncio.get_running_loop()
+        last_mtime = None
+        while True:
+            mtime = os.path.getmtime(csv_file) if os.path.exists(csv_file) else None
+            if mtime is not None and mtime != last_mtime:
+                last_mtime = mtime
+                try:
+                    changes = await loop.run_in_executor(None, self.store.load_csv, csv_file)
+                except Exception as e:
+                    print(f"⚠️ Could not reload {csv_file}: {e}")
+                    changes = []
+                if changes:
+                    print(f"📣 v{self.store.version}: {len(changes)} changes -> {len(self.subscribers)} subscribers")
+                    self.publish(changes)
+            await asyncio.sleep(poll_seconds)
+
+    # ---- HTTP ----
+
+    async def _send_snapshot(self, writer, sub):
+        offset, version = 0, self.store.version
+        while True:
+            page = self.store.query(offset=offset, limit=MAX_PAGE_SIZE, **sub.filters())
+            version = page['version']
+            last = page['next_offset'] is None
+            writer.write(_sse('snapshot', {'version': version, 'events': page['events'], 'complete': last},
+                              version if last else None))
+            await writer.drain()
+            if last:
+                return version
+            offset = page['next_offset']
+
+    async def _send_batch(self, writer, version, changes):
+        for i, change in enumerate(changes):
+            last = i == len(changes) - 1
+            writer.write(_sse(change['op'], change['event'], version if last else None))
+        await writer.drain()
+
+    async def _stream(self, reader, writer, sub, last_version):
+        self.subscribers.add(sub)
+        closed = getter = None
+        try:
+            writer.write(b"HTTP/1.1 200 OK\r\n"
+                         b"Content-Type: text/event-stream\r\n"
+                         b"Cache-Control: no-cache\r\n"
+                         b"Connection: keep-alive\r\n"
+                         b"Access-Control-Allow-Origin: *\r\n\r\n"
+                         b"retry: 3000\n\n")
+            replay = self.store.changes_since(last_version) if last_version is not None else None
+            if replay is None:
+                sub.after = await self._send_snapshot(writer, sub)
+            else:
+                for version in sorted({c['version'] for c in replay}):
+                    batch = self._visible([c for c in replay if c['version'] == version], sub)
+                    await self._send_batch(writer, version, batch)
+                sub.after = replay[-1]['version'] if replay else last_version
+
+            # The client never sends anything after the request, so any read
+            # completing means it hung up
+            closed = asyncio.ensure_future(reader.read(1))
+            while True:
+                getter = getter or asyncio.ensure_future(sub.queue.get())
+                done, _ = await asyncio.wait({getter, closed}, timeout=HEARTBEAT_SECONDS,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if closed in done:
+                    return
+                if not done:
+                    writer.write(b": ping\n\n")
+                    await writer.drain()
+                    continue
+                item, getter = getter.result(), None
+                if item is None:
+                    writer.write(_sse('reset', {'version': self.store.version}))
+                    await writer.drain()
+                    return
+                version, batch = item
+                if version <= sub.after:
+                    continue
+                if batch:
+                    await self._send_batch(writer, version, batch)
+                sub.after = version
+        finally:
+            self.subscribers.discard(sub)
+            for task in (closed, getter):
+                if task is not None:
+                    task.cancel()
+
+    async def handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            writer.close()
+            return
+        lines = request.decode('latin-1').split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            writer.close()
+            return
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+
+        url = urlsplit(target)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            if method != 'GET' or url.path not in ('/stream', '/health'):
+                writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            elif url.path == '/health':
+                body = json.dumps({'version': self.store.version, 'events': len(self.store),
+                                   'subscribers': len(self.subscribers)}).encode('utf-8')
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nConnection: close\r\n"
+                             + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            else:
+                try:
+                    sub = Subscriber(
+                        bbox=parse_bbox(params.get('bbox')),
+                        sources=[s for s in params.get('source', '').split(',') if s] or None,
+                        min_threat=float(params['min_threat']) if params.get('min_threat') else None,
+                    )
+                    last = headers.get('last-event-id') or params.get('since_version')
+                    last_version = int(last) if last else None
+                except ValueError as e:
+                    body = json.dumps({'error': str(e)}).encode('utf-8')
+                    writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Type: application/json\r\n"
+                                 + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+                else:
+                    await self._stream(reader, writer, sub, last_version)
+            await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT, csv_file='combined_disaster_feed.csv',
+                    poll_seconds=30):
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        print(f"📡 Event stream on http://{host}:{port}/stream (feed: {csv_file})")
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.ingest(csv_file, poll_seconds))
+
+
+if __name__ == "__main__":
+    import sys
+
+    try:
+        asyncio.run(EventBroadcaster().serve(csv_file=(sys.argv[1:2] or ['combined_disaster_feed.csv'])[0]))
+    except KeyboardInterrupt:
+        print("\n🛑 Event stream stopped")
@@ -0,0 +1,233 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from event_index import event_id
+from spatial_index import KDTree
+
+DEFAULT_FACILITIES_FILE = 'facilities.csv'
+EARTH_RADIUS_KM = 6371.0
+FACILITY_TYPES = ('shelter', 'warehouse', 'erv')
+
+# Planning assumptions when an event has no explicit demand
+SHELTER_RATE = 0.02         # share of the affected population expected to need a shelter bed
+DEFAULT_DEMAND = 100        # beds / units for events without a population estimate
+
+# Up to this many facilities of a type, batched queries use one distance matrix per
+# block of events instead of a tree walk per event
+BRUTE_FORCE_MAX = 20000
+BLOCK_ELEMENTS = 4_000_000
+
+
+def to_xyz(lat, lon):
+    """Lat/lon (degrees) -> points on the unit sphere"""
+    lat, lon = np.radians(np.asarray(lat, dtype=np.float64)), np.radians(np.asarray(lon, dtype=np.float64))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def chord_to_km(chord):
+    """Straight-line distance between unit-sphere points -> great-circle km"""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+def chord_matrix(a, b):
+    """Chord distances between every pair of unit-sphere points (|a - b|^2 = 2 - 2 a.b)"""
+    return np.sqrt(np.maximum(2 - 2 * (a @ b.T), 0))
+
+
+def km_to_chord(km):
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+def load_facilities(csv_file=DEFAULT_FACILITIES_FILE):
+    """
+    Facilities CSV: facility_id, name, type (shelter / warehouse / erv),
+    lat, lon, capacity [, status]. Rows with status other than 'open' are
+    left out.
+    """
+    df = pd.read_csv(csv_file)
+    if 'status' in df.columns:
+        df = df[df['status'].fillna('open').str.lower() == 'open']
+    df = df.dropna(subset=['lat', 'lon'])
+    df['type'] = df['type'].str.lower()
+    df['capacity'] = pd.to_numeric(df.get('capacity', 0), errors='coerce').fillna(0)
+    return df.reset_index(drop=True)
+
+
+def event_demand(event, shelter_rate=SHELTER_RATE, default=DEFAULT_DEMAND):
+    """Beds / units an event needs: explicit `demand`, else a share of population_affected"""
+    if event.get('demand') is not None:
+        return float(event['demand'])
+    people = event.get('population_affected')
+    if people is not None and not (isinstance(people, float) and math.isnan(people)):
+        return float(math.ceil(people * shelter_rate))
+    return float(default)
+
+
+class FacilityIndex:
+    """
+    Shelters, warehouses and ERVs with one KD-tree per facility type.
+
+    Points are stored as unit-sphere xyz, where straight-line (chord)
+    distance orders exactly like great-circle distance, so the plain
+    Euclidean KDTree.knn answers nearest-facility queries without the
+    distortion of lat/lon degrees; distances are converted back to km.
+    """
+
+    def __init__(self, facilities):
+        if isinstance(facilities, str):
+            facilities = load_facilities(facilities)
+        self.facilities = facilities.reset_index(drop=True)
+        self.xyz = to_xyz(self.facilities['lat'], self.facilities['lon'])
+        self.trees = {}
+        self.members = {}
+        for kind, group in self.facilities.groupby('type'):
+            self.members[kind] = group.index.to_numpy()
+            self.trees[kind] = KDTree(to_xyz(group['lat'], group['lon']))
+
+    def __len__(self):
+        return len(self.facilities)
+
+    def nearest(self, lat, lon, k=5, kind='shelter', max_km=None):
+        """(facility row positions, distances in km) of the k nearest of one type, nearest first"""
+        tree = self.trees.get(kind)
+        if tree is None or not len(tree):
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        ids, chords = tree.knn(to_xyz([lat], [lon])[0], min(k, len(tree)))
+        km = chord_to_km(chords)
+        if max_km is not None:
+            keep = km <= max_km
+            ids, km = ids[keep], km[keep]
+        return self.members[kind][ids], km
+
+    def nearest_many(self, lat, lon, k=5, kind='shelter'):
+        """
+        Batched nearest(): (positions, km) arrays of shape (n, k), nearest
+        first. Small facility sets are ranked from a block distance matrix,
+        large ones through the tree.
+        """
+        members = self.members.get(kind, np.zeros(0, dtype=np.int64))
+        xyz = to_xyz(lat, lon)
+        k = min(k, len(members))
+        positions = np.zeros((len(xyz), k), dtype=np.int64)
+        km = np.zeros((len(xyz), k))
+        if not k:
+            return positions, km
+        if len(members) > BRUTE_FORCE_MAX:
+            tree = self.trees[kind]
+            for row, point in enumerate(xyz):
+                ids, chords = tree.knn(point, k)
+                positions[row], km[row] = members[ids], chord_to_km(chords)
+            return positions, km
+
+        fxyz = self.xyz[members]
+        block = max(1, BLOCK_ELEMENTS // len(members))
+        for start in range(0, len(xyz), block):
+            chords = chord_matrix(xyz[start:start + block], fxyz)
+            top = np.argpartition(chords, k - 1, axis=1)[:, :k] if k < len(members) else \
+                np.broadcast_to(np.arange(k), chords.shape).copy()
+            top_chords = np.take_along_axis(chords, top, axis=1)
+            order = np.argsort(top_chords, axis=1, kind='stable')
+            positions[start:start + block] = members[np.take_along_axis(top, order, axis=1)]
+            km[start:start + block] = chord_to_km(np.take_along_axis(top_chords, order, axis=1))
+        return positions, km
+
+    def nearest_table(self, events, k=3, kind='shelter', max_km=None):
+        """One row per (event, candidate facility): event_id, rank, facility columns, distance_km"""
+        rows = []
+        for event in events:
+            eid = event.get('event_id') or event_id(event)
+            positions, km = self.nearest(event['lat'], event['lon'], k, kind, max_km)
+            for rank, (pos, dist) in enumerate(zip(positions, km), 1):
+                facility = self.facilities.iloc[pos]
+                rows.append({'event_id': eid, 'rank': rank, 'facility_id': facility.get('facility_id'),
+                             'facility': facility.get('name'), 'type': kind,
+                             'distance_km': round(float(dist), 1)})
+        return pd.DataFrame(rows)
+
+    def assign(self, events, kind='shelter', k=8, max_km=None, demand=event_demand):
+        """
+        Capacity-constrained assignment of every event's demand to facilities
+        of one type, greedy by distance: all (event, facility) candidate pairs
+        from the k nearest are taken shortest first, each allocating as much
+        as both sides still have. Events left short widen their search (k
+        doubles) and the greedy pass repeats for them only; once k nears the
+        number of facilities, the last pass takes every facility with
+        capacity left from one vectorized distance matrix.
+
+        Returns (assignments DataFrame, {event_id: unmet demand}).
+        """
+        events = list(events)
+        ids = [e.get('event_id') or event_id(e) for e in events]
+        need = np.array([demand(e) for e in events], dtype=np.float64)
+        remaining = self.facilities['capacity'].to_numpy(dtype=np.float64).copy()
+        n_kind = len(self.trees.get(kind, ()))
+        allocations = []
+        pending = np.flatnonzero(need > 0)
+        k = min(k, n_kind)
+        tried = np.zeros(len(events), dtype=np.int64)
+
+        members = self.members.get(kind, np.zeros(0, dtype=np.int64))
+        while len(pending) and n_kind:
+            if k * 4 < n_kind:
+                # Candidate pairs beyond what each event was already offered
+                positions, km = self.nearest_many([events[i]['lat'] for i in pending],
+                                                  [events[i]['lon'] for i in pending], k, kind)
+                fresh = np.arange(k)[None, :] >= tried[pending][:, None]
+                if max_km is not None:
+                    fresh &= km <= max_km
+                ev = np.broadcast_to(pending[:, None], fresh.shape)[fresh]
+                fac, dist = positions[fresh], km[fresh]
+                tried[pending] = np.where(km[:, -1] <= max_km, k, n_kind) if max_km is not None else k
+            else:
+                # Wide search: every facility that still has capacity, in one distance matrix
+                open_ = members[remaining[members] > 0]
+                if not len(open_):
+                    break
+                exyz = to_xyz([events[i]['lat'] for i in pending], [events[i]['lon'] for i in pending])
+                km = chord_to_km(chord_matrix(exyz, self.xyz[open_]))
+                ev = np.repeat(pending, len(open_))
+                fac = np.tile(open_, len(pending))
+                dist = km.ravel()
+                if max_km is not None:
+                    keep = dist <= max_km
+                    ev, fac, dist = ev[keep], fac[keep], dist[keep]
+                tried[pending] = n_kind
+            if not len(ev):
+                break
+
+            order = np.argsort(dist, kind='stable')
+            for i, f, d in zip(ev[order].tolist(), fac[order].tolist(), dist[order].tolist()):
+                if need[i] <= 0 or remaining[f] <= 0:
+                    continue
+                amount = min(need[i], remaining[f])
+                need[i] -= amount
+                remaining[f] -= amount
+                allocations.append((i, f, d, amount))
+
+            pending = pending[(need[pending] > 0) & (tried[pending] < n_kind)]
+            k = min(k * 2, n_kind)
+
+        facility_ids = self.facilities.get('facility_id', pd.Series(index=self.facilities.index)).tolist()
+        names = self.facilities.get('name', pd.Series(index=self.facilities.index)).tolist()
+        rows = [{'event_id': ids[i], 'event_type': events[i].get('type') or events[i].get('source'),
+                 'facility_id': facility_ids[f], 'facility': names[f], 'type': kind,
+                 'distance_km': round(dist, 1), 'allocated': amount, 'facility_remaining': float(remaining[f])}
+                for i, f, dist, amount in allocations]
+        unmet = {ids[i]: float(need[i]) for i in range(len(events)) if need[i] > 0}
+        return pd.DataFrame(rows), unmet
+
+
+if __name__ == "__main__":
+    import sys
+
+    from red_cross_tool import RedCrossDisasterTool
+
+    index = FacilityIndex(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FACILITIES_FILE)
+    tool = RedCrossDisasterTool(subscriptions=None)
+    events = tool.shelter_events(tool.events_from_snapshot(pd.read_csv('combined_disaster_feed.csv')))
+    assignments, unmet = index.assign(events)
+    print(assignments.to_string(index=False) if not assignments.empty else "No assignments")
+    for eid, short in unmet.items():
+        print(f"⚠️ {eid}: {short:,.0f} beds unassigned")
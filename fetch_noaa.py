@@ -1,6 +1,9 @@
 import requests
 import pandas as pd
 
+from instrumentation import stage
+from upstream_proxy import feed_url
+
 def get_centroid(geometry):
     """Calculate centroid for polygon or return point coordinates."""
     if not geometry:
@@ -22,26 +25,31 @@ def get_centroid(geometry):
     return None, None
 
 def fetch_noaa_alerts():
-    url = "https://api.weather.gov/alerts/active"
-    r = requests.get(url, timeout=30)
-    r.raise_for_status()
-    js = r.json()
-    rows = []
-    for feat in js["features"]:
-        props = feat["properties"]
-        geom = feat["geometry"]
-        
-        lat, lon = get_centroid(geom)
-        if lat is not None and lon is not None:
-            rows.append({
-                "source": "NOAA",
-                "event": props.get("event"),
-                "severity": props.get("severity"),
-                "area": props.get("areaDesc"),
-                "headline": props.get("headline"),
-                "lat": lat,
-                "lon": lon
-            })
+    url = feed_url("noaa/alerts")
+    with stage("fetch", "noaa") as span:
+        r = requests.get(url, timeout=30)
+        r.raise_for_status()
+        span.bytes_in = len(r.content)
+    with stage("parse", "noaa") as span:
+        js = r.json()
+        span.bytes_in, span.rows_in = len(r.content), len(js["features"])
+        rows = []
+        for feat in js["features"]:
+            props = feat["properties"]
+            geom = feat["geometry"]
+            
+            lat, lon = get_centroid(geom)
+            if lat is not None and lon is not None:
+                rows.append({
+                    "source": "NOAA",
+                    "event": props.get("event"),
+                    "severity": props.get("severity"),
+                    "area": props.get("areaDesc"),
+                    "headline": props.get("headline"),
+                    "lat": lat,
+                    "lon": lon
+                })
+        span.rows_out = len(rows)
     return pd.DataFrame(rows)
 
 if __name__ == "__main__":
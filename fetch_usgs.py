@@ -1,31 +1,39 @@
 import requests
 import pandas as pd
 
+from instrumentation import stage
+from upstream_proxy import feed_url
+
 def fetch_usgs_earthquakes():
     """
     Fetch recent USGS earthquakes (past 7 days, M ≥ 2.5)
     Returns a DataFrame with lat/lon/magnitude/place.
     """
-    url = "https://earthquake.usgs.gov/earthquakes/feed/v1.0/summary/2.5_week.geojson"
-    r = requests.get(url, timeout=30)
-    r.raise_for_status()
-    js = r.json()
+    url = feed_url("usgs/2.5_week")
+    with stage("fetch", "usgs") as span:
+        r = requests.get(url, timeout=30)
+        r.raise_for_status()
+        span.bytes_in = len(r.content)
 
-    rows = []
-    for feat in js["features"]:
-        props = feat["properties"]
-        geom = feat["geometry"]
-        if geom and geom.get("type") == "Point":
-            coords = geom["coordinates"]
-            rows.append({
-                "source": "USGS",
-                "event": "Earthquake",
-                "magnitude": props.get("mag"),
-                "place": props.get("place"),
-                "time": pd.to_datetime(props.get("time"), unit="ms"),
-                "lat": coords[1],
-                "lon": coords[0]
-            })
+    with stage("parse", "usgs") as span:
+        js = r.json()
+        span.bytes_in, span.rows_in = len(r.content), len(js["features"])
+        rows = []
+        for feat in js["features"]:
+            props = feat["properties"]
+            geom = feat["geometry"]
+            if geom and geom.get("type") == "Point":
+                coords = geom["coordinates"]
+                rows.append({
+                    "source": "USGS",
+                    "event": "Earthquake",
+                    "magnitude": props.get("mag"),
+                    "place": props.get("place"),
+                    "time": pd.to_datetime(props.get("time"), unit="ms"),
+                    "lat": coords[1],
+                    "lon": coords[0]
+                })
+        span.rows_out = len(rows)
     return pd.DataFrame(rows)
 
 if __name__ == "__main__":
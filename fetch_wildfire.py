@@ -2,17 +2,24 @@ import requests
 import pandas as pd
 from io import StringIO
 
+from instrumentation import stage
+from upstream_proxy import feed_url
+
 def fetch_active_wildfires():
     """
     Fetch current U.S. wildfires using NASA FIRMS API
     """
     # NASA FIRMS API requires registration but has a public endpoint for recent data
-    url = "https://firms.modaps.eosdis.nasa.gov/data/active_fire/modis-c6.1/csv/MODIS_C6_1_USA_contiguous_and_Hawaii_24h.csv"
+    url = feed_url("firms/usa_24h")
     
     try:
-        r = requests.get(url, timeout=30)
-        r.raise_for_status()
-        df = pd.read_csv(StringIO(r.text))
+        with stage("fetch", "wildfire") as span:
+            r = requests.get(url, timeout=30)
+            r.raise_for_status()
+            span.bytes_in = len(r.content)
+        with stage("parse", "wildfire") as span:
+            df = pd.read_csv(StringIO(r.text))
+            span.bytes_in, span.rows_out = len(r.content), len(df)
         
         # Rename columns to match our schema
         df = df.rename(columns={"latitude": "lat", "longitude": "lon"})
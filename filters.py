@@ -1,12 +1,15 @@
 import pandas as pd
 from datetime import datetime, timedelta
 
-def filter_data(df, source=None, event=None, severity=None, hours_ago=None):
+def filter_data(df, source=None, event=None, severity=None, hours_ago=None, state=None, region=None):
     """
-    Filter the combined dataset by source, event type, severity, or time.
+    Filter the combined dataset by source, event type, severity, time,
+    state ('CA' / '06' / a list of them) or named region (see fips_index.REGIONS).
     Returns a new filtered DataFrame.
     """
     out = df.copy()
+    if state or region:
+        out = filter_states(out, state, region)
     if source:
         out = out[out["source"].str.contains(source, case=False, na=False)]
     if event:
@@ -28,6 +31,21 @@ def filter_data(df, source=None, event=None, severity=None, hours_ago=None):
     
     return out
 
+def filter_states(df, state=None, region=None):
+    """
+    Events in the given states and/or region. Uses the state_fips column
+    written by merge_feeds, labeling the rows on the fly if it is missing.
+    """
+    from fips_index import REGIONS, assign_fips, fips_codes, state_fips
+
+    wanted = [state] if isinstance(state, str) else list(state or [])
+    if region:
+        wanted += REGIONS[region]
+    if "state_fips" not in df.columns:
+        df = assign_fips(df)
+    codes = {state_fips(s) for s in wanted}
+    return df[pd.Series(fips_codes(df["state_fips"]), index=df.index).isin(codes).to_numpy()]
+
 def filter_last_24h(df):
     """Quick filter for last 24 hours"""
     return filter_data(df, hours_ago=24)
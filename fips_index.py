@@ -0,0 +1,277 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import requests
+
+COUNTIES_URL = "https://raw.githubusercontent.com/plotly/datasets/master/geojson-counties-fips.json"
+COUNTIES_FILE = "geojson-counties-fips.json"
+DEFAULT_CELL_DEG = 0.1
+
+STATE_FIPS = {
+    '01': 'AL', '02': 'AK', '04': 'AZ', '05': 'AR', '06': 'CA', '08': 'CO', '09': 'CT',
+    '10': 'DE', '11': 'DC', '12': 'FL', '13': 'GA', '15': 'HI', '16': 'ID', '17': 'IL',
+    '18': 'IN', '19': 'IA', '20': 'KS', '21': 'KY', '22': 'LA', '23': 'ME', '24': 'MD',
+    '25': 'MA', '26': 'MI', '27': 'MN', '28': 'MS', '29': 'MO', '30': 'MT', '31': 'NE',
+    '32': 'NV', '33': 'NH', '34': 'NJ', '35': 'NM', '36': 'NY', '37': 'NC', '38': 'ND',
+    '39': 'OH', '40': 'OK', '41': 'OR', '42': 'PA', '44': 'RI', '45': 'SC', '46': 'SD',
+    '47': 'TN', '48': 'TX', '49': 'UT', '50': 'VT', '51': 'VA', '53': 'WA', '54': 'WV',
+    '55': 'WI', '56': 'WY', '72': 'PR',
+}
+STATE_CODES = {abbr: fips for fips, abbr in STATE_FIPS.items()}
+
+# Named regions used by the regional map views
+REGIONS = {
+    'california': ['CA'],
+    'alaska': ['AK'],
+    'hawaii': ['HI'],
+    'eastern_us': ['AL', 'CT', 'DC', 'DE', 'FL', 'GA', 'IL', 'IN', 'KY', 'MA', 'MD', 'ME', 'MI',
+                   'MS', 'NC', 'NH', 'NJ', 'NY', 'OH', 'PA', 'RI', 'SC', 'TN', 'VA', 'VT', 'WI', 'WV'],
+}
+
+
+def state_fips(state):
+    """'CA', 'ca' or '06' -> '06'"""
+    state = str(state).strip()
+    if state.isdigit():
+        return state.zfill(2)
+    code = STATE_CODES.get(state.upper())
+    if code is None:
+        raise ValueError(f"Unknown state: {state}")
+    return code
+
+
+def fips_codes(values, width=2):
+    """Zero-padded FIPS strings from a column that may have been read back as numbers ('' if missing)"""
+    numbers = pd.to_numeric(pd.Series(values), errors='coerce')
+    return np.array(['' if pd.isna(v) else str(int(v)).zfill(width) for v in numbers], dtype=object)
+
+
+def load_counties(path=COUNTIES_FILE, url=COUNTIES_URL):
+    """County polygons (GeoJSON FeatureCollection keyed by 5-digit FIPS), downloaded once and cached"""
+    if not os.path.exists(path):
+        print(f"⬇️ Downloading county polygons to {path}")
+        r = requests.get(url, timeout=60)
+        r.raise_for_status()
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(r.content)
+        os.replace(tmp, path)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _member(values, sorted_keys):
+    """np.isin against an already sorted, unique key array"""
+    if not len(sorted_keys):
+        return np.zeros(len(values), dtype=bool)
+    pos = np.clip(np.searchsorted(sorted_keys, values), 0, len(sorted_keys) - 1)
+    return sorted_keys[pos] == values
+
+
+def _expand(count):
+    """Flatten ranges of the given lengths: (range number, offset within the range) per element"""
+    rep = np.repeat(np.arange(len(count)), count)
+    first = np.cumsum(count) - count
+    return rep, np.arange(len(rep)) - first[rep]
+
+
+def _cast(lat, lon, targets, start, end, edges, out):
+    """
+    Even-odd ray cast of each point against the edge run [start, end) of its
+    cell, flattened into one array of (point, edge) pairs. Runs are grouped
+    by county; out[target] gets the county with odd parity, if any.
+    """
+    rep, off = _expand(end - start)
+    e = edges[start[rep] + off]
+    py, px = lat[rep], lon[rep]
+    x1, y1, x2, y2 = e[:, 0], e[:, 1], e[:, 2], e[:, 3]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cross = ((y1 > py) != (y2 > py)) & (px < x1 + (py - y1) * (x2 - x1) / (y2 - y1))
+    county = e[:, 4].astype(np.int64)
+    groups = np.flatnonzero((np.diff(rep, prepend=-1) != 0) | (np.diff(county, prepend=-1) != 0))
+    if not len(groups):
+        return
+    odd = np.add.reduceat(cross.astype(np.int32), groups) % 2 == 1
+    out[targets[rep[groups[odd]]]] = county[groups[odd]]
+
+
+class CountyIndex:
+    """
+    Point -> county lookup over a grid of `cell_deg` cells.
+
+    Built once from the county polygons:
+      * cells no county boundary passes through are labeled outright
+        (the common case; a point there is one array lookup);
+      * every other cell keeps the edges of each county whose bounding box
+        covers it and whose latitude range overlaps the cell's band, which
+        is all a horizontal ray from a point in that cell can cross.
+    Batch lookups group points by cell and ray-cast each group against that
+    cell's edges in one (points x edges) array operation.
+    """
+
+    ARRAYS = ('fips', 'names', 'edges', 'cell_keys', 'cell_start', 'cell_end',
+              'interior_keys', 'interior_county')
+
+    def __init__(self, counties=None, cell_deg=DEFAULT_CELL_DEG):
+        self.cell_deg = cell_deg
+        if counties is None:        # filled in by load()
+            return
+        features = [f for f in counties['features'] if f.get('geometry')]
+        self.fips = np.array([str(f.get('id') or f['properties'].get('GEO_ID', '')[-5:]).zfill(5)
+                              for f in features])
+        # Fixed-width strings, so the saved index loads without pickle
+        self.names = np.array([str(f['properties'].get('NAME') or '') for f in features], dtype=str)
+        self._build(features)
+
+    def save(self, path):
+        np.savez(path, cell_deg=self.cell_deg, **{name: getattr(self, name) for name in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            index = cls(cell_deg=float(data['cell_deg']))
+            for name in cls.ARRAYS:
+                setattr(index, name, data[name])
+        return index
+
+    def _key(self, i, j):
+        return (np.asarray(i, dtype=np.int64) + 1000) * 4000 + (np.asarray(j, dtype=np.int64) + 2000)
+
+    def _cell(self, lat, lon):
+        return (np.floor(np.asarray(lat) / self.cell_deg).astype(np.int64),
+                np.floor(np.asarray(lon) / self.cell_deg).astype(np.int64))
+
+    def _build(self, features):
+        keys, edges, boundary = [], [], []
+        for c, feature in enumerate(features):
+            geometry = feature['geometry']
+            polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+            # GeoJSON rings are closed, so consecutive vertices give every edge
+            rings = [np.asarray(ring, dtype=np.float64)[:, :2] for polygon in polygons for ring in polygon]
+            x1 = np.concatenate([r[:-1, 0] for r in rings])
+            y1 = np.concatenate([r[:-1, 1] for r in rings])
+            x2 = np.concatenate([r[1:, 0] for r in rings])
+            y2 = np.concatenate([r[1:, 1] for r in rings])
+
+            # Cells each edge's bounding box touches are boundary cells
+            ei0, ej0 = self._cell(np.minimum(y1, y2), np.minimum(x1, x2))
+            ei1, ej1 = self._cell(np.maximum(y1, y2), np.maximum(x1, x2))
+            nj = ej1 - ej0 + 1
+            rep, off = _expand((ei1 - ei0 + 1) * nj)
+            boundary.append(self._key(ei0[rep] + off // nj[rep], ej0[rep] + off % nj[rep]))
+
+            # Replicate each edge into every lat band it spans x every lon column
+            # of the county up to its own (an eastward ray can't reach it further east)
+            j0 = self._cell(0, x1.min())[1]
+            ncols = ej1 - j0 + 1
+            rep, off = _expand((ei1 - ei0 + 1) * ncols)
+            keys.append(self._key(ei0[rep] + off // ncols[rep], j0 + off % ncols[rep]))
+            edges.append(np.column_stack([x1[rep], y1[rep], x2[rep], y2[rep],
+                                          np.full(len(rep), c, dtype=np.float64)]))
+
+        keys = np.concatenate(keys) if keys else np.zeros(0, dtype=np.int64)
+        edges = np.vstack(edges) if edges else np.zeros((0, 5))
+        boundary_keys = np.unique(np.concatenate(boundary)) if boundary else np.zeros(0, dtype=np.int64)
+        order = np.lexsort((edges[:, 4], keys))
+        keys, edges = keys[order], edges[order]
+        cell_keys, cell_start = np.unique(keys, return_index=True)
+        cell_end = np.append(cell_start[1:], len(keys))
+
+        # Cells no boundary crosses lie wholly inside one county (or none):
+        # label them by casting from their centers
+        free = np.flatnonzero(~_member(cell_keys, boundary_keys))
+        i, j = cell_keys[free] // 4000 - 1000, cell_keys[free] % 4000 - 2000
+        county = np.full(len(free), -1, dtype=np.int64)
+        _cast((i + 0.5) * self.cell_deg, (j + 0.5) * self.cell_deg, np.arange(len(free)),
+              cell_start[free], cell_end[free], edges, county)
+        inside = county >= 0
+        self.interior_keys, self.interior_county = cell_keys[free[inside]], county[inside]
+
+        # Only boundary cells need their edges at lookup time
+        keep = _member(keys, boundary_keys)
+        keys, self.edges = keys[keep], edges[keep]
+        self.cell_keys, self.cell_start = np.unique(keys, return_index=True)
+        self.cell_end = np.append(self.cell_start[1:], len(keys))
+
+    def lookup(self, lat, lon):
+        """Index into self.fips for each point (-1 where no county contains it)"""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        out = np.full(lat.shape, -1, dtype=np.int64)
+        valid = np.isfinite(lat) & np.isfinite(lon)
+        i, j = self._cell(np.where(valid, lat, 0), np.where(valid, lon, 0))
+        keys = self._key(i, j)
+
+        # Interior cells: one searchsorted for the whole batch
+        inner = valid & _member(keys, self.interior_keys)
+        if inner.any():
+            out[inner] = self.interior_county[np.searchsorted(self.interior_keys, keys[inner])]
+
+        # Boundary cells: ray-cast against the edges registered for the point's cell
+        todo = np.flatnonzero(valid & ~inner)
+        hit = _member(keys[todo], self.cell_keys)
+        todo = todo[hit]
+        if len(todo):
+            cells = np.searchsorted(self.cell_keys, keys[todo])
+            for chunk in range(0, len(todo), 20000):     # bounds the (point, edge) pair arrays
+                sel = slice(chunk, chunk + 20000)
+                _cast(lat[todo[sel]], lon[todo[sel]], todo[sel],
+                      self.cell_start[cells[sel]], self.cell_end[cells[sel]], self.edges, out)
+        return out
+
+    def assign(self, df, lat_col='lat', lon_col='lon'):
+        """Copy of df with county_fips, state_fips, state and county columns"""
+        idx = self.lookup(df[lat_col].to_numpy(dtype=np.float64), df[lon_col].to_numpy(dtype=np.float64))
+        found = idx >= 0
+        county_fips = np.where(found, self.fips[np.where(found, idx, 0)], None)
+        out = df.copy()
+        out['county_fips'] = county_fips
+        out['state_fips'] = [f[:2] if f else None for f in county_fips]
+        out['state'] = [STATE_FIPS.get(s) if s else None for s in out['state_fips']]
+        out['county'] = np.where(found, self.names[np.where(found, idx, 0)], None)
+        return out
+
+
+_default_index = None
+
+
+def default_index(path=COUNTIES_FILE):
+    """
+    CountyIndex over the cached county file. The built index is saved next
+    to it (<file>.npz) and reused until the polygons change.
+    """
+    global _default_index
+    if _default_index is None:
+        cached = path + ".npz"
+        if os.path.exists(cached) and os.path.exists(path) and os.path.getmtime(cached) >= os.path.getmtime(path):
+            try:
+                _default_index = CountyIndex.load(cached)
+            except ValueError:      # saved by an older version with pickled names
+                _default_index = None
+        if _default_index is None:
+            _default_index = CountyIndex(load_counties(path))
+            _default_index.save(cached)
+    return _default_index
+
+
+def assign_fips(df, index=None):
+    """Add county_fips / state_fips / state / county columns to a feed DataFrame"""
+    return (index or default_index()).assign(df)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    import pandas as pd
+
+    csv_file = sys.argv[1] if len(sys.argv) > 1 else 'combined_disaster_feed.csv'
+    index = default_index()
+    df = pd.read_csv(csv_file)
+    start = time.perf_counter()
+    df = assign_fips(df, index)
+    print(f"🗺️ Labeled {df['county_fips'].notna().sum()}/{len(df)} events in "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms")
+    print(df['state'].value_counts().head(10).to_string())
@@ -0,0 +1,267 @@
+import json
+import math
+
+import numpy as np
+
+from event_index import DEFAULT_CELL_DEG, cells_for_radius, event_id, grid_cell
+
+DEFAULT_SUBSCRIPTIONS_FILE = 'chapter_subscriptions.geojson'
+
+
+def _rings(geometry):
+    """All rings of a Polygon / MultiPolygon as (n, 2) lon/lat arrays"""
+    if geometry['type'] == 'Polygon':
+        polygons = [geometry['coordinates']]
+    elif geometry['type'] == 'MultiPolygon':
+        polygons = geometry['coordinates']
+    else:
+        raise ValueError(f"Unsupported fence geometry: {geometry['type']}")
+    return [np.asarray(ring, dtype=np.float64)[:, :2] for polygon in polygons for ring in polygon]
+
+
+def points_in_rings(lon, lat, rings):
+    """
+    Even-odd point-in-polygon for arrays of points against a set of rings
+    (holes and multipolygon parts fall out of the parity rule)
+    """
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    inside = np.zeros(lon.shape, dtype=bool)
+    for ring in rings:
+        x1, y1 = ring[:, 0], ring[:, 1]
+        x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+        # (points, edges): edge straddles the point's latitude and is crossed east of it
+        py, px = lat[:, None], lon[:, None]
+        straddles = (y1 > py) != (y2 > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cross_x = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= (np.count_nonzero(straddles & (px < cross_x), axis=1) % 2).astype(bool)
+    return inside
+
+
+class Geofence:
+    """
+    One chapter subscription: a polygon or a circle, plus optional filters.
+
+    event_types matches the NWS `event`, the Red Cross `type`
+    (WEATHER_EMERGENCY / EARTHQUAKE / WILDFIRE) or the `source`.
+    thresholds is {field: minimum} (e.g. {'magnitude': 5.0, 'frp': 300});
+    a threshold only applies to events that carry that field, so one fence
+    can ask for "M5+ quakes and every tornado warning".
+    """
+
+    def __init__(self, fence_id, chapter, geometry=None, center=None, radius_km=None,
+                 event_types=None, thresholds=None, contact=None):
+        if geometry is None and (center is None or radius_km is None):
+            raise ValueError(f"Fence {fence_id} needs a polygon geometry or a center and radius_km")
+        self.fence_id = fence_id
+        self.chapter = chapter
+        self.contact = contact
+        self.event_types = set(event_types) if event_types else None
+        self.thresholds = dict(thresholds or {})
+        self.center = tuple(center) if center is not None else None     # (lat, lon)
+        self.radius_km = float(radius_km) if radius_km is not None else None
+        self.geometry = geometry
+        self.rings = _rings(geometry) if geometry is not None else None
+        if self.rings is not None:
+            allpts = np.vstack(self.rings)
+            self.bounds = (allpts[:, 0].min(), allpts[:, 1].min(), allpts[:, 0].max(), allpts[:, 1].max())
+        else:
+            dlat = self.radius_km / 111.0
+            dlon = self.radius_km / (111.0 * max(math.cos(math.radians(self.center[0])), 0.01))
+            self.bounds = (self.center[1] - dlon, self.center[0] - dlat, self.center[1] + dlon, self.center[0] + dlat)
+
+    def cells(self, cell_deg):
+        """Grid cells the fence touches (bounding box of the polygon or circle)"""
+        if self.rings is None:
+            return cells_for_radius(self.center[0], self.center[1], self.radius_km, cell_deg)
+        west, south, east, north = self.bounds
+        i0, j0 = grid_cell(south, west, cell_deg)
+        i1, j1 = grid_cell(north, east, cell_deg)
+        return [(i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)]
+
+    def in_bounds(self, lat, lon):
+        west, south, east, north = self.bounds
+        return (lon >= west) & (lon <= east) & (lat >= south) & (lat <= north)
+
+    def accepts(self, event):
+        """Type and threshold filters (geometry is checked by the index)"""
+        if self.event_types is not None and not (
+                self.event_types & {event.get('event'), event.get('type'), event.get('source')}):
+            return False
+        for field, minimum in self.thresholds.items():
+            value = event.get(field)
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            if float(value) < minimum:
+                return False
+        return True
+
+    def contains(self, lat, lon):
+        """Vectorized geometry test for arrays of points"""
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        if self.rings is not None:
+            return points_in_rings(lon, lat, self.rings)
+        clat, clon = np.radians(self.center[0]), np.radians(self.center[1])
+        plat, plon = np.radians(lat), np.radians(lon)
+        a = (np.sin((plat - clat) / 2) ** 2 +
+             np.cos(clat) * np.cos(plat) * np.sin((plon - clon) / 2) ** 2)
+        return 6371.0 * 2 * np.arcsin(np.sqrt(np.minimum(1.0, a))) <= self.radius_km
+
+    def to_feature(self):
+        props = {'fence_id': self.fence_id, 'chapter': self.chapter}
+        if self.contact:
+            props['contact'] = self.contact
+        if self.event_types:
+            props['event_types'] = sorted(self.event_types)
+        if self.thresholds:
+            props['thresholds'] = self.thresholds
+        if self.rings is None:
+            props['radius_km'] = self.radius_km
+            geometry = {'type': 'Point', 'coordinates': [self.center[1], self.center[0]]}
+        else:
+            geometry = self.geometry
+        return {'type': 'Feature', 'properties': props, 'geometry': geometry}
+
+    @classmethod
+    def from_feature(cls, feature, default_id=None):
+        """GeoJSON Feature: Polygon/MultiPolygon, or a Point with properties.radius_km"""
+        props = feature.get('properties') or {}
+        geometry = feature['geometry']
+        fence_id = props.get('fence_id') or default_id
+        kwargs = dict(event_types=props.get('event_types'), thresholds=props.get('thresholds'),
+                      contact=props.get('contact'))
+        if geometry['type'] == 'Point':
+            lon, lat = geometry['coordinates'][:2]
+            return cls(fence_id, props.get('chapter'), center=(lat, lon), radius_km=props['radius_km'], **kwargs)
+        return cls(fence_id, props.get('chapter'), geometry=geometry, **kwargs)
+
+
+class SubscriptionIndex:
+    """
+    Chapter geofences indexed by grid cell.
+
+    Each fence is registered in every cell its bounding box touches, so an
+    event is only tested against the fences listed in its own cell; the cost
+    per event depends on how many fences overlap that spot, not on how many
+    chapters exist nationally.
+    """
+
+    def __init__(self, cell_deg=DEFAULT_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.fences = {}        # fence_id -> Geofence
+        self.cells = {}         # (i, j) -> set(fence_id)
+        self._fence_cells = {}
+
+    def __len__(self):
+        return len(self.fences)
+
+    def add(self, fence):
+        if fence.fence_id in self.fences:
+            self.remove(fence.fence_id)
+        self.fences[fence.fence_id] = fence
+        cells = fence.cells(self.cell_deg)
+        self._fence_cells[fence.fence_id] = cells
+        for cell in cells:
+            self.cells.setdefault(cell, set()).add(fence.fence_id)
+        return fence.fence_id
+
+    def remove(self, fence_id):
+        fence = self.fences.pop(fence_id, None)
+        for cell in self._fence_cells.pop(fence_id, ()):
+            ids = self.cells.get(cell)
+            if ids is not None:
+                ids.discard(fence_id)
+                if not ids:
+                    del self.cells[cell]
+        return fence
+
+    def match(self, event):
+        """Fences (in fence_id order) that should be notified about one event dict"""
+        lat, lon = event.get('lat'), event.get('lon')
+        if lat is None or lon is None or math.isnan(lat) or math.isnan(lon):
+            return []
+        hits = []
+        for fid in sorted(self.cells.get(grid_cell(lat, lon, self.cell_deg), ())):
+            fence = self.fences[fid]
+            if fence.in_bounds(lat, lon) and fence.accepts(event) and fence.contains(lat, lon)[0]:
+                hits.append(fence)
+        return hits
+
+    def match_events(self, events):
+        """
+        Batch matching for a list of event dicts (or a DataFrame): events are
+        grouped by cell and each candidate fence tests its group in one
+        vectorized call. Returns [(event_index, fence), ...].
+        """
+        if hasattr(events, 'to_dict'):
+            events = events.to_dict('records')
+        by_cell = {}
+        for i, event in enumerate(events):
+            lat, lon = event.get('lat'), event.get('lon')
+            if lat is None or lon is None or math.isnan(lat) or math.isnan(lon):
+                continue
+            by_cell.setdefault(grid_cell(lat, lon, self.cell_deg), []).append(i)
+
+        matches = []
+        for cell, members in by_cell.items():
+            fids = self.cells.get(cell)
+            if not fids:
+                continue
+            lat = np.array([events[i]['lat'] for i in members], dtype=np.float64)
+            lon = np.array([events[i]['lon'] for i in members], dtype=np.float64)
+            for fid in sorted(fids):
+                fence = self.fences[fid]
+                # Cheap bounding-box cut before the exact geometry test
+                near = np.flatnonzero(fence.in_bounds(lat, lon))
+                if not len(near):
+                    continue
+                inside = near[fence.contains(lat[near], lon[near])]
+                matches.extend((members[k], fence) for k in inside if fence.accepts(events[members[k]]))
+        matches.sort(key=lambda m: (m[0], m[1].fence_id))
+        return matches
+
+    def notifications(self, events):
+        """{chapter: [event, ...]} with each event listed once per chapter"""
+        if hasattr(events, 'to_dict'):
+            events = events.to_dict('records')
+        out, seen = {}, set()
+        for i, fence in self.match_events(events):
+            key = (fence.chapter, i)
+            if key in seen:
+                continue
+            seen.add(key)
+            event = dict(events[i])
+            event.setdefault('event_id', event_id(event))
+            event['fence_id'] = fence.fence_id
+            out.setdefault(fence.chapter, []).append(event)
+        return out
+
+    # ---- persistence ----
+
+    @classmethod
+    def load(cls, path=DEFAULT_SUBSCRIPTIONS_FILE, cell_deg=DEFAULT_CELL_DEG):
+        with open(path, encoding='utf-8') as f:
+            collection = json.load(f)
+        index = cls(cell_deg)
+        for n, feature in enumerate(collection.get('features', [])):
+            index.add(Geofence.from_feature(feature, default_id=f"fence-{n}"))
+        return index
+
+    def save(self, path=DEFAULT_SUBSCRIPTIONS_FILE):
+        collection = {'type': 'FeatureCollection',
+                      'features': [self.fences[fid].to_feature() for fid in sorted(self.fences)]}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(collection, f)
+
+
+if __name__ == "__main__":
+    import sys
+
+    import pandas as pd
+
+    index = SubscriptionIndex.load(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SUBSCRIPTIONS_FILE)
+    df = pd.read_csv(sys.argv[2] if len(sys.argv) > 2 else 'combined_disaster_feed.csv')
+    for chapter, events in sorted(index.notifications(df.dropna(subset=['lat', 'lon'])).items()):
+        print(f"📨 {chapter}: {len(events)} events")
@@ -0,0 +1,307 @@
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+
+import pandas as pd
+from branca.element import Element, Template
+from folium.map import Layer
+
+from event_index import ensure_event_ids
+
+# Client-side helpers shared by every GeoJsonPointLayer on the page.
+# Styles are "specs": a constant, or {field, map|breaks|scale, default}
+# resolved per feature in the browser.
+HELPERS_JS = r"""
+<script>
+function dstValue(spec, props) {
+    if (spec === null || typeof spec !== 'object') return spec;
+    var v = props[spec.field];
+    if (spec.map) return (v in spec.map) ? spec.map[v] : spec['default'];
+    if (spec.breaks) {
+        for (var i = 0; i < spec.breaks.length; i++) {
+            if (v >= spec.breaks[i][0]) return spec.breaks[i][1];
+        }
+        return spec['default'];
+    }
+    if (v === null || v === undefined) return spec['default'];
+    return spec.scale ? v * spec.scale : v;
+}
+function dstEscape(v) {
+    return String(v).replace(/[&<>"]/g, function(c) {
+        return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'}[c];
+    });
+}
+function dstFill(template, props) {
+    return template.replace(/\{(\w+)\}/g, function(_, k) {
+        var v = props[k];
+        return (v === null || v === undefined) ? 'N/A' : dstEscape(v);
+    });
+}
+function dstPoint(feature, latlng, style) {
+    var opts = {};
+    for (var k in style) {
+        if (k !== 'kind') opts[k] = dstValue(style[k], feature.properties);
+    }
+    return style.kind === 'circle' ? L.circle(latlng, opts) : L.circleMarker(latlng, opts);
+}
+function dstPopup(spec, layer) {
+    var c = layer.feature.geometry.coordinates;
+    var p = Object.assign({
+        _color: layer.options.fillColor || layer.options.color,
+        _coords: c[1].toFixed(3) + ', ' + c[0].toFixed(3)
+    }, layer.feature.properties);
+    var rows = [];
+    (spec.rows || []).forEach(function(r) {
+        var v = p[r[1]], opts = r[2] || {};
+        if (v === null || v === undefined) {
+            if (spec.skip_missing) return;
+            v = 'N/A';
+        } else if (opts.digits !== undefined && typeof v === 'number') {
+            v = v.toFixed(opts.digits);
+        }
+        var value = dstEscape(v) + (opts.suffix || '');
+        rows.push(spec.table ? '<tr><td><b>' + r[0] + ':</b></td><td>' + value + '</td></tr>'
+                             : r[0] + ': ' + value);
+    });
+    var html = dstFill(spec.title, p);
+    html += spec.table ? '<table style="width: 100%; margin-top: 10px; font-size: 12px;">' + rows.join('') + '</table>'
+                       : rows.join('<br>');
+    if (spec.extra_field && p[spec.extra_field]) html += p[spec.extra_field];
+    return spec.wrapper ? spec.wrapper.replace('{body}', html) : html;
+}
+var dstShards = {};
+function dstLazyPopup(spec, layer, group, url, prefixLen) {
+    var p = layer.feature.properties;
+    if (p._loaded) return dstPopup(spec, layer);
+    var key = url + '/' + String(p.event_id).slice(0, prefixLen) + '.json';
+    if (!(key in dstShards)) {
+        dstShards[key] = fetch(key)
+            .then(function(r) { return r.ok ? r.json() : {}; })
+            .catch(function() { return {}; });
+    }
+    dstShards[key].then(function(shard) {
+        Object.assign(p, shard[p.event_id] || {});
+        p._loaded = true;
+        var popup = group.getPopup();
+        if (popup && popup.isOpen() && popup._source === layer) popup.update();
+    });
+    return 'Loading…';
+}
+</script>
+"""
+
+
+def _clean(value, precision):
+    if value is None:
+        return None
+    if isinstance(value, float):
+        return None if math.isnan(value) else round(value, precision)
+    if hasattr(value, 'item'):
+        return _clean(value.item(), precision)
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value
+
+
+def feature_collection(df, fields=(), precision=5):
+    """
+    Point FeatureCollection from a DataFrame with lat/lon columns.
+    Only `fields` are carried as properties (missing columns are skipped).
+    """
+    fields = [f for f in fields if f in df.columns]
+    lats = df['lat'].round(precision).tolist()
+    lons = df['lon'].round(precision).tolist()
+    columns = [[_clean(v, 3) for v in df[f].tolist()] for f in fields]
+
+    features = []
+    for i, (lat, lon) in enumerate(zip(lats, lons)):
+        props = {f: col[i] for f, col in zip(fields, columns) if col[i] is not None}
+        features.append({'type': 'Feature',
+                         'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+                         'properties': props})
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def _to_js(obj):
+    # Compact JSON, safe to inline inside a <script> block
+    return json.dumps(obj, separators=(',', ':'), default=str).replace('</', '<\\/')
+
+
+class GeoJsonPointLayer(Layer):
+    """
+    One map layer holding a whole FeatureCollection of point events.
+    Markers are styled in the browser from a style spec (see HELPERS_JS),
+    so the HTML carries one compact JSON blob instead of one marker + popup
+    per event. Popups are built on click from the feature properties; with
+    `shard_url` set, the popup-only properties are fetched from PopupShards
+    on first click instead of being embedded.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.geoJSON({{ this.data }}, {
+                pointToLayer: function(feature, latlng) {
+                    return dstPoint(feature, latlng, {{ this.style }});
+                }
+            });
+            {% if this.popup and this.shard_url %}
+            {{ this.get_name() }}.bindPopup(function(layer) {
+                return dstLazyPopup({{ this.popup }}, layer, {{ this.get_name() }},
+                                    {{ this.shard_url|tojson }}, {{ this.prefix_len }});
+            }, {maxWidth: {{ this.max_width }}});
+            {% elif this.popup %}
+            {{ this.get_name() }}.bindPopup(function(layer) {
+                return dstPopup({{ this.popup }}, layer);
+            }, {maxWidth: {{ this.max_width }}});
+            {% endif %}
+        {% endmacro %}
+        """)
+
+    def __init__(self, data, style, popup=None, name=None, overlay=True, control=True, show=True,
+                 shard_url=None, prefix_len=2):
+        super().__init__(name=name, overlay=overlay, control=control, show=show)
+        self._name = "GeoJsonPointLayer"
+        self.data = data if isinstance(data, str) else _to_js(data)
+        self.style = _to_js(style)
+        self.max_width = (popup or {}).get('max_width', 300)
+        self.popup = _to_js(popup) if popup else None
+        self.shard_url = shard_url
+        self.prefix_len = prefix_len
+
+    def render(self, **kwargs):
+        figure = self.get_root()
+        figure.header.add_child(Element(HELPERS_JS), name="dst_geojson_helpers")
+        super().render(**kwargs)
+
+
+def popup_fields(popup):
+    """Property names a popup spec reads"""
+    if not popup:
+        return []
+    fields = [row[1] for row in popup.get('rows', [])]
+    fields += re.findall(r"\{(\w+)\}", popup.get('title', ''))
+    if popup.get('extra_field'):
+        fields.append(popup['extra_field'])
+    return [f for f in fields if not f.startswith('_')]
+
+
+def style_fields(style):
+    return [spec['field'] for spec in style.values() if isinstance(spec, dict) and 'field' in spec]
+
+
+def frame_fingerprint(df, fields=()):
+    """Content hash of the rows a layer would serialize (lat/lon plus `fields`)"""
+    columns = ['lat', 'lon'] + [f for f in fields if f in df.columns and f not in ('lat', 'lon')]
+    hashes = pd.util.hash_pandas_object(df[columns], index=False)
+    return hashlib.sha1(hashes.to_numpy().tobytes()).hexdigest()
+
+
+class LayerCache:
+    """
+    Serialized FeatureCollections shared between map variants.
+    With a fixed `fields` list every variant asking for the same key gets
+    the same JSON string, so each layer is built once per snapshot. Entries
+    are also keyed by a fingerprint of the rows, so a different frame under
+    the same key is serialized afresh rather than served stale.
+    """
+
+    def __init__(self, fields=None):
+        self.fields = list(fields) if fields else None
+        self._data = {}
+
+    def get(self, key, df, fields):
+        fields = self.fields or fields
+        cache_key = (key, tuple(fields), len(df), frame_fingerprint(df, fields))
+        if cache_key not in self._data:
+            self._data[cache_key] = _to_js(feature_collection(df, fields))
+        return self._data[cache_key]
+
+
+class PopupShards:
+    """
+    Popup-only event properties stored as JSON files next to the map, sharded
+    by event ID prefix: <out_dir>/<prefix>.json = {event_id: {field: value}}.
+    The page keeps just IDs, coordinates and style fields and fetches a
+    shard the first time one of its events is clicked.
+    Several layers (or maps) can share one instance; fields are merged per ID.
+    Like the cluster tiles, shards are fetched, so popups only work when the
+    page is served over HTTP (browsers block fetch() from file:// pages).
+    """
+
+    def __init__(self, out_dir, url=None, prefix_len=2):
+        self.out_dir = out_dir
+        self.url = url or os.path.basename(out_dir.rstrip('/'))
+        self.prefix_len = prefix_len
+        self.records = {}
+
+    def add(self, df, fields):
+        fields = [f for f in fields if f in df.columns]
+        if not fields:
+            return
+        collection = feature_collection(df, ['event_id'] + fields)
+        for feature in collection['features']:
+            props = feature['properties']
+            eid = props.pop('event_id')
+            self.records.setdefault(eid, {}).update(props)
+
+    def write(self, merge=False, active_ids=None):
+        """
+        Write every shard; returns the number of files. By default the
+        folder is replaced. With merge=True the records are merged into the
+        shards already on disk, so a folder shared by several maps keeps the
+        fields of variants not rendered this time; `active_ids` then drops
+        events that are no longer in the snapshot.
+        """
+        records = {}
+        if merge and os.path.isdir(self.out_dir):
+            for name in os.listdir(self.out_dir):
+                if name.endswith('.json'):
+                    with open(os.path.join(self.out_dir, name)) as f:
+                        records.update(json.load(f))
+        elif os.path.exists(self.out_dir):
+            shutil.rmtree(self.out_dir)
+        os.makedirs(self.out_dir, exist_ok=True)
+        for eid, props in self.records.items():
+            records.setdefault(eid, {}).update(props)
+        if active_ids is not None:
+            active = set(map(str, active_ids))
+            records = {eid: props for eid, props in records.items() if eid in active}
+
+        shards = {}
+        for eid, props in records.items():
+            shards.setdefault(eid[:self.prefix_len], {})[eid] = props
+        for prefix, shard in shards.items():
+            path = os.path.join(self.out_dir, f"{prefix}.json")
+            with open(path + '.tmp', 'w') as f:
+                json.dump(shard, f, separators=(',', ':'))
+            os.replace(path + '.tmp', path)
+        for name in os.listdir(self.out_dir):
+            if name.endswith('.json') and name[:-5] not in shards:
+                os.remove(os.path.join(self.out_dir, name))
+        return len(shards)
+
+
+def point_layer(df, style, popup=None, name=None, extra_fields=(), cache=None, cache_key=None,
+                shards=None, **kwargs):
+    """
+    GeoJsonPointLayer for a DataFrame, carrying only the fields the style/popup need.
+    Pass a LayerCache and a cache_key describing the slice to reuse serialized data.
+    Pass PopupShards to move popup-only fields out of the page (loaded on click).
+    """
+    page_fields = style_fields(style) + list(extra_fields)
+    if shards is not None and popup:
+        df = ensure_event_ids(df)
+        shards.add(df, [f for f in popup_fields(popup) if f not in page_fields])
+        page_fields = ['event_id'] + page_fields
+        kwargs.update(shard_url=shards.url, prefix_len=shards.prefix_len)
+    else:
+        page_fields += popup_fields(popup)
+    fields = list(dict.fromkeys(page_fields))
+    if cache is not None and cache_key is not None:
+        data = cache.get(cache_key, df, fields)
+    else:
+        data = feature_collection(df, fields)
+    return GeoJsonPointLayer(data, style, popup, name=name, **kwargs)
@@ -0,0 +1,118 @@
+import json
+import math
+
+import numpy as np
+from branca.element import Template
+from folium import plugins
+from folium.utilities import camelize
+
+from cluster_tiles import project, unproject
+
+TILE_SIZE = 256
+SQRT3 = math.sqrt(3.0)
+
+# Zoom levels we precompute heat cells for; the browser picks the closest one
+DEFAULT_ZOOM_BANDS = (3, 5, 7, 9, 11)
+
+
+def _hex_axial(px, py, size):
+    """Pixel coords -> axial (q, r) of the pointy-top hexagon containing them"""
+    q = (SQRT3 / 3 * px - py / 3) / size
+    r = (2.0 / 3 * py) / size
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    # Cube rounding: fix the coordinate with the largest rounding error
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return rq.astype(np.int64), rr.astype(np.int64)
+
+
+def aggregate(lat, lon, weights, zoom, cell_px=10, shape='hex'):
+    """
+    Bin points into a hexagonal (or square) grid whose cells are `cell_px`
+    screen pixels wide at `zoom`. Returns an (m, 4) array of
+    [lat, lon, weight_sum, count] per non-empty cell.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    if lat.size == 0:
+        return np.zeros((0, 4))
+    x, y = project(lat, lon)
+    scale = TILE_SIZE * 2 ** zoom
+    px, py = x * scale, y * scale
+
+    if shape == 'hex':
+        q, r = _hex_axial(px, py, cell_px)
+    else:
+        q, r = np.floor(px / cell_px).astype(np.int64), np.floor(py / cell_px).astype(np.int64)
+
+    keys, inverse = np.unique((q << 32) + (r & 0xFFFFFFFF), return_inverse=True)
+    sums = np.bincount(inverse, weights=np.asarray(weights, dtype=np.float64))
+    counts = np.bincount(inverse)
+
+    cq, cr = keys >> 32, (keys & 0xFFFFFFFF).astype(np.int64)
+    cr = np.where(cr >= 2 ** 31, cr - 2 ** 32, cr)
+    if shape == 'hex':
+        cx, cy = cell_px * SQRT3 * (cq + cr / 2.0), cell_px * 1.5 * cr
+    else:
+        cx, cy = (cq + 0.5) * cell_px, (cr + 0.5) * cell_px
+    clat, clon = unproject(cx / scale, cy / scale)
+    return np.column_stack([clat, clon, sums, counts])
+
+
+def aggregate_bands(df, value_col='threat_score', zooms=DEFAULT_ZOOM_BANDS, scale=0.1,
+                    cell_px=10, shape='hex'):
+    """Heat cells [[lat, lon, intensity], ...] for each zoom band"""
+    weights = df[value_col].fillna(10).values * scale if value_col in df.columns else np.full(len(df), scale)
+    bands = {}
+    for zoom in zooms:
+        cells = aggregate(df['lat'].values, df['lon'].values, weights, zoom, cell_px, shape)
+        bands[zoom] = np.round(cells[:, :3], 4).tolist()
+    return bands
+
+
+class GridHeatMap(plugins.HeatMap):
+    """
+    Leaflet.heat layer fed with pre-aggregated grid cells instead of raw
+    events. One cell array per zoom band is embedded; the layer swaps to the
+    closest band on zoom, so payload scales with cells, not events.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }}_bands = {{ this.bands }};
+            var {{ this.get_name() }} = L.heatLayer(
+                {{ this.get_name() }}_bands[{{ this.initial_band }}],
+                {{ this.js_options }}
+            );
+            (function(layer, bands) {
+                var zooms = Object.keys(bands).map(Number).sort(function(a, b) { return a - b; });
+                var map = null;
+                function swap() {
+                    var z = map.getZoom(), pick = zooms[0];
+                    zooms.forEach(function(b) { if (b <= z) pick = b; });
+                    layer.setLatLngs(bands[pick]);
+                }
+                layer.on('add', function() {
+                    map = layer._map;
+                    map.on('zoomend', swap);
+                    swap();
+                });
+                layer.on('remove', function() {
+                    if (map) map.off('zoomend', swap);
+                    map = null;
+                });
+            })({{ this.get_name() }}, {{ this.get_name() }}_bands);
+        {% endmacro %}
+        """)
+
+    def __init__(self, bands, initial_zoom=5, **kwargs):
+        zooms = sorted(bands)
+        initial = max([z for z in zooms if z <= initial_zoom] or zooms[:1])
+        super().__init__(bands[initial] or [[0, 0, 0]], **kwargs)
+        self._name = "GridHeatMap"
+        self.bands = json.dumps({str(z): cells for z, cells in bands.items()}, separators=(',', ':'))
+        self.initial_band = initial
+        self.js_options = json.dumps({camelize(key): value for key, value in self.options.items()})
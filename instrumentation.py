@@ -0,0 +1,221 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Set by pipeline.Pipeline for the scripts it runs: spans are appended there as
+# JSON lines and folded into the run's trace, tagged with the pipeline stage
+TRACE_ENV = 'DISASTER_TRACE_FILE'
+PARENT_ENV = 'DISASTER_TRACE_PARENT'
+DEFAULT_METRICS_DIR = 'metrics'
+PROM_FILE = 'disaster_tracker.prom'
+KEEP_TRACES = 50
+# Spans kept in memory by a Tracer (long-running servers enrich on every request)
+KEEP_SPANS = 10000
+PHASES = ('fetch', 'parse', 'enrich', 'correlate', 'render')
+
+_STATUS = '/proc/self/status'
+_CLEAR_REFS = '/proc/self/clear_refs'
+
+
+def _read_hwm():
+    """Peak resident set size of this process (bytes) since start or the last reset"""
+    try:
+        with open(_STATUS, 'rb') as f:
+            for line in f:
+                if line.startswith(b'VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _reset_hwm():
+    """Start a new peak-RSS window (Linux); False where that isn't possible"""
+    try:
+        with open(_CLEAR_REFS, 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class Span:
+    """One measured stage: wall time, bytes and rows in / out, peak memory"""
+
+    __slots__ = ('phase', 'name', 'labels', 'start', 'seconds', 'bytes_in', 'bytes_out', 'rows_in',
+                 'rows_out', 'peak_bytes', 'status', 'parent', 'pid')
+
+    def __init__(self, phase, name=None, labels=None, parent=None):
+        self.phase = phase
+        self.name = name or phase
+        self.labels = labels or {}
+        self.start = time.time()
+        self.seconds = None
+        self.bytes_in = self.bytes_out = self.rows_in = self.rows_out = None
+        self.peak_bytes = None
+        self.status = 'ok'
+        self.parent = parent
+        self.pid = os.getpid()
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__ if getattr(self, key) not in (None, {})}
+
+    @classmethod
+    def from_dict(cls, data):
+        span = cls(data['phase'], data.get('name'), data.get('labels'), data.get('parent'))
+        for key in cls.__slots__:
+            if key in data:
+                setattr(span, key, data[key])
+        return span
+
+
+class Tracer:
+    """
+    Collects stage spans for a run.
+
+    Cost per span is two clock reads and two small /proc reads: peak memory
+    comes from the kernel's RSS high-water mark, which each span resets on
+    entry (so a span's peak is its own, not the process's lifetime peak)
+    instead of tracing allocations.
+    """
+
+    def __init__(self, sink=None, parent=None):
+        self.spans = deque(maxlen=KEEP_SPANS)
+        self.sink = sink if sink is not None else os.environ.get(TRACE_ENV)
+        self.parent = parent if parent is not None else os.environ.get(PARENT_ENV)
+        self._open = []
+        self._lock = threading.Lock()
+        self._can_reset = None
+
+    @contextmanager
+    def stage(self, phase, name=None, **labels):
+        """
+        with tracer.stage('parse', 'noaa') as span:
+            ...; span.rows_out = len(df)
+        Set bytes_in / bytes_out / rows_in / rows_out on the span as known.
+        """
+        span = Span(phase, name, labels, self.parent)
+        with self._lock:
+            hwm = _read_hwm()
+            for outer in self._open:
+                outer.peak_bytes = max(outer.peak_bytes or 0, hwm)
+            if self._can_reset is None or self._can_reset:
+                self._can_reset = _reset_hwm()
+            self._open.append(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException:
+            span.status = 'error'
+            raise
+        finally:
+            span.seconds = time.perf_counter() - started
+            with self._lock:
+                hwm = _read_hwm()
+                self._open.remove(span)
+                span.peak_bytes = max(span.peak_bytes or 0, hwm)
+                for outer in self._open:
+                    outer.peak_bytes = max(outer.peak_bytes or 0, hwm)
+            self.add(span)
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+            if self.sink:
+                # One short O_APPEND write per span, so concurrent stages can share the file
+                with open(self.sink, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(span.to_dict(), default=str) + '\n')
+
+
+TRACER = Tracer()
+stage = TRACER.stage
+
+
+def read_spans(path):
+    """Spans appended to a sink file (missing file -> none)"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return [Span.from_dict(json.loads(line)) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def _label_text(labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+    return ','.join(f'{key}="{escape(value)}"' for key, value in sorted(labels.items()))
+
+
+def prometheus_text(spans, run_id, started, seconds):
+    """
+    Prometheus text exposition for one run (node_exporter textfile format).
+    Spans with the same (phase, stage, parent, labels) are summed, peak
+    memory takes the max.
+    """
+    metrics = {
+        'seconds': ('disaster_stage_duration_seconds', 'Wall time of the stage in the last run'),
+        'bytes_in': ('disaster_stage_bytes_in', 'Bytes read by the stage in the last run'),
+        'bytes_out': ('disaster_stage_bytes_out', 'Bytes written by the stage in the last run'),
+        'rows_in': ('disaster_stage_rows_in', 'Rows read by the stage in the last run'),
+        'rows_out': ('disaster_stage_rows_out', 'Rows produced by the stage in the last run'),
+        'peak_bytes': ('disaster_stage_peak_memory_bytes', 'Peak resident memory during the stage'),
+    }
+    series = {}
+    for span in spans:
+        labels = dict(span.labels, phase=span.phase, stage=span.name)
+        if span.parent:
+            labels['parent'] = span.parent
+        if span.status != 'ok':
+            labels['status'] = span.status
+        key = _label_text(labels)
+        for field in metrics:
+            value = getattr(span, field)
+            if value is None:
+                continue
+            values = series.setdefault(field, {})
+            values[key] = max(values.get(key, 0), value) if field == 'peak_bytes' else values.get(key, 0) + value
+
+    lines = []
+    for field, (metric, help_text) in metrics.items():
+        if field not in series:
+            continue
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} gauge']
+        lines += [f'{metric}{{{key}}} {value if isinstance(value, int) else round(value, 6)}'
+                  for key, value in series[field].items()]
+    # No run_id label: one series per run would grow without bound (it is in the JSON trace)
+    lines += ['# HELP disaster_run_timestamp_seconds Start of the last run',
+              '# TYPE disaster_run_timestamp_seconds gauge',
+              f'disaster_run_timestamp_seconds {started:.3f}',
+              '# HELP disaster_run_duration_seconds Wall time of the last run',
+              '# TYPE disaster_run_duration_seconds gauge',
+              f'disaster_run_duration_seconds {seconds:.3f}']
+    return '\n'.join(lines) + '\n'
+
+
+def _write_atomic(path, text):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def export_run(spans, run_id, started, seconds, out_dir=DEFAULT_METRICS_DIR, keep=KEEP_TRACES, extra=None):
+    """
+    Write the run's JSON trace (<out_dir>/trace-<run_id>.json, the last
+    `keep` are kept) and refresh the Prometheus textfile; returns the trace path
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    trace = dict(extra or {}, run_id=run_id, started=started, seconds=round(seconds, 3),
+                 spans=[span.to_dict() for span in sorted(spans, key=lambda s: s.start)])
+    trace_path = os.path.join(out_dir, f'trace-{run_id}.json')
+    _write_atomic(trace_path, json.dumps(trace, indent=1, default=str))
+    _write_atomic(os.path.join(out_dir, PROM_FILE), prometheus_text(spans, run_id, started, seconds))
+
+    traces = sorted(f for f in os.listdir(out_dir) if f.startswith('trace-') and f.endswith('.json'))
+    for old in traces[:-keep] if keep else []:
+        os.remove(os.path.join(out_dir, old))
+    return trace_path
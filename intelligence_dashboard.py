@@ -1,104 +1,125 @@
+import os
 import pandas as pd
 import folium
+from geojson_layers import PopupShards, point_layer
+from event_index import ensure_event_ids
+from instrumentation import stage
 from folium import plugins
 import json
 from datetime import datetime
 
-def create_intelligence_dashboard():
+def create_intelligence_dashboard(output_file='intelligence_dashboard.html', disasters=None,
+                                  news_data=None, correlations=None, popup_shards=None,
+                                  cube=None):
     """Create unified dashboard combining disaster data with news intelligence"""
     
-    # Load all data sources
-    disasters = pd.read_csv('combined_disaster_feed.csv')
+    # Load all data sources (unless already loaded by the caller)
+    if disasters is None:
+        disasters = pd.read_csv('combined_disaster_feed.csv')
     
-    try:
-        news_data = pd.read_csv('disaster_news_feed.csv')
-        correlations = pd.read_csv('news_disaster_correlations.csv')
-        has_news = True
-    except:
-        news_data = pd.DataFrame()
-        correlations = pd.DataFrame()
-        has_news = False
+    if news_data is None or correlations is None:
+        try:
+            news_data = pd.read_csv('disaster_news_feed.csv')
+            correlations = pd.read_csv('news_disaster_correlations.csv')
+        except:
+            news_data = pd.DataFrame()
+            correlations = pd.DataFrame()
+    has_news = not news_data.empty
     
     # Create enhanced map
-    m = folium.Map(location=[38, -97], zoom_start=4, tiles="CartoDB positron")
+    m = folium.Map(location=[38, -97], zoom_start=4, tiles="CartoDB positron", prefer_canvas=True)
     
-    # Add disaster markers with news correlation indicators
-    for _, row in disasters.iterrows():
-        coords = f"{row['lat']}, {row['lon']}"
-        
-        # Check if this disaster has news coverage
-        related_news = []
-        if has_news and not correlations.empty:
-            related_news = correlations[correlations['disaster_coords'] == coords]
-        
-        # Color based on news coverage + disaster type
-        if len(related_news) > 0:
-            color = 'purple'  # Has news coverage
-            marker_size = 10
-        elif row['source'] == 'NOAA':
-            color = 'red'
-            marker_size = 7
-        elif row['source'] == 'USGS':
-            color = 'orange'
-            marker_size = 6
-        else:
-            color = 'darkred'
-            marker_size = 5
-        
-        # Enhanced popup with news integration
-        popup_html = f"""
-        <div style="width: 350px; font-family: Arial;">
-            <h4 style="color: {color}; margin: 0;">
-                🚨 {row['source']} - {row.get('event', 'Event')}
-            </h4>
-            <hr style="margin: 5px 0;">
-            <table style="width: 100%; font-size: 12px;">
-                <tr><td><b>Location:</b></td><td>{row.get('area', row.get('place', 'Unknown'))}</td></tr>
-                <tr><td><b>Coordinates:</b></td><td>{row['lat']:.3f}, {row['lon']:.3f}</td></tr>
-        """
-        
-        # Add source-specific data
-        if row['source'] == 'USGS':
-            popup_html += f"<tr><td><b>Magnitude:</b></td><td>{row.get('magnitude', 'N/A')}</td></tr>"
-        elif row['source'] == 'NOAA':
-            popup_html += f"<tr><td><b>Severity:</b></td><td>{row.get('severity', 'N/A')}</td></tr>"
-        elif row['source'] == 'NASA-FIRMS':
-            popup_html += f"<tr><td><b>Confidence:</b></td><td>{row.get('confidence', 'N/A')}%</td></tr>"
-        
-        popup_html += "</table>"
+    disasters = ensure_event_ids(disasters.dropna(subset=['lat', 'lon'])).copy()
+    
+    # Group news coverage per disaster once into an event_id -> news index,
+    # and pre-render the popup news section
+    disasters['news_count'] = 0
+    disasters['news_html'] = None
+    if has_news and not correlations.empty:
+        by_event = correlations
+        if 'event_id' not in by_event.columns:
+            # Older correlation files only carry the "lat, lon" string
+            # (hash join, so events sharing a point each get the coverage)
+            keys = pd.DataFrame({
+                'disaster_coords': disasters['lat'].astype(str) + ", " + disasters['lon'].astype(str),
+                'event_id': disasters['event_id'],
+            })
+            by_event = by_event.merge(keys, on='disaster_coords', how='inner')
+        related = by_event.dropna(subset=['event_id']).groupby('event_id')
+        counts = related.size()
+        disasters['news_count'] = disasters['event_id'].map(counts).fillna(0).astype(int)
         
-        # Add news intelligence section
-        if len(related_news) > 0:
-            popup_html += f"""
+        sections = {}
+        for key, news in related:
+            section = f"""
             <hr style="margin: 10px 0;">
-            <h5 style="color: purple; margin: 5px 0;">📰 NEWS INTELLIGENCE ({len(related_news)} reports)</h5>
+            <h5 style="color: purple; margin: 5px 0;">📰 NEWS INTELLIGENCE ({len(news)} reports)</h5>
             """
-            for _, news in related_news.head(3).iterrows():
-                popup_html += f"""
+            for source, url, title in news[['news_source', 'news_url', 'news_title']].head(3).itertuples(index=False):
+                section += f"""
                 <div style="margin: 5px 0; padding: 5px; background: #f0f0f0; border-radius: 3px; font-size: 11px;">
-                    <b>{news['news_source']}</b><br>
-                    <a href="{news['news_url']}" target="_blank">{news['news_title'][:60]}...</a>
+                    <b>{source}</b><br>
+                    <a href="{url}" target="_blank">{str(title)[:60]}...</a>
                 </div>
                 """
-        
-        popup_html += "</div>"
-        
-        folium.CircleMarker(
-            location=[row['lat'], row['lon']],
-            radius=marker_size,
-            color='white',
-            weight=2,
-            fill=True,
-            fillColor=color,
-            fillOpacity=0.8,
-            popup=folium.Popup(popup_html, max_width=370)
-        ).add_to(m)
+            sections[key] = section
+        disasters['news_html'] = disasters['event_id'].map(sections)
+    
+    # Color based on news coverage + disaster type
+    disasters['marker_class'] = disasters['source'].where(disasters['news_count'] == 0, 'NEWS')
+    colors = {'NEWS': 'purple', 'NOAA': 'red', 'USGS': 'orange'}
+    sizes = {'NEWS': 10, 'NOAA': 7, 'USGS': 6}
+    disasters['location'] = disasters.get('area', pd.Series(index=disasters.index, dtype=object))
+    if 'place' in disasters.columns:
+        disasters['location'] = disasters['location'].fillna(disasters['place'])
+    disasters['location'] = disasters['location'].fillna('Unknown')
+    
+    style = {
+        "radius": {"field": "marker_class", "map": sizes, "default": 5},
+        "color": "white",
+        "weight": 2,
+        "fill": True,
+        "fillColor": {"field": "marker_class", "map": colors, "default": "darkred"},
+        "fillOpacity": 0.8,
+    }
+    
+    # Enhanced popup with news integration
+    popup = {
+        "wrapper": '<div style="width: 350px; font-family: Arial;">{body}</div>',
+        "title": """<h4 style="color: {_color}; margin: 0;">
+                🚨 {source} - {event}
+            </h4>
+            <hr style="margin: 5px 0;">""",
+        "table": True,
+        "skip_missing": True,
+        "max_width": 370,
+        "rows": [
+            ["Location", "location"],
+            ["Coordinates", "_coords"],
+            ["Magnitude", "magnitude"],
+            ["Severity", "severity"],
+            ["Confidence", "confidence", {"suffix": "%"}],
+        ],
+        "extra_field": "news_html",
+    }
+    
+    # Popup details are written to JSON shards next to the HTML and fetched on click
+    shards = popup_shards or PopupShards(os.path.splitext(output_file)[0] + "_popups")
+    point_layer(disasters, style, popup, name="Disasters", shards=shards).add_to(m)
     
     # Add news-only markers for stories without precise coordinates
     if has_news and not news_data.empty:
         news_locations = []  # You could geocode news locations here
     
     # Intelligence header
+    # RenderPipeline passes its shared cube; a standalone run just counts the column
+    if cube is not None:
+        total = len(cube)
+        noaa_count, usgs_count, fire_count = (cube.count(source=s) for s in ('NOAA', 'USGS', 'NASA-FIRMS'))
+    else:
+        total = len(disasters)
+        counts = disasters['source'].value_counts()
+        noaa_count, usgs_count, fire_count = (int(counts.get(s, 0)) for s in ('NOAA', 'USGS', 'NASA-FIRMS'))
     news_count = len(news_data) if has_news else 0
     correlation_count = len(correlations) if has_news else 0
     
@@ -115,21 +136,21 @@ def create_intelligence_dashboard():
                 </p>
             </div>
             <div style="text-align: right;">
-                <div style="font-size: 28px; font-weight: bold; color: #ffeb3b;">{len(disasters)}</div>
+                <div style="font-size: 28px; font-weight: bold; color: #ffeb3b;">{total}</div>
                 <div style="font-size: 12px;">Active Disasters</div>
             </div>
         </div>
         <div style="display: grid; grid-template-columns: repeat(4, 1fr); gap: 15px; margin-top: 20px; padding-top: 20px; border-top: 1px solid rgba(255,255,255,0.3);">
             <div style="text-align: center;">
-                <div style="font-size: 22px; font-weight: bold; color: #ff5722;">{len(disasters[disasters['source'] == 'NOAA'])}</div>
+                <div style="font-size: 22px; font-weight: bold; color: #ff5722;">{noaa_count}</div>
                 <div style="font-size: 11px;">Weather Alerts</div>
             </div>
             <div style="text-align: center;">
-                <div style="font-size: 22px; font-weight: bold; color: #ff9800;">{len(disasters[disasters['source'] == 'USGS'])}</div>
+                <div style="font-size: 22px; font-weight: bold; color: #ff9800;">{usgs_count}</div>
                 <div style="font-size: 11px;">Earthquakes</div>
             </div>
             <div style="text-align: center;">
-                <div style="font-size: 22px; font-weight: bold; color: #f44336;">{len(disasters[disasters['source'] == 'NASA-FIRMS'])}</div>
+                <div style="font-size: 22px; font-weight: bold; color: #f44336;">{fire_count}</div>
                 <div style="font-size: 11px;">Wildfires</div>
             </div>
             <div style="text-align: center;">
@@ -172,7 +193,11 @@ def create_intelligence_dashboard():
     # Add full screen
     plugins.Fullscreen().add_to(m)
     
-    m.save('intelligence_dashboard.html')
+    with stage("render", "save", map="intelligence_dashboard") as span:
+        m.save(output_file)
+        if popup_shards is None:
+            shards.write()
+        span.rows_in, span.bytes_out = len(disasters), os.path.getsize(output_file)
     print(f"🎯 Intelligence dashboard created with {len(disasters)} disasters and {correlation_count} news correlations")
 
 if __name__ == "__main__":
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import math
+import os
+import time
+from collections import deque
+from datetime import datetime
+
+from event_index import EventIndex, event_id, tokenize
+
+
+def news_id(item):
+    """Stable ID for a news item (URL if present, else source + title)"""
+    key = item.get('url') or f"{item.get('source', '')}|{item.get('title', '')}"
+    return hashlib.sha1(str(key).encode('utf-8')).hexdigest()[:12]
+
+
+def _same_record(a, b):
+    """Field-by-field equality that treats NaN as equal to NaN (CSV rows are full of them)"""
+    if a.keys() != b.keys():
+        return False
+    for key, value in a.items():
+        other = b[key]
+        if value != other and not (isinstance(value, float) and isinstance(other, float)
+                                   and math.isnan(value) and math.isnan(other)):
+            return False
+    return True
+
+
+class LiveCorrelator:
+    """
+    Long-running news <-> disaster correlator.
+
+    Keeps the active event set in an EventIndex and the recent news items in a
+    token index, so a new news item is matched only against events sharing a
+    location token (and a new event only against news mentioning it).
+    Every change to the correlation set is emitted as
+    {'op': 'add' | 'retract', 'correlation': {...}} to subscribers.
+    """
+
+    def __init__(self, news_ttl_hours=24, max_news=5000, max_changes=10000):
+        self.index = EventIndex()
+        self.news_ttl = news_ttl_hours * 3600
+        self.max_news = max_news
+
+        self.news = {}              # news_id -> (item, tokens, received_at)
+        self.news_tokens = {}       # token -> set(news_id)
+        self.correlations = {}      # (news_id, event_id) -> correlation dict
+        self._by_event = {}         # event_id -> set(news_id)
+        self._by_news = {}          # news_id -> set(event_id)
+
+        self.changes = deque(maxlen=max_changes)
+        self._subscribers = []
+
+    # ---- change stream ----
+
+    def subscribe(self, callback):
+        """Register callback(change) for every add/retract"""
+        self._subscribers.append(callback)
+
+    def drain(self):
+        """Pop all buffered changes"""
+        out = list(self.changes)
+        self.changes.clear()
+        return out
+
+    def _emit(self, op, correlation):
+        change = {'op': op, 'correlation': correlation}
+        self.changes.append(change)
+        for callback in self._subscribers:
+            callback(change)
+        return change
+
+    # ---- correlation bookkeeping ----
+
+    def _link(self, nid, eid, matched):
+        item = self.news[nid][0]
+        event = self.index.events[eid]
+        location = next((str(event[f]) for f in ('area', 'place')
+                         if isinstance(event.get(f), str) and event[f]), '')
+        corr = {
+            'news_id': nid,
+            'event_id': eid,
+            'news_title': item.get('title', ''),
+            'news_source': item.get('source', ''),
+            'news_url': item.get('url', ''),
+            'disaster_type': event.get('event', ''),
+            'disaster_source': event.get('source', ''),
+            'disaster_location': location,
+            'disaster_coords': f"{event.get('lat', '')}, {event.get('lon', '')}",
+            'correlation_strength': 'LOCATION_MATCH',
+            'matched_terms': sorted(matched),
+            'timestamp': datetime.now().isoformat()
+        }
+        self.correlations[(nid, eid)] = corr
+        self._by_event.setdefault(eid, set()).add(nid)
+        self._by_news.setdefault(nid, set()).add(eid)
+        return self._emit('add', corr)
+
+    def _unlink(self, nid, eid):
+        corr = self.correlations.pop((nid, eid), None)
+        if corr is None:
+            return None
+        self._by_event.get(eid, set()).discard(nid)
+        self._by_news.get(nid, set()).discard(eid)
+        return self._emit('retract', corr)
+
+    # ---- events ----
+
+    def upsert_event(self, event):
+        """Add or update an event; re-correlates it against retained news"""
+        eid = event.get('event_id') or event_id(event)
+        previous = set(self._by_event.get(eid, ()))
+        self.index.upsert(dict(event, event_id=eid))
+
+        matches = {}
+        for tok in self.index.event_tokens(eid):
+            for nid in self.news_tokens.get(tok, ()):
+                matches.setdefault(nid, set()).add(tok)
+
+        changes = [self._unlink(nid, eid) for nid in previous - set(matches)]
+        changes += [self._link(nid, eid, toks) for nid, toks in matches.items()
+                    if nid not in previous]
+        return changes
+
+    def expire_event(self, eid):
+        """Remove an event and retract its correlations"""
+        changes = [self._unlink(nid, eid) for nid in list(self._by_event.pop(eid, ()))]
+        self.index.remove(eid)
+        return changes
+
+    def sync_events(self, events):
+        """
+        Make the active set equal to `events` (DataFrame or iterable of dicts).
+        New or changed events are upserted (an event keeps its ID when e.g.
+        its magnitude or area changes), unchanged ones are left alone and
+        missing ones are expired.
+        """
+        if hasattr(events, 'to_dict'):
+            events = events.to_dict('records')
+
+        changes = []
+        seen = set()
+        for event in events:
+            eid = event.get('event_id') or event_id(event)
+            seen.add(eid)
+            event = dict(event, event_id=eid)
+            stored = self.index.events.get(eid)
+            if stored is None or not _same_record(stored, event):
+                changes += self.upsert_event(event)
+        for eid in [e for e in self.index.events if e not in seen]:
+            changes += self.expire_event(eid)
+        return changes
+
+    # ---- news ----
+
+    def add_news(self, item, now=None):
+        """Correlate one incoming news item against the live event index"""
+        now = now or time.time()
+        nid = news_id(item)
+        if nid in self.news:
+            return []
+
+        tokens = set(tokenize(f"{item.get('title', '')} {item.get('summary', '')}"))
+        self.news[nid] = (item, tokens, now)
+        for tok in tokens:
+            self.news_tokens.setdefault(tok, set()).add(nid)
+
+        changes = [self._link(nid, eid, matched)
+                   for eid, matched in self.index.match_tokens(tokens).items()]
+        changes += self.expire_news(now)
+        return changes
+
+    def remove_news(self, nid):
+        """Forget a news item and retract its correlations"""
+        entry = self.news.pop(nid, None)
+        if entry is None:
+            return []
+        for tok in entry[1]:
+            ids = self.news_tokens.get(tok)
+            if ids is not None:
+                ids.discard(nid)
+                if not ids:
+                    del self.news_tokens[tok]
+        return [self._unlink(nid, eid) for eid in list(self._by_news.pop(nid, ()))]
+
+    def expire_news(self, now=None):
+        """Drop news older than the TTL (and the oldest beyond max_news)"""
+        now = now or time.time()
+        changes = []
+        # dicts keep insertion order, so the oldest items come first
+        for nid, (_, _, received) in list(self.news.items()):
+            if now - received <= self.news_ttl and len(self.news) <= self.max_news:
+                break
+            changes += self.remove_news(nid)
+        return changes
+
+    def active_correlations(self):
+        return list(self.correlations.values())
+
+
+def run_live(disaster_csv='combined_disaster_feed.csv', stream_file='live_correlations.ndjson',
+             poll_seconds=60):
+    """
+    Keep a correlator running: reload events when the feed file changes,
+    poll news sources, and append every change to an NDJSON stream file.
+    """
+    from news_intelligence import DisasterNewsIntelligence
+    import pandas as pd
+
+    intel = DisasterNewsIntelligence()
+    correlator = LiveCorrelator()
+    stream = open(stream_file, 'a', buffering=1)
+    correlator.subscribe(lambda change: stream.write(json.dumps(change) + "\n"))
+
+    last_mtime = None
+    print(f"📡 Live correlator running, streaming changes to {stream_file}")
+    try:
+        while True:
+            mtime = os.path.getmtime(disaster_csv) if os.path.exists(disaster_csv) else None
+            if mtime != last_mtime:
+                changes = correlator.sync_events(pd.read_csv(disaster_csv))
+                last_mtime = mtime
+                print(f"🔄 {len(correlator.index)} active events ({len(changes)} correlation changes)")
+
+            for fetch in (intel.fetch_rss_news, intel.search_reddit_disasters):
+                for item in intel.filter_relevant(fetch()):
+                    correlator.add_news(item)
+
+            print(f"🔗 {len(correlator.correlations)} live correlations")
+            time.sleep(poll_seconds)
+    except KeyboardInterrupt:
+        print("\n🛑 Live correlator stopped")
+    finally:
+        stream.close()
+
+
+if __name__ == "__main__":
+    run_live()
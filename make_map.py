@@ -1,13 +1,19 @@
+import os
 import pandas as pd
 import folium
 from filters import filter_data
+from geojson_layers import PopupShards, point_layer
+from instrumentation import stage
 
-def make_map(csv_file="combined_disaster_feed.csv", output_file="disaster_map.html"):
+def make_map(csv_file="combined_disaster_feed.csv", output_file="disaster_map.html", df=None, layer_cache=None,
+             popup_shards=None):
     """
     Build an interactive map from your combined disaster feed.
     Automatically color-codes events by source and saves as HTML.
+    Pass `df` (and a shared `layer_cache` / `popup_shards`) to render from an already loaded snapshot.
     """
-    df = pd.read_csv(csv_file)
+    if df is None:
+        df = pd.read_csv(csv_file)
 
     if df.empty:
         print("⚠️ No data found in file:", csv_file)
@@ -27,50 +33,40 @@ def make_map(csv_file="combined_disaster_feed.csv", output_file="disaster_map.ht
     }
 
     # Create map centered on the continental US
-    m = folium.Map(location=[38, -97], zoom_start=5, tiles="CartoDB positron")
+    m = folium.Map(location=[38, -97], zoom_start=5, tiles="CartoDB positron", prefer_canvas=True)
 
-    # Create feature groups for each data source
-    noaa_group = folium.FeatureGroup(name="NOAA Weather Alerts")
-    usgs_group = folium.FeatureGroup(name="USGS Earthquakes") 
-    fire_group = folium.FeatureGroup(name="NASA Wildfires")
-
-    # Add markers by source to appropriate groups
-    for _, row in df.iterrows():
-        src = row.get("source", "Other")
-        color = colors.get(src, "gray")
-        event = row.get("event", "")
-        desc_parts = []
+    # Markers are styled client-side from the source column
+    style = {
+        "radius": 6,
+        "color": {"field": "source", "map": colors, "default": "gray"},
+        "fillColor": {"field": "source", "map": colors, "default": "gray"},
+        "fill": True,
+        "fillOpacity": 0.8,
+    }
+    popup = {
+        "title": "<b>{source}</b> — {event}<br>",
+        "rows": [[field.title(), field] for field in ["headline", "place", "area", "acq_datetime"]],
+        "skip_missing": True,
+    }
 
-        # Build popup text dynamically based on available columns
-        for field in ["headline", "place", "area", "acq_datetime"]:
-            if field in row and not pd.isna(row[field]):
-                desc_parts.append(f"{field.title()}: {row[field]}")
-        popup_text = f"<b>{src}</b> — {event}<br>" + "<br>".join(desc_parts)
+    # Popup details are written to JSON shards next to the HTML and fetched on click
+    shards = popup_shards or PopupShards(os.path.splitext(output_file)[0] + "_popups")
 
-        marker = folium.CircleMarker(
-            location=[row["lat"], row["lon"]],
-            radius=6,
-            color=color,
-            fill=True,
-            fill_color=color,
-            fill_opacity=0.8,
-            popup=popup_text
-        )
-        
-        # Add to appropriate group
-        if src == "NOAA":
-            marker.add_to(noaa_group)
-        elif src == "USGS":
-            marker.add_to(usgs_group)
-        elif src == "NASA-FIRMS":
-            marker.add_to(fire_group)
-        else:
-            marker.add_to(m)  # fallback for unknown sources
+    # One GeoJSON layer per data source
+    layer_names = {
+        "NOAA": "NOAA Weather Alerts",
+        "USGS": "USGS Earthquakes",
+        "NASA-FIRMS": "NASA Wildfires",
+    }
+    for src, name in layer_names.items():
+        point_layer(df[df["source"] == src], style, popup, name=name,
+                    cache=layer_cache, cache_key=f"source={src}", shards=shards).add_to(m)
 
-    # Add feature groups to map
-    noaa_group.add_to(m)
-    usgs_group.add_to(m)
-    fire_group.add_to(m)
+    # Unknown sources go straight on the map (no layer toggle)
+    other = df[~df["source"].isin(list(layer_names))]
+    if not other.empty:
+        point_layer(other, style, popup, control=False,
+                    cache=layer_cache, cache_key="source=other", shards=shards).add_to(m)
 
     # Add title with summary link
     title_html = '''
@@ -101,7 +97,11 @@ def make_map(csv_file="combined_disaster_feed.csv", output_file="disaster_map.ht
     m.get_root().html.add_child(folium.Element(legend_html))
 
     # Save
-    m.save(output_file)
+    with stage("render", "save", map="disaster_map") as span:
+        m.save(output_file)
+        if popup_shards is None:
+            shards.write()
+        span.rows_in, span.bytes_out = len(df), os.path.getsize(output_file)
     print(f"✅ Map saved to {output_file}")
 
 if __name__ == "__main__":
@@ -1,9 +1,27 @@
 import pandas as pd
 import os
+import requests
+
+from fips_index import assign_fips
+from instrumentation import stage
 
 files = ["noaa_alerts.csv", "usgs_earthquakes.csv", "wildfires.csv"]
-dfs = [pd.read_csv(f) for f in files if os.path.exists(f)]
-merged = pd.concat(dfs, ignore_index=True)
+with stage("parse", "merge") as span:
+    present = [f for f in files if os.path.exists(f)]
+    dfs = [pd.read_csv(f) for f in present]
+    merged = pd.concat(dfs, ignore_index=True)
+    span.bytes_in, span.rows_in = sum(os.path.getsize(f) for f in present), len(merged)
+    span.rows_out = len(merged)
 print(f"✅ Merged {sum(len(df) for df in dfs)} records")
 
+# State / county FIPS for every event (county polygons are cached after the first download)
+try:
+    with stage("enrich", "fips") as span:
+        span.rows_in = len(merged)
+        merged = assign_fips(merged)
+        span.rows_out = int(merged['county_fips'].notna().sum())
+    print(f"🗺️ Assigned FIPS to {span.rows_out} records")
+except (OSError, ValueError, requests.RequestException) as e:
+    print(f"⚠️ Skipping FIPS assignment: {e}")
+
 merged.to_csv("combined_disaster_feed.csv", index=False)
\ No newline at end of file
@@ -2,14 +2,19 @@ import requests
 import pandas as pd
 import feedparser
 import json
+import os
 from datetime import datetime, timedelta
 import re
 from urllib.parse import urlencode
+from instrumentation import stage
+from live_correlator import LiveCorrelator
+from relevance_model import DEFAULT_WEIGHTS_FILE, RelevanceModel
+from report_writer import DEFAULT_REPORT_FILE, DEFAULT_SUMMARY_FILE, StreamingReportWriter
 
 class DisasterNewsIntelligence:
     """Real-time news and social media monitoring for disaster events"""
     
-    def __init__(self):
+    def __init__(self, relevance_weights=DEFAULT_WEIGHTS_FILE, relevance_threshold=0.5):
         self.disaster_keywords = [
             'earthquake', 'wildfire', 'hurricane', 'tornado', 'flood', 'tsunami',
             'evacuation', 'emergency', 'disaster', 'storm', 'fire', 'quake',
@@ -30,6 +35,12 @@ class DisasterNewsIntelligence:
             'news', 'worldnews', 'CatastrophicFailure', 'NaturalDisasters',
             'weather', 'Wildfire', 'earthquake', 'TropicalWeather'
         ]
+        
+        # Optional trained relevance filter (see relevance_model.py)
+        self.relevance_model = None
+        self.relevance_threshold = relevance_threshold
+        if relevance_weights and os.path.exists(relevance_weights):
+            self.relevance_model = RelevanceModel.load(relevance_weights)
 
     def fetch_rss_news(self):
         """Fetch breaking news from RSS feeds and filter for disaster content"""
@@ -140,71 +151,63 @@ class DisasterNewsIntelligence:
         
         return news_results
 
+    def filter_relevant(self, news_items):
+        """Drop keyword hits the relevance model scores as noise (sports, celebrity, etc.)"""
+        if self.relevance_model is None:
+            return news_items
+        
+        kept = self.relevance_model.filter_items(news_items, self.relevance_threshold)
+        print(f"🧹 Relevance filter kept {len(kept)} of {len(news_items)} items")
+        return kept
+
     def correlate_with_disasters(self, news_data, disaster_data):
         """Correlate news reports with actual disaster data"""
-        correlations = []
-        
-        # Load disaster data
-        disasters_df = pd.read_csv(disaster_data)
+        # Load disaster data into an indexed correlator (token lookups
+        # instead of scanning every disaster row for every news item)
+        correlator = LiveCorrelator()
+        correlator.sync_events(pd.read_csv(disaster_data))
         
         for news_item in news_data:
-            title_text = news_item.get('title', '').lower()
-            summary_text = news_item.get('summary', '').lower()
-            
-            # Look for location matches
-            for _, disaster in disasters_df.iterrows():
-                disaster_area = str(disaster.get('area', '')).lower()
-                disaster_place = str(disaster.get('place', '')).lower()
-                
-                # Simple correlation based on location mentions
-                if (disaster_area and any(word in title_text + summary_text 
-                                        for word in disaster_area.split() if len(word) > 3)) or \
-                   (disaster_place and any(word in title_text + summary_text 
-                                         for word in disaster_place.split() if len(word) > 3)):
-                    
-                    correlations.append({
-                        'news_title': news_item['title'],
-                        'news_source': news_item['source'],
-                        'news_url': news_item['url'],
-                        'disaster_type': disaster.get('event', ''),
-                        'disaster_source': disaster.get('source', ''),
-                        'disaster_location': disaster_area or disaster_place,
-                        'disaster_coords': f"{disaster.get('lat', '')}, {disaster.get('lon', '')}",
-                        'correlation_strength': 'LOCATION_MATCH',
-                        'timestamp': datetime.now().isoformat()
-                    })
-        
-        return correlations
+            correlator.add_news(news_item)
+        
+        return correlator.active_correlations()
 
-    def generate_intelligence_report(self):
+    def generate_intelligence_report(self, disaster_data='combined_disaster_feed.csv',
+                                     report_file=DEFAULT_REPORT_FILE, summary_file=DEFAULT_SUMMARY_FILE):
         """Generate comprehensive disaster intelligence report"""
         print("🚨 GENERATING DISASTER INTELLIGENCE REPORT...")
         
-        # Fetch all news sources
-        rss_news = self.fetch_rss_news()
-        reddit_posts = self.search_reddit_disasters()
-        web_news = self.search_news_api()
-        
-        all_news = rss_news + reddit_posts + web_news
-        
-        # Correlate with disaster data
-        correlations = self.correlate_with_disasters(all_news, 'combined_disaster_feed.csv')
-        
-        # Generate report
-        report = {
-            'generated_at': datetime.now().isoformat(),
-            'total_news_items': len(all_news),
-            'rss_items': len(rss_news),
-            'reddit_items': len(reddit_posts),
-            'web_news_items': len(web_news),
-            'correlations_found': len(correlations),
-            'news_items': all_news,
-            'correlations': correlations
-        }
-        
-        # Save to files
-        with open('disaster_intelligence_report.json', 'w') as f:
-            json.dump(report, f, indent=2)
+        all_news = []
+        added = []
+        correlator = LiveCorrelator()
+        correlator.sync_events(pd.read_csv(disaster_data))
+        
+        # Stream items and correlations to disk as each source comes in
+        with StreamingReportWriter(report_file, summary_file) as writer:
+            def on_change(change):
+                if change['op'] == 'add':
+                    added.append(1)
+                    writer.write_correlation(change['correlation'])
+                else:
+                    writer.write_retraction(change['correlation'])
+            correlator.subscribe(on_change)
+            
+            for feed_type, fetch in [('rss', self.fetch_rss_news),
+                                     ('reddit', self.search_reddit_disasters),
+                                     ('web_news', self.search_news_api)]:
+                with stage('fetch', feed_type) as span:
+                    items = self.filter_relevant(fetch())
+                    span.rows_out = len(items)
+                writer.write_news(items, feed_type)
+                with stage('correlate', feed_type) as span:
+                    before = len(added)
+                    for item in items:
+                        correlator.add_news(item)
+                    span.rows_in, span.rows_out = len(items), len(added) - before
+                all_news += items
+            
+            correlations = correlator.active_correlations()
+            report = dict(writer.summary(), news_items=all_news, correlations=correlations)
         
         # Create CSV for easy analysis
         if all_news:
@@ -224,13 +227,13 @@ if __name__ == "__main__":
     print("\n📊 DISASTER INTELLIGENCE SUMMARY:")
     print(f"📰 News items collected: {report['total_news_items']}")
     print(f"🔗 Correlations found: {report['correlations_found']}")
-    print(f"📡 RSS feeds: {report['rss_items']}")
-    print(f"🗨️ Reddit posts: {report['reddit_items']}")
-    print(f"🌐 Web news: {report['web_news_items']}")
+    print(f"📡 RSS feeds: {report.get('rss_items', 0)}")
+    print(f"🗨️ Reddit posts: {report.get('reddit_items', 0)}")
+    print(f"🌐 Web news: {report.get('web_news_items', 0)}")
     
     if report['correlations_found'] > 0:
         print("\n🎯 TOP CORRELATIONS:")
         for corr in report['correlations'][:5]:
             print(f"  • {corr['news_title'][:60]}... → {corr['disaster_type']} in {corr['disaster_location']}")
     
-    print("\n✅ Intelligence report saved to disaster_intelligence_report.json")
\ No newline at end of file
+    print(f"\n✅ Intelligence report streamed to {DEFAULT_REPORT_FILE} (summary in {DEFAULT_SUMMARY_FILE})")
\ No newline at end of file
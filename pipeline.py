@@ -0,0 +1,368 @@
+import csv
+import hashlib
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from instrumentation import DEFAULT_METRICS_DIR, PARENT_ENV, TRACE_ENV, Span, export_run, read_spans
+
+STATE_FILE = '.pipeline_state.json'
+_RUN_COUNTER = itertools.count(1)
+
+
+class Stage:
+    """
+    One step of the pipeline: a script run as a subprocess, with the files
+    it reads and writes. `external` stages read sources outside the DAG
+    (APIs, RSS) and so run every time; the rest are skipped while their
+    inputs (and their own script) hash the same as on their last success
+    and their outputs are still what they wrote. Outputs ending in '/' are
+    folders (popup shards, cluster tiles), hashed as a whole. `phase`
+    (fetch / parse / enrich / correlate / render) groups stages in the run
+    metrics.
+    """
+
+    def __init__(self, name, script, inputs=(), outputs=(), external=False, args=(), phase=None):
+        self.name = name
+        self.phase = phase or name
+        self.script = script
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.external = external
+        self.args = list(args)
+
+    def command(self):
+        return [sys.executable, self.script] + self.args
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+
+STAGES = [
+    Stage('fetch_noaa', 'fetch_noaa.py', outputs=['noaa_alerts.csv'], external=True,
+          phase='fetch'),
+    Stage('fetch_usgs', 'fetch_usgs.py', outputs=['usgs_earthquakes.csv'], external=True,
+          phase='fetch'),
+    Stage('fetch_wildfire', 'fetch_wildfire.py', outputs=['wildfires.csv'], external=True,
+          phase='fetch'),
+    Stage('merge', 'merge_feeds.py', inputs=['noaa_alerts.csv', 'usgs_earthquakes.csv', 'wildfires.csv'],
+          outputs=['combined_disaster_feed.csv'], phase='parse'),
+    Stage('enrich', 'risk_engine.py', inputs=['combined_disaster_feed.csv'], outputs=['enriched_disaster_feed.csv'],
+          phase='enrich'),
+    Stage('news', 'news_intelligence.py', inputs=['combined_disaster_feed.csv'], external=True, phase='correlate',
+          outputs=['disaster_news_feed.csv', 'news_disaster_correlations.csv',
+                   'disaster_intelligence_report.ndjson', 'disaster_intelligence_summary.json']),
+    Stage('disaster_map', 'make_map.py', inputs=['combined_disaster_feed.csv'],
+          outputs=['disaster_map.html', 'disaster_map_popups/'], phase='render'),
+    Stage('clean_map', 'clean_map.py', inputs=['combined_disaster_feed.csv'],
+          outputs=['clean_map.html', 'clean_map_popups/'], phase='render'),
+    Stage('professional_map', 'advanced_map.py', inputs=['combined_disaster_feed.csv'],
+          outputs=['professional_map.html', 'professional_map_popups/', 'professional_map_tiles/'],
+          phase='render'),
+    Stage('summary', 'summary_plot.py', inputs=['combined_disaster_feed.csv'], outputs=['summary.html'],
+          phase='render'),
+    Stage('intelligence_dashboard', 'intelligence_dashboard.py',
+          inputs=['combined_disaster_feed.csv', 'disaster_news_feed.csv', 'news_disaster_correlations.csv'],
+          outputs=['intelligence_dashboard.html', 'intelligence_dashboard_popups/'], phase='render'),
+]
+
+
+def count_rows(path):
+    """Data rows of a CSV (quoted newlines count once), None for other files"""
+    if not path.endswith('.csv'):
+        return None
+    with open(path, newline='', encoding='utf-8', errors='replace') as f:
+        return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+
+
+class FileHasher:
+    """
+    Content hashes (sha1), sizes and CSV row counts of files, reusing the
+    previous run's entry while a file's size and mtime are unchanged so
+    large feeds aren't re-read. A folder is hashed as a whole (relative
+    paths and contents of every file), reused while no file in it changed.
+    """
+
+    def __init__(self, known=None):
+        self.known = {path: entry for path, entry in (known or {}).items() if len(entry) == 4}
+        # path -> [size, mtime_ns (stat hash for folders), digest, rows]
+
+    def entry(self, path):
+        if os.path.isdir(path):
+            return self._folder_entry(path)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        entry = self.known.get(path)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        self.known[path] = [st.st_size, st.st_mtime_ns, digest.hexdigest(), count_rows(path)]
+        return self.known[path]
+
+    def _folder_entry(self, path):
+        files = []
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            for name in sorted(names):
+                full = os.path.join(root, name)
+                st = os.stat(full)
+                files.append((os.path.relpath(full, path), full, st.st_size, st.st_mtime_ns))
+        size = sum(f[2] for f in files)
+        stamp = hashlib.sha1(repr([(rel, size_, mtime) for rel, _, size_, mtime in files]).encode()).hexdigest()
+        entry = self.known.get(path)
+        if entry and entry[0] == size and entry[1] == stamp:
+            return entry
+        digest = hashlib.sha1()
+        for rel, full, _, _ in files:
+            digest.update(rel.encode() + b'\0')
+            with open(full, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+            digest.update(b'\0')
+        self.known[path] = [size, stamp, digest.hexdigest(), None]
+        return self.known[path]
+
+    def __call__(self, path):
+        entry = self.entry(path)
+        return entry[2] if entry else None
+
+    def totals(self, paths):
+        """(bytes, rows) summed over the files that exist (rows None if no CSVs)"""
+        entries = [e for e in map(self.entry, paths) if e]
+        rows = [e[3] for e in entries if e[3] is not None]
+        return sum(e[0] for e in entries), (sum(rows) if rows else None)
+
+
+class Pipeline:
+    """
+    DAG runner over the fetch / merge / enrich / news / map scripts.
+
+    Edges come from the declared files: a stage depends on whichever stage
+    writes each of its inputs. Independent stages (the three fetches, the
+    maps) run in parallel. When a stage's turn comes, its input hashes are
+    compared with the ones it last ran on, so a re-fetch that brought back
+    identical USGS data skips everything downstream of it, and a changed
+    NOAA feed only reruns what reads it.
+
+    Every run leaves a JSON trace and a Prometheus textfile in metrics_dir:
+    one span per stage (wall time, bytes / CSV rows in and out, the child
+    process's peak RSS) plus the finer spans the scripts record themselves
+    through instrumentation.stage().
+    """
+
+    def __init__(self, stages=None, workdir='.', state_file=STATE_FILE, workers=None,
+                 metrics_dir=DEFAULT_METRICS_DIR):
+        self.stages = {stage.name: stage for stage in (stages or STAGES)}
+        self.workdir = workdir
+        self.state_path = os.path.join(workdir, state_file)
+        self.metrics_dir = os.path.join(workdir, metrics_dir) if metrics_dir else None
+        self.workers = workers or max(4, os.cpu_count() or 1)
+        producers = {}
+        for stage in self.stages.values():
+            for path in stage.outputs:
+                if path in producers:
+                    raise ValueError(f"{path} is written by both {producers[path]} and {stage.name}")
+                producers[path] = stage.name
+        self.deps = {name: sorted({producers[p] for p in stage.inputs if p in producers} - {name})
+                     for name, stage in self.stages.items()}
+        self.order()    # fails early on cycles
+
+    def order(self):
+        """Stage names in dependency order"""
+        done, ordered, visiting = set(), [], set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline cycle through {name}")
+            visiting.add(name)
+            for dep in self.deps[name]:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            ordered.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return ordered
+
+    def select(self, targets=None, only=False):
+        """The targets plus every stage upstream of them (all stages by default)"""
+        if not targets:
+            return set(self.stages)
+        unknown = set(targets) - set(self.stages)
+        if unknown:
+            raise ValueError(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+        if only:
+            return set(targets)
+        selected, stack = set(), list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in selected:
+                selected.add(name)
+                stack.extend(self.deps[name])
+        return selected
+
+    def _path(self, path):
+        return os.path.join(self.workdir, path)
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {'stages': {}, 'files': {}}
+
+    def _save_state(self, state):
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=1)
+        os.replace(tmp, self.state_path)
+
+    def _fingerprint(self, stage, hasher):
+        """Hash of the stage's script and every input it reads"""
+        digest = hashlib.sha1(' '.join(stage.command()[1:]).encode('utf-8'))
+        for path in [stage.script] + stage.inputs:
+            digest.update(f"{path}={hasher(self._path(path))};".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _run_stage(self, stage, env):
+        """(exit code, stdout, stderr, seconds, peak RSS bytes) of one stage subprocess"""
+        start = time.perf_counter()
+        with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+            proc = subprocess.Popen(stage.command(), cwd=self.workdir, stdout=out, stderr=err, env=env)
+            # wait4 instead of wait: the rusage carries this child's own peak RSS
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            seconds = time.perf_counter() - start
+            out.seek(0)
+            err.seek(0)
+            return (proc.returncode, out.read().decode('utf-8', 'replace'), err.read().decode('utf-8', 'replace'),
+                    seconds, usage.ru_maxrss * 1024)
+
+    def run(self, targets=None, force=False, only=False, quiet=False):
+        """
+        Run the selected stages (and whatever they depend on), in parallel
+        where the DAG allows. Returns {stage: 'ran' | 'skipped' | 'failed' |
+        'blocked'}; state is saved after every finished stage.
+        """
+        selected = self.select(targets, only)
+        state = self._load_state()
+        hasher = FileHasher(state.get('files'))
+        status = {}
+        pending = [name for name in self.order() if name in selected]
+        running = {}
+        started = time.perf_counter()
+        # Millisecond stamp + pid + per-process counter: unique even for back-to-back runs
+        now = time.time()
+        run_id = (time.strftime('%Y%m%dT%H%M%S', time.localtime(now)) +
+                  f'.{int(now * 1000) % 1000:03d}-{os.getpid()}-{next(_RUN_COUNTER)}')
+        spans, sink = [], None
+        if self.metrics_dir:
+            os.makedirs(self.metrics_dir, exist_ok=True)
+            sink = os.path.abspath(os.path.join(self.metrics_dir, f'spans-{run_id}.jsonl'))
+
+        def log(message):
+            if not quiet:
+                print(message)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while pending or running:
+                for name in list(pending):
+                    deps = [d for d in self.deps[name] if d in selected]
+                    if any(status.get(d) in ('failed', 'blocked') for d in deps):
+                        status[name] = 'blocked'
+                        pending.remove(name)
+                        log(f"⛔ {name}: blocked by a failed upstream stage")
+                        continue
+                    if not all(d in status for d in deps):
+                        continue
+                    pending.remove(name)
+                    stage = self.stages[name]
+                    fingerprint = self._fingerprint(stage, hasher)
+                    previous = state['stages'].get(name, {})
+                    outputs_intact = all(hasher(self._path(p)) == h for p, h in previous.get('outputs', {}).items())
+                    if (not force and not stage.external and previous.get('fingerprint') == fingerprint
+                            and outputs_intact):
+                        status[name] = 'skipped'
+                        skipped = Span(stage.phase, name)
+                        skipped.status, skipped.seconds = 'skipped', 0.0
+                        spans.append(skipped)
+                        log(f"⏭️ {name}: inputs unchanged")
+                        continue
+                    env = dict(os.environ)
+                    if sink:
+                        env.update({TRACE_ENV: sink, PARENT_ENV: name})
+                    span = Span(stage.phase, name)
+                    span.bytes_in, span.rows_in = hasher.totals([self._path(p) for p in stage.inputs])
+                    running[pool.submit(self._run_stage, stage, env)] = (name, fingerprint, span)
+
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name, fingerprint, span = running.pop(future)
+                    stage = self.stages[name]
+                    code, stdout, stderr, seconds, peak = future.result()
+                    span.seconds, span.peak_bytes = seconds, peak
+                    span.bytes_out, span.rows_out = hasher.totals([self._path(p) for p in stage.outputs])
+                    spans.append(span)
+                    if code != 0:
+                        span.status = 'failed'
+                        status[name] = 'failed'
+                        log(f"❌ {name} failed ({seconds:.1f}s):\n{(stderr or stdout).strip()[-2000:]}")
+                        continue
+                    outputs = {p: hasher(self._path(p)) for p in stage.outputs}
+                    previous = state['stages'].get(name, {})
+                    changed = [p for p, h in outputs.items() if previous.get('outputs', {}).get(p) != h]
+                    status[name] = 'ran'
+                    state['stages'][name] = {'fingerprint': fingerprint, 'outputs': outputs,
+                                             'seconds': round(seconds, 3), 'finished': time.time()}
+                    state['files'] = hasher.known
+                    self._save_state(state)
+                    log(f"✅ {name} ({seconds:.1f}s)" + (f" changed {', '.join(changed)}" if changed else
+                                                        " - outputs unchanged"))
+
+        counts = {s: sum(1 for v in status.values() if v == s) for s in ('ran', 'skipped', 'failed', 'blocked')}
+        seconds = time.perf_counter() - started
+        log(f"🏁 Pipeline done in {seconds:.1f}s: " + ", ".join(f"{n} {s}" for s, n in counts.items() if n))
+        if sink:
+            spans += read_spans(sink)
+            if os.path.exists(sink):
+                os.remove(sink)
+            trace = export_run(spans, run_id, time.time() - seconds, seconds, self.metrics_dir,
+                               extra={'status': status})
+            log(f"📈 Run metrics: {trace}")
+        return status
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the disaster data pipeline, skipping unchanged stages")
+    parser.add_argument("targets", nargs="*", help="stages to bring up to date (default: all)")
+    parser.add_argument("--force", action="store_true", help="rerun stages even if their inputs are unchanged")
+    parser.add_argument("--only", action="store_true", help="run just the named stages, not their upstream")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--list", action="store_true", help="print the stages and their dependencies")
+    args = parser.parse_args()
+
+    pipeline = Pipeline(workers=args.workers)
+    if args.list:
+        for name in pipeline.order():
+            deps = pipeline.deps[name]
+            print(f"{name:24} <- {', '.join(deps) if deps else '(sources)'}")
+    else:
+        result = pipeline.run(args.targets, force=args.force, only=args.only)
+        sys.exit(1 if any(v in ('failed', 'blocked') for v in result.values()) else 0)
@@ -3,6 +3,10 @@ import feedparser
 import json
 from datetime import datetime, timedelta
 import re
+import os
+from email.utils import parsedate_to_datetime
+from burst_detector import BurstDetector
+from event_index import location_tokens, tokenize
 
 def demo_reddit_monitoring():
     """Show real Reddit disaster monitoring in action"""
@@ -138,6 +142,33 @@ def demo_rss_monitoring():
     
     return breaking_news
 
+def _item_timestamp(item):
+    """Epoch seconds for a Reddit post or RSS story (now if unknown)"""
+    if isinstance(item.get('created'), datetime):
+        return item['created'].timestamp()
+    try:
+        return parsedate_to_datetime(item['published']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return datetime.now().timestamp()
+
+def detect_bursts(reddit_data, news_data, disaster_csv="combined_disaster_feed.csv"):
+    """Feed keyword and location mentions through a sliding-window burst detector"""
+    # Location vocabulary comes from the active disaster feed, if we have one
+    known_locations = set()
+    if os.path.exists(disaster_csv):
+        import pandas as pd
+        df = pd.read_csv(disaster_csv, usecols=lambda c: c in ("area", "place"))
+        for col in df.columns:
+            known_locations |= location_tokens(*df[col].dropna().unique())
+    
+    detector = BurstDetector()
+    items = sorted(reddit_data + news_data, key=_item_timestamp)
+    for item in items:
+        words = set(tokenize(item['title']))
+        detector.observe_item(item['keywords'], words & known_locations, _item_timestamp(item))
+    
+    return detector.active_bursts(datetime.now().timestamp())
+
 def demonstrate_correlation():
     """Show how we can correlate social media discussions with news"""
     print("\n\n🔗 CORRELATION ANALYSIS DEMO")
@@ -158,6 +189,14 @@ def demonstrate_correlation():
     
     common_topics = reddit_keywords.intersection(news_keywords)
     
+    # Rate-based trending: replay both streams in time order through the burst detector
+    bursts = detect_bursts(reddit_data, news_data)
+    if bursts:
+        print(f"\n📈 BURSTING TOPICS (mention rate well above baseline):")
+        for burst in bursts:
+            print(f"   ⚡ {burst['key']}: {burst['count']} mentions in window "
+                  f"(expected {burst['expected']}, z={burst['z_score']})")
+    
     if common_topics:
         print(f"\n🎯 TRENDING DISASTER TOPICS (mentioned in both news AND social media):")
         for topic in common_topics:
@@ -171,6 +210,7 @@ def demonstrate_correlation():
         'reddit_discussions': len(reddit_data),
         'news_stories': len(news_data),
         'trending_topics': list(common_topics),
+        'bursts': bursts,
         'sample_reddit': reddit_data[:3],
         'sample_news': news_data[:3]
     }
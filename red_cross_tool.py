@@ -1,12 +1,21 @@
 import requests
 import pandas as pd
 from datetime import datetime, timedelta
+import os
 import folium
 
+from event_index import event_id
+from facilities import DEFAULT_FACILITIES_FILE, FacilityIndex
+from geofence import DEFAULT_SUBSCRIPTIONS_FILE, SubscriptionIndex
+from incidents import group_events
+from population import DEFAULT_GRID_PREFIX, PopulationGrid
+from risk_engine import DisasterRiskEngine
+
 class RedCrossDisasterTool:
     """Focused disaster monitoring for American Red Cross operations"""
     
-    def __init__(self):
+    def __init__(self, subscriptions=DEFAULT_SUBSCRIPTIONS_FILE, population=DEFAULT_GRID_PREFIX,
+                 shelter_min_population=1000, facilities=DEFAULT_FACILITIES_FILE):
         # US geographic bounds
         self.us_bounds = {
             'lat_min': 18.9,   # Southern tip of Hawaii
@@ -21,6 +30,23 @@ class RedCrossDisasterTool:
             'Flash Flood Warning', 'Flood Warning', 'Blizzard Warning',
             'Ice Storm Warning', 'Severe Thunderstorm Warning'
         ]
+        
+        # Chapter geofences (SubscriptionIndex or a GeoJSON path); optional
+        if isinstance(subscriptions, str):
+            subscriptions = SubscriptionIndex.load(subscriptions) if os.path.exists(subscriptions) else None
+        self.subscriptions = subscriptions
+        
+        # Population raster (PopulationGrid or a grid prefix); optional. With it,
+        # an event only needs shelters if enough people live in its footprint
+        if isinstance(population, str):
+            population = PopulationGrid(population) if PopulationGrid.available(population) else None
+        self.population = population
+        self.shelter_min_population = shelter_min_population
+        
+        # Shelters / warehouses / ERVs (FacilityIndex or a CSV path); optional
+        if isinstance(facilities, str):
+            facilities = FacilityIndex(facilities) if os.path.exists(facilities) else None
+        self.facilities = facilities
 
     def get_us_weather_emergencies(self):
         """Get current weather emergencies requiring shelter response"""
@@ -51,6 +77,9 @@ class RedCrossDisasterTool:
                             
                             # Only active alerts
                             if not expires_dt or expires_dt > datetime.now():
+                                footprint = {}
+                                if self.population is not None:
+                                    footprint['population_affected'] = self.population.polygon_sum(geom)
                                 emergencies.append({
                                     'type': 'WEATHER_EMERGENCY',
                                     'event': event,
@@ -60,7 +89,8 @@ class RedCrossDisasterTool:
                                     'expires': expires,
                                     'lat': center_lat,
                                     'lon': center_lon,
-                                    'shelter_required': True
+                                    'shelter_required': True,
+                                    **footprint
                                 })
         except Exception as e:
             print(f"Error fetching weather alerts: {e}")
@@ -138,6 +168,88 @@ class RedCrossDisasterTool:
         return (self.us_bounds['lat_min'] <= lat <= self.us_bounds['lat_max'] and
                 self.us_bounds['lon_min'] <= lon <= self.us_bounds['lon_max'])
 
+    def events_from_snapshot(self, df):
+        """
+        Same shelter rules as the live fetchers, applied to an already merged
+        feed (combined_disaster_feed.csv schema) instead of re-querying the APIs
+        """
+        in_us = ((df['lat'] >= self.us_bounds['lat_min']) & (df['lat'] <= self.us_bounds['lat_max']) &
+                 (df['lon'] >= self.us_bounds['lon_min']) & (df['lon'] <= self.us_bounds['lon_max']))
+        def col(name):
+            return df[name] if name in df.columns else pd.Series(index=df.index, dtype=float)
+        
+        weather = df[in_us & (df['source'] == 'NOAA') &
+                     (col('event').isin(self.shelter_triggers) | (col('severity') == 'Extreme'))]
+        quakes = df[in_us & (df['source'] == 'USGS') & (col('magnitude') >= 4.0)]
+        fires = df[in_us & (df['source'] == 'NASA-FIRMS') & (col('confidence') >= 85) & (col('frp') >= 200)]
+        
+        events = []
+        for row in weather.to_dict('records'):
+            events.append({'type': 'WEATHER_EMERGENCY', 'event': row.get('event'), 'severity': row.get('severity'),
+                           'area': row.get('area'), 'headline': row.get('headline'), 'expires': '',
+                           'lat': row['lat'], 'lon': row['lon'], 'shelter_required': True})
+        for row in quakes.to_dict('records'):
+            events.append({'type': 'EARTHQUAKE', 'magnitude': row['magnitude'], 'location': row.get('place'),
+                           'time': row.get('time'), 'lat': row['lat'], 'lon': row['lon'],
+                           'shelter_required': row['magnitude'] >= 5.5})
+        for row in fires.to_dict('records'):
+            events.append({'type': 'WILDFIRE', 'confidence': row['confidence'], 'frp': row['frp'],
+                           'lat': row['lat'], 'lon': row['lon'], 'detection_time': row.get('acq_datetime'),
+                           'shelter_required': row['frp'] >= 500})
+        return events
+
+    def estimate_population(self, events):
+        """
+        Add impact_radius_km and population_affected (from the population
+        raster) to each event, and only keep shelter_required where at least
+        shelter_min_population people live inside the footprint. Events that
+        already carry population_affected (alert polygons) or a radius keep it.
+        """
+        if self.population is None or not events:
+            return events
+        sources = {'WEATHER_EMERGENCY': 'NOAA', 'EARTHQUAKE': 'USGS', 'WILDFIRE': 'NASA-FIRMS'}
+        for event in events:
+            if event.get('impact_radius_km') is None:
+                event['impact_radius_km'] = DisasterRiskEngine.get_impact_radius(
+                    dict(event, source=sources.get(event['type'], ''), event=event.get('event') or ''))
+        todo = [e for e in events if 'population_affected' not in e]
+        if todo:
+            for event, people in zip(todo, self.population.event_population(todo)):
+                event['population_affected'] = float(people)
+        for event in events:
+            event['shelter_required'] = bool(event['shelter_required'] and
+                                             event['population_affected'] >= self.shelter_min_population)
+        return events
+
+    def shelter_events(self, events):
+        """
+        The events that need shelters: the single place the population
+        estimate and threshold are applied (fetchers and events_from_snapshot
+        return raw events)
+        """
+        return [e for e in self.estimate_population(events) if e.get('shelter_required', False)]
+
+    def assign_shelters(self, events):
+        """
+        Which shelters take each shelter-required event (capacity-constrained,
+        nearest first); returns (assignments DataFrame, {event_id: unmet beds})
+        """
+        if self.facilities is None or not events:
+            return pd.DataFrame(), {}
+        for event in events:
+            event.setdefault('event_id', event_id(event))
+        return self.facilities.assign(events, kind='shelter')
+
+    def incident_groups(self, events):
+        """{incident_id: [events]}: events whose impact footprints overlap form one incident"""
+        return group_events(events)
+
+    def chapter_alerts(self, events):
+        """{chapter: [events]} for the chapters whose geofences and filters match"""
+        if self.subscriptions is None or not events:
+            return {}
+        return self.subscriptions.notifications(events)
+
     def generate_shelter_deployment_report(self):
         """Generate actionable report for Red Cross shelter deployment"""
         print("🏠 RED CROSS SHELTER DEPLOYMENT ANALYSIS")
@@ -150,47 +262,72 @@ class RedCrossDisasterTool:
         
         all_events = weather + earthquakes + wildfires
         
-        # Filter for shelter-requiring events only
-        shelter_events = [e for e in all_events if e.get('shelter_required', False)]
+        # Filter for shelter-requiring events only (population estimated here, once)
+        shelter_events = self.shelter_events(all_events)
+        
+        # Chapters get every event inside their geofences that passes their own filters
+        alerts = self.chapter_alerts(all_events)
+        if alerts:
+            print("📨 Chapter alerts: " + ", ".join(f"{c} ({len(ev)})" for c, ev in sorted(alerts.items())))
+            pd.DataFrame([dict(e, chapter=c) for c, ev in alerts.items() for e in ev]).to_csv(
+                'red_cross_chapter_alerts.csv', index=False)
         
         if not shelter_events:
             print("✅ No major disasters currently requiring shelter deployment")
             return []
         
-        print(f"\n🚨 {len(shelter_events)} EVENTS REQUIRING SHELTER RESPONSE:")
+        incidents = self.incident_groups(shelter_events)
+        print(f"\n🚨 {len(shelter_events)} EVENTS IN {len(incidents)} INCIDENTS REQUIRING SHELTER RESPONSE:")
         print("-" * 60)
         
-        for i, event in enumerate(shelter_events, 1):
-            print(f"\n{i}. {event['type']}")
-            
-            if event['type'] == 'WEATHER_EMERGENCY':
-                print(f"   Event: {event['event']}")
-                print(f"   Area: {event['area']}")
-                print(f"   Severity: {event['severity']}")
-                if event.get('expires'):
-                    print(f"   Expires: {event['expires']}")
-            
-            elif event['type'] == 'EARTHQUAKE':
-                print(f"   Magnitude: {event['magnitude']}")
-                print(f"   Location: {event['location']}")
-                print(f"   Time: {event['time']}")
+        for n, (incident, members) in enumerate(incidents.items(), 1):
+            types = ", ".join(sorted({e['type'] for e in members}))
+            print(f"\n{n}. {incident}: {len(members)} event{'s' if len(members) > 1 else ''} ({types})")
             
-            elif event['type'] == 'WILDFIRE':
-                print(f"   Fire Intensity: {event['frp']} MW")
-                print(f"   Confidence: {event['confidence']}%")
-                print(f"   Detection: {event['detection_time']}")
-            
-            print(f"   📍 Coordinates: {event['lat']:.3f}, {event['lon']:.3f}")
+            for event in members:
+                print(f"   - {event['type']}")
+                
+                if event['type'] == 'WEATHER_EMERGENCY':
+                    print(f"     Event: {event['event']}")
+                    print(f"     Area: {event['area']}")
+                    print(f"     Severity: {event['severity']}")
+                    if event.get('expires'):
+                        print(f"     Expires: {event['expires']}")
+                
+                elif event['type'] == 'EARTHQUAKE':
+                    print(f"     Magnitude: {event['magnitude']}")
+                    print(f"     Location: {event['location']}")
+                    print(f"     Time: {event['time']}")
+                
+                elif event['type'] == 'WILDFIRE':
+                    print(f"     Fire Intensity: {event['frp']} MW")
+                    print(f"     Confidence: {event['confidence']}%")
+                    print(f"     Detection: {event['detection_time']}")
+                
+                if 'population_affected' in event:
+                    print(f"     👥 Population in footprint: {event['population_affected']:,.0f}")
+                print(f"     📍 Coordinates: {event['lat']:.3f}, {event['lon']:.3f}")
         
         # Save deployment data
         if shelter_events:
+            assignments, unmet = self.assign_shelters(shelter_events)
+            if not assignments.empty:
+                print(f"\n🏫 SHELTER ASSIGNMENTS:")
+                for eid, rows in assignments.groupby('event_id', sort=False):
+                    plan = ", ".join(f"{r.facility} ({r.allocated:,.0f} beds, {r.distance_km:.0f} km)"
+                                     for r in rows.itertuples())
+                    print(f"   {eid}: {plan}")
+                assignments.to_csv('red_cross_assignments.csv', index=False)
+            for eid, short in unmet.items():
+                print(f"   ⚠️ {eid}: {short:,.0f} beds without a shelter")
+            
             df = pd.DataFrame(shelter_events)
             df.to_csv('red_cross_deployments.csv', index=False)
             print(f"\n💾 Deployment data saved to red_cross_deployments.csv")
         
         return shelter_events
 
-    def create_deployment_map(self, events):
+    def create_deployment_map(self, events, output_file='red_cross_deployment_map.html', fit_bounds=False):
         """Create map for Red Cross deployment planning"""
         if not events:
             print("No events to map")
@@ -199,6 +336,25 @@ class RedCrossDisasterTool:
         # Center map on CONUS
         m = folium.Map(location=[39.8, -98.6], zoom_start=4)
         
+        # Incidents of several events: outline every member's footprint together
+        incidents = self.incident_groups(events)
+        zones = folium.FeatureGroup(name='Incident Zones')
+        for incident, members in incidents.items():
+            if len(members) < 2:
+                continue
+            label = f"{incident}: {len(members)} events"
+            for event in members:
+                folium.Circle(
+                    location=[event['lat'], event['lon']],
+                    radius=event['impact_radius_km'] * 1000,
+                    color='#6a1b9a',
+                    weight=2,
+                    fill=True,
+                    fillOpacity=0.1,
+                    tooltip=label
+                ).add_to(zones)
+        zones.add_to(m)
+        
         for event in events:
             # Color by event type
             if event['type'] == 'WEATHER_EMERGENCY':
@@ -215,6 +371,7 @@ class RedCrossDisasterTool:
             popup_text = f"""
             <b>{icon} {event['type']}</b><br>
             <b>SHELTER REQUIRED</b><br>
+            Incident: {event['incident_id']} ({len(incidents[event['incident_id']])} events)<br>
             Coordinates: {event['lat']:.3f}, {event['lon']:.3f}
             """
             
@@ -241,13 +398,17 @@ class RedCrossDisasterTool:
         <div style="position: fixed; top: 10px; left: 50%; transform: translateX(-50%);
                     z-index:9999; background: #d32f2f; color: white; 
                     padding: 15px; border-radius: 8px; font-family: Arial; font-weight: bold;">
-        🏠 RED CROSS SHELTER DEPLOYMENT MAP - {len(events)} ACTIVE EVENTS
+        🏠 RED CROSS SHELTER DEPLOYMENT MAP - {len(events)} ACTIVE EVENTS IN {len(incidents)} INCIDENTS
         </div>
         """
         m.get_root().html.add_child(folium.Element(title_html))
         
-        m.save('red_cross_deployment_map.html')
-        print(f"🗺️ Deployment map saved to red_cross_deployment_map.html")
+        if fit_bounds:
+            lats, lons = [e['lat'] for e in events], [e['lon'] for e in events]
+            m.fit_bounds([[min(lats), min(lons)], [max(lats), max(lons)]])
+        
+        m.save(output_file)
+        print(f"🗺️ Deployment map saved to {output_file}")
 
 if __name__ == "__main__":
     tool = RedCrossDisasterTool()
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from render_pipeline import RenderPipeline
+
+DEFAULT_OUTPUT_DIR = 'regions'
+SNAPSHOT_FILE = 'snapshot.npy'
+MANIFEST_FILE = 'manifest.json'
+# Drifts on every reload without changing what a regional map shows
+VOLATILE_COLUMNS = ('hours_ago',)
+
+
+def frame_to_records(df):
+    """
+    DataFrame -> numpy structured array with fixed-width fields, so it can
+    be saved once and memory-mapped by every worker
+    """
+    fields, columns = [], []
+    for name in df.columns:
+        col = df[name]
+        if pd.api.types.is_bool_dtype(col):
+            fields.append((name, '?'))
+            columns.append(col.to_numpy(dtype=bool))
+        elif pd.api.types.is_numeric_dtype(col):
+            kind = 'i8' if pd.api.types.is_integer_dtype(col) else 'f8'
+            fields.append((name, kind))
+            columns.append(col.to_numpy(dtype=kind))
+        elif pd.api.types.is_datetime64_any_dtype(col):
+            fields.append((name, 'M8[us]'))
+            columns.append(col.dt.tz_localize(None).to_numpy(dtype='M8[us]') if col.dt.tz is not None
+                           else col.to_numpy(dtype='M8[us]'))
+        else:
+            text = col.astype(object).where(col.notna(), '').astype(str)
+            fields.append((name, f'U{max(1, int(text.str.len().max() or 1))}'))
+            columns.append(text.to_numpy())
+    records = np.empty(len(df), dtype=fields)
+    for (name, _), values in zip(fields, columns):
+        records[name] = values
+    return records
+
+
+def records_to_frame(records):
+    """Inverse of frame_to_records (empty strings come back as NaN)"""
+    df = pd.DataFrame({name: np.asarray(records[name]) for name in records.dtype.names})
+    for name in records.dtype.names:
+        if records.dtype[name].kind == 'U':
+            df[name] = df[name].replace('', np.nan)
+    return df
+
+
+def write_snapshot(df, path):
+    """Save the enriched snapshot for the workers (atomically)"""
+    tmp = path + '.tmp.npy'
+    np.save(tmp, frame_to_records(df))
+    os.replace(tmp, path)
+    return path
+
+
+def partition(df, by='state', subscriptions=None):
+    """
+    {region name: row positions} for the snapshot. by='state' (one per
+    state_fips), 'region' (fips_index.REGIONS) or 'chapter' (geofence
+    subscriptions; an event can belong to several chapters).
+    """
+    if by == 'chapter':
+        if subscriptions is None:
+            from geofence import SubscriptionIndex
+            subscriptions = SubscriptionIndex.load()
+        groups = {}
+        for i, fence in subscriptions.match_events(df):
+            groups.setdefault(fence.chapter, set()).add(i)
+        return {name: np.array(sorted(rows), dtype=np.int64) for name, rows in groups.items()}
+
+    from fips_index import REGIONS, STATE_FIPS, assign_fips, fips_codes, state_fips
+
+    if 'state_fips' not in df.columns:
+        df = assign_fips(df)
+    codes = fips_codes(df['state_fips'])
+    if by == 'state':
+        return {STATE_FIPS.get(code, code): np.flatnonzero(codes == code)
+                for code in sorted(set(codes)) if code in STATE_FIPS}
+    if by == 'region':
+        return {name: np.flatnonzero(np.isin(codes, [state_fips(s) for s in states]))
+                for name, states in REGIONS.items()}
+    raise ValueError(f"Unknown partition: {by}")
+
+
+def _slug(name):
+    return ''.join(ch if ch.isalnum() else '_' for ch in str(name).lower()).strip('_') or 'region'
+
+
+def render_region(snapshot_path, name, rows, out_dir):
+    """
+    Worker: map + deployment report for one region, read from the shared
+    memory-mapped snapshot (only this region's rows are copied out).
+    """
+    start = time.perf_counter()
+    records = np.load(snapshot_path, mmap_mode='r')
+    df = records_to_frame(records[np.asarray(rows, dtype=np.int64)])
+
+    from clean_map import make_clean_map
+    from red_cross_tool import RedCrossDisasterTool
+
+    region_dir = os.path.join(out_dir, _slug(name))
+    os.makedirs(region_dir, exist_ok=True)
+    make_clean_map(output_file=os.path.join(region_dir, 'map.html'), df=df, fit_bounds=True)
+
+    tool = RedCrossDisasterTool(subscriptions=None)
+    events = tool.shelter_events(tool.events_from_snapshot(df))
+    pd.DataFrame(events).to_csv(os.path.join(region_dir, 'deployments.csv'), index=False)
+    if events:
+        tool.create_deployment_map(events, output_file=os.path.join(region_dir, 'deployment_map.html'),
+                                   fit_bounds=True)
+    return {'region': name, 'events': len(df), 'shelter_events': len(events),
+            'seconds': round(time.perf_counter() - start, 3)}
+
+
+class RegionalRenderer:
+    """
+    Renders one map and deployment report per state / region / chapter in a
+    process pool.
+
+    The enriched snapshot is loaded once (via RenderPipeline) and saved as a
+    structured .npy; each task carries only its row positions and the worker
+    memory-maps the file. A region whose rows are byte-identical to the last
+    run (ignoring VOLATILE_COLUMNS) is skipped.
+    """
+
+    def __init__(self, csv_file='combined_disaster_feed.csv', out_dir=DEFAULT_OUTPUT_DIR, by='state',
+                 workers=None, subscriptions=None):
+        self.csv_file = csv_file
+        self.out_dir = out_dir
+        self.by = by
+        self.workers = workers or os.cpu_count()
+        self.subscriptions = subscriptions
+        self.snapshot_path = os.path.join(out_dir, SNAPSHOT_FILE)
+        self.manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+
+    def _manifest(self):
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {'regions': {}}
+
+    def run(self, force=False):
+        """Render every changed region; returns the manifest"""
+        start = time.perf_counter()
+        os.makedirs(self.out_dir, exist_ok=True)
+        df = RenderPipeline(self.csv_file).load().df
+        write_snapshot(df, self.snapshot_path)
+        groups = partition(df, self.by, self.subscriptions)
+
+        stable = frame_to_records(df.drop(columns=list(VOLATILE_COLUMNS), errors='ignore'))
+        previous = self._manifest()['regions']
+        manifest = {'by': self.by, 'generated': pd.Timestamp.now().isoformat(), 'regions': {}}
+        tasks = {}
+        for name, rows in groups.items():
+            if not len(rows):
+                continue
+            digest = hashlib.sha1(stable[rows].tobytes()).hexdigest()
+            entry = {'dir': _slug(name), 'events': int(len(rows)), 'hash': digest}
+            if not force and previous.get(name, {}).get('hash') == digest:
+                entry.update(skipped=True)
+                manifest['regions'][name] = dict(previous[name], **entry)
+            else:
+                tasks[name] = rows
+                manifest['regions'][name] = entry
+
+        print(f"🗺️ {len(tasks)} of {len(manifest['regions'])} {self.by} regions changed; "
+              f"rendering with {self.workers} workers")
+        if tasks:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks))) as pool:
+                futures = {pool.submit(render_region, self.snapshot_path, name, rows, self.out_dir): name
+                           for name, rows in tasks.items()}
+                for future in as_completed(futures):
+                    name = futures[future]
+                    try:
+                        manifest['regions'][name].update(future.result())
+                    except Exception as e:
+                        print(f"⚠️ {name}: {e}")
+                        manifest['regions'][name]['error'] = str(e)
+                        manifest['regions'][name].pop('hash', None)    # retry next run
+
+        manifest['seconds'] = round(time.perf_counter() - start, 2)
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1)
+        print(f"✅ Regional products in {self.out_dir}/ ({manifest['seconds']}s)")
+        return manifest
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render per-region maps and deployment reports in parallel")
+    parser.add_argument("csv_file", nargs="?", default="combined_disaster_feed.csv")
+    parser.add_argument("--by", choices=["state", "region", "chapter"], default="state")
+    parser.add_argument("--out-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--force", action="store_true", help="re-render unchanged regions too")
+    args = parser.parse_args()
+
+    RegionalRenderer(args.csv_file, args.out_dir, args.by, args.workers).run(force=args.force)
@@ -0,0 +1,170 @@
+import sys
+import zlib
+
+import numpy as np
+
+from event_index import tokenize
+
+DEFAULT_WEIGHTS_FILE = "relevance_weights.npz"
+
+
+def item_text(item):
+    """Text used for relevance scoring of a news item"""
+    return f"{item.get('title', '') or ''} {item.get('summary', '') or ''}"
+
+
+class HashedNgramFeaturizer:
+    """Word n-grams hashed into a fixed-size sparse feature space (CSR arrays)"""
+
+    def __init__(self, n_features=2 ** 18, ngram_max=2):
+        self.n_features = n_features
+        self.ngram_max = ngram_max
+        self._cache = {}
+
+    def _hash(self, gram):
+        h = self._cache.get(gram)
+        if h is None:
+            h = zlib.crc32(gram.encode('utf-8')) % self.n_features
+            if len(self._cache) < 500000:
+                self._cache[gram] = h
+        return h
+
+    def _row(self, text):
+        toks = tokenize(text)
+        feats = [self._hash(t) for t in toks]
+        for n in range(2, self.ngram_max + 1):
+            feats += [self._hash(" ".join(toks[i:i + n])) for i in range(len(toks) - n + 1)]
+        return feats
+
+    def transform(self, texts):
+        """
+        Featurize a batch of texts.
+        Returns (row_ids, indices, data) with one entry per distinct
+        feature per row, L2-normalized per row.
+        """
+        rows, cols = [], []
+        for i, text in enumerate(texts):
+            feats = self._row(text)
+            rows.extend([i] * len(feats))
+            cols.extend(feats)
+
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        if rows.size == 0:
+            return rows, cols, np.zeros(0, dtype=np.float32)
+
+        # Collapse duplicate (row, feature) pairs into counts
+        keys, counts = np.unique(rows * self.n_features + cols, return_counts=True)
+        rows, cols = keys // self.n_features, keys % self.n_features
+        data = counts.astype(np.float32)
+
+        norms = np.sqrt(np.bincount(rows, weights=data * data, minlength=len(texts)))
+        data /= norms[rows].astype(np.float32)
+        return rows, cols, data
+
+
+class RelevanceModel:
+    """Linear (logistic) relevance scorer over hashed n-gram features"""
+
+    def __init__(self, n_features=2 ** 18, ngram_max=2, weights=None, bias=0.0):
+        self.featurizer = HashedNgramFeaturizer(n_features, ngram_max)
+        self.weights = (np.zeros(n_features, dtype=np.float32)
+                        if weights is None else weights.astype(np.float32))
+        self.bias = float(bias)
+
+    def decision_function(self, texts):
+        rows, cols, data = self.featurizer.transform(texts)
+        margins = np.bincount(rows, weights=self.weights[cols] * data, minlength=len(texts))
+        return margins + self.bias
+
+    def score_batch(self, texts):
+        """Probability that each text is disaster-relevant"""
+        return 1.0 / (1.0 + np.exp(-self.decision_function(texts)))
+
+    def fit(self, texts, labels, epochs=10, learning_rate=0.5, l2=1e-6, batch_size=256, seed=0):
+        """Mini-batch SGD on logistic loss, all gradient steps as sparse vector ops"""
+        labels = np.asarray(labels, dtype=np.float64)
+        rows, cols, data = self.featurizer.transform(texts)
+        order = np.argsort(rows, kind='stable')
+        rows, cols, data = rows[order], cols[order], data[order]
+        starts = np.searchsorted(rows, np.arange(len(texts) + 1))
+
+        rng = np.random.default_rng(seed)
+        n = len(texts)
+        for _ in range(epochs):
+            for batch in np.array_split(rng.permutation(n), max(1, n // batch_size)):
+                # Gather the nonzeros of the batch rows
+                spans = [np.arange(starts[i], starts[i + 1]) for i in batch]
+                nz = np.concatenate(spans) if spans else np.zeros(0, dtype=np.int64)
+                local = np.repeat(np.arange(len(batch)), [len(s) for s in spans])
+
+                margin = np.bincount(local, weights=self.weights[cols[nz]] * data[nz],
+                                     minlength=len(batch)) + self.bias
+                err = 1.0 / (1.0 + np.exp(-margin)) - labels[batch]
+
+                grad = np.bincount(cols[nz], weights=err[local] * data[nz],
+                                   minlength=len(self.weights)) / len(batch)
+                self.weights -= (learning_rate * (grad + l2 * self.weights)).astype(np.float32)
+                self.bias -= learning_rate * err.mean()
+        return self
+
+    def save(self, path=DEFAULT_WEIGHTS_FILE):
+        """Store only the nonzero weights (keeps the shipped file small)"""
+        nz = np.flatnonzero(self.weights)
+        np.savez_compressed(path, indices=nz.astype(np.int32), values=self.weights[nz],
+                            bias=self.bias, n_features=len(self.weights),
+                            ngram_max=self.featurizer.ngram_max)
+
+    @classmethod
+    def load(cls, path=DEFAULT_WEIGHTS_FILE):
+        f = np.load(path)
+        weights = np.zeros(int(f['n_features']), dtype=np.float32)
+        weights[f['indices']] = f['values']
+        return cls(int(f['n_features']), int(f['ngram_max']), weights, float(f['bias']))
+
+    def filter_items(self, items, threshold=0.5):
+        """Keep news items scoring >= threshold; adds a 'relevance' field"""
+        if not items:
+            return []
+        scores = self.score_batch([item_text(item) for item in items])
+        kept = []
+        for item, score in zip(items, scores):
+            if score >= threshold:
+                kept.append(dict(item, relevance=round(float(score), 4)))
+        return kept
+
+
+def train_from_csv(labeled_csv, output_file=DEFAULT_WEIGHTS_FILE):
+    """
+    Train from a labeled CSV with a 0/1 `label` column and either a `text`
+    column or `title`/`summary` columns.
+    """
+    import pandas as pd
+
+    df = pd.read_csv(labeled_csv).fillna('')
+    if 'text' in df.columns:
+        texts = df['text'].astype(str).tolist()
+    else:
+        texts = [item_text(r) for r in df.to_dict('records')]
+
+    model = RelevanceModel().fit(texts, df['label'].astype(int).values)
+    preds = model.score_batch(texts) >= 0.5
+    accuracy = (preds == df['label'].astype(bool).values).mean()
+    model.save(output_file)
+    print(f"✅ Trained on {len(df)} items (train accuracy {accuracy:.1%}), weights saved to {output_file}")
+    return model
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "train":
+        train_from_csv(sys.argv[2], *sys.argv[3:4])
+    elif len(sys.argv) >= 3 and sys.argv[1] == "score":
+        import pandas as pd
+
+        model = RelevanceModel.load(*sys.argv[3:4])
+        news = pd.read_csv(sys.argv[2]).fillna('')
+        news['relevance'] = model.score_batch([item_text(r) for r in news.to_dict('records')])
+        print(news.sort_values('relevance', ascending=False)[['relevance', 'title']].to_string(index=False))
+    else:
+        print("Usage: python relevance_model.py train labeled.csv [weights.npz]")
+        print("       python relevance_model.py score news.csv [weights.npz]")
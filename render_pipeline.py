@@ -0,0 +1,148 @@
+import hashlib
+import os
+import sys
+import time
+
+import pandas as pd
+
+from aggregate_cube import AggregateCube
+from event_index import ensure_event_ids
+from geojson_layers import LayerCache, PopupShards
+from incidents import incident_zones
+from instrumentation import stage
+from risk_engine import DisasterRiskEngine
+
+# Every property a map variant styles by; fixing the field set lets variants
+# share one serialized FeatureCollection per layer. Popup fields go to the
+# shared popup shards instead of the pages.
+SHARED_LAYER_FIELDS = ['event_id', 'source', 'risk_level', 'threat_score', 'impact_radius_km']
+POPUP_SHARD_DIR = 'popups'
+
+
+class RenderPipeline:
+    """
+    Load and enrich the disaster snapshot once, then render every map/report
+    variant from it. Variants that used to be written as separate copies
+    (map.html, pro.html, intel.html) are rendered once and published under
+    each alias; files whose bytes didn't change are left untouched.
+    """
+
+    # variant -> (primary output, aliases)
+    OUTPUTS = {
+        'disaster_map': ('disaster_map.html', ['map.html']),
+        'clean_map': ('clean_map.html', []),
+        'professional_map': ('professional_map.html', ['pro.html']),
+        'intelligence_dashboard': ('intelligence_dashboard.html', ['intel.html']),
+        'summary': ('summary.html', []),
+        'deployment_map': ('red_cross_deployment_map.html', []),
+    }
+
+    def __init__(self, csv_file='combined_disaster_feed.csv', output_dir='.'):
+        self.csv_file = csv_file
+        self.output_dir = output_dir
+        self.df = None
+        self.news = None
+        self.correlations = None
+        self.incidents = None
+        self.cube = AggregateCube()
+        self.layer_cache = LayerCache(SHARED_LAYER_FIELDS)
+        self.popup_shards = PopupShards(os.path.join(output_dir, POPUP_SHARD_DIR), url=POPUP_SHARD_DIR)
+        self.timings = {}
+
+    def load(self):
+        """Single data pass: read, enrich, assign IDs"""
+        start = time.perf_counter()
+        with stage('parse', 'snapshot') as span:
+            df = pd.read_csv(self.csv_file)
+            span.bytes_in, span.rows_out = os.path.getsize(self.csv_file), len(df)
+        with stage('enrich', 'risk') as span:
+            df = DisasterRiskEngine.enrich_disaster_data(df)
+            self.df = ensure_event_ids(df.dropna(subset=['lat', 'lon']).reset_index(drop=True))
+            span.rows_in, span.rows_out = len(df), len(self.df)
+        # Overlapping footprints grouped once for every incident-level view
+        with stage('correlate', 'incidents') as span:
+            self.df, self.incidents = incident_zones(self.df)
+            span.rows_in, span.rows_out = len(self.df), len(self.incidents)
+        # Counters for every header/chart; only changed events touch the cube
+        self.cube.sync(self.df)
+
+        try:
+            self.news = pd.read_csv('disaster_news_feed.csv')
+            self.correlations = pd.read_csv('news_disaster_correlations.csv')
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            self.news, self.correlations = pd.DataFrame(), pd.DataFrame()
+        self.timings['load'] = time.perf_counter() - start
+        return self
+
+    def _path(self, name):
+        return os.path.join(self.output_dir, name)
+
+    def _render_variant(self, variant, path):
+        if variant == 'disaster_map':
+            from make_map import make_map
+            make_map(output_file=path, df=self.df, layer_cache=self.layer_cache,
+                     popup_shards=self.popup_shards)
+        elif variant == 'clean_map':
+            from clean_map import make_clean_map
+            make_clean_map(output_file=path, df=self.df, layer_cache=self.layer_cache,
+                           popup_shards=self.popup_shards, cube=self.cube)
+        elif variant == 'professional_map':
+            from advanced_map import create_professional_map
+            create_professional_map(output_file=path, df=self.df, layer_cache=self.layer_cache,
+                                    popup_shards=self.popup_shards, cube=self.cube, incidents=self.incidents)
+        elif variant == 'intelligence_dashboard':
+            from intelligence_dashboard import create_intelligence_dashboard
+            create_intelligence_dashboard(output_file=path, disasters=self.df,
+                                          news_data=self.news, correlations=self.correlations,
+                                          popup_shards=self.popup_shards, cube=self.cube)
+        elif variant == 'summary':
+            from summary_plot import make_summary
+            make_summary(output_file=path, df=self.df, cube=self.cube)
+        elif variant == 'deployment_map':
+            from red_cross_tool import RedCrossDisasterTool
+            tool = RedCrossDisasterTool()
+            events = tool.shelter_events(tool.events_from_snapshot(self.df))
+            tool.create_deployment_map(events, output_file=path)
+        else:
+            raise ValueError(f"Unknown output variant: {variant}")
+
+    @staticmethod
+    def _publish_alias(source, alias):
+        """Copy bytes to an alias path unless it already holds the same content"""
+        with open(source, 'rb') as f:
+            data = f.read()
+        if os.path.exists(alias):
+            with open(alias, 'rb') as f:
+                if hashlib.sha1(f.read()).digest() == hashlib.sha1(data).digest():
+                    return False
+        with open(alias, 'wb') as f:
+            f.write(data)
+        return True
+
+    def render(self, variants=None):
+        """Render the requested variants (all by default); returns {variant: seconds}"""
+        if self.df is None:
+            self.load()
+        for variant in variants or list(self.OUTPUTS):
+            primary, aliases = self.OUTPUTS[variant]
+            start = time.perf_counter()
+            with stage('render', variant) as span:
+                span.rows_in = len(self.df)
+                self._render_variant(variant, self._path(primary))
+                if os.path.exists(self._path(primary)):
+                    span.bytes_out = os.path.getsize(self._path(primary))
+                    for alias in aliases:
+                        self._publish_alias(self._path(primary), self._path(alias))
+            self.timings[variant] = time.perf_counter() - start
+        if self.popup_shards.records:
+            # Merge: rendering one variant must not drop the popup fields of the others
+            self.popup_shards.write(merge=True, active_ids=self.df['event_id'])
+        return self.timings
+
+
+if __name__ == "__main__":
+    pipeline = RenderPipeline()
+    timings = pipeline.render(sys.argv[1:] or None)
+    print("\n⏱️ Render timings:")
+    for variant, seconds in timings.items():
+        print(f"   {variant}: {seconds:.2f}s")
@@ -0,0 +1,90 @@
+import gzip
+import json
+import os
+from datetime import datetime
+
+DEFAULT_REPORT_FILE = "disaster_intelligence_report.ndjson"
+DEFAULT_SUMMARY_FILE = "disaster_intelligence_summary.json"
+
+
+def _open_text(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8", buffering=1 if "w" in mode or "a" in mode else -1)
+
+
+class StreamingReportWriter:
+    """
+    Writes the intelligence report as NDJSON while it is being produced.
+
+    Each line is one compact record: {"kind": "news" | "correlation" |
+    "retraction", ...}. A retraction carries only the news_id / event_id of a
+    correlation written earlier that no longer holds; the summary counts
+    correlations net of retractions.
+    Lines are flushed as they are written so consumers can `tail -f` the file
+    (use a `.gz` path for a gzip stream instead). A small summary header with
+    the counts is written to a separate JSON file on close().
+    """
+
+    def __init__(self, report_file=DEFAULT_REPORT_FILE, summary_file=DEFAULT_SUMMARY_FILE):
+        self.report_file = report_file
+        self.summary_file = summary_file
+        self.started_at = datetime.now().isoformat()
+        self.counts = {}
+        self._fh = _open_text(report_file, "w")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write(self, kind, record):
+        self._fh.write(json.dumps(dict(record, kind=kind), separators=(",", ":"), default=str) + "\n")
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def write_news(self, items, feed_type=None):
+        """Append a batch of news items; feed_type tallies per-feed counts"""
+        for item in items:
+            self._write("news", item)
+        if feed_type:
+            key = f"{feed_type}_items"
+            self.counts[key] = self.counts.get(key, 0) + len(items)
+        self._fh.flush()
+
+    def write_correlation(self, correlation):
+        self._write("correlation", correlation)
+        self._fh.flush()
+
+    def write_retraction(self, correlation):
+        self._write("retraction", {"news_id": correlation.get("news_id"),
+                                   "event_id": correlation.get("event_id")})
+        self._fh.flush()
+
+    def summary(self):
+        return {
+            "generated_at": self.started_at,
+            "completed_at": datetime.now().isoformat(),
+            "report_file": os.path.basename(self.report_file),
+            "total_news_items": self.counts.get("news", 0),
+            "correlations_found": self.counts.get("correlation", 0) - self.counts.get("retraction", 0),
+            **{k: v for k, v in self.counts.items() if k.endswith("_items")},
+        }
+
+    def close(self):
+        if self._fh.closed:
+            return
+        self._fh.close()
+        with open(self.summary_file, "w") as f:
+            json.dump(self.summary(), f, separators=(",", ":"))
+
+
+def read_report(report_file=DEFAULT_REPORT_FILE, kind=None):
+    """Iterate records from an NDJSON report, optionally only one kind"""
+    with _open_text(report_file, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if kind is None or record.get("kind") == kind:
+                yield record
@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+from instrumentation import stage
+
 class DisasterRiskEngine:
     """Advanced risk assessment and scoring for disaster events"""
     
@@ -129,7 +131,9 @@ class DisasterRiskEngine:
 if __name__ == "__main__":
     # Test the risk engine
     df = pd.read_csv("combined_disaster_feed.csv")
-    enriched = DisasterRiskEngine.enrich_disaster_data(df)
+    with stage("enrich", "risk") as span:
+        enriched = DisasterRiskEngine.enrich_disaster_data(df)
+        span.rows_in, span.rows_out = len(df), len(enriched)
     
     print("🎯 Risk Assessment Summary:")
     print(enriched['risk_level'].value_counts())
@@ -0,0 +1,126 @@
+import heapq
+
+import numpy as np
+
+
+class KDTree:
+    """
+    Static k-d tree over an (n, k) array of points (KDBush-style: the points
+    are reordered in place into a flat array, so there are no node objects).
+    Supports box queries, radius queries and k-nearest-neighbor search.
+    """
+
+    def __init__(self, points, leaf_size=32):
+        points = np.asarray(points, dtype=np.float64)
+        if points.ndim == 1:
+            points = points.reshape(-1, 1)
+        self.leaf_size = leaf_size
+        self.ids = np.arange(len(points))
+        self.coords = points.copy()
+        self.dims = points.shape[1] if len(points) else 2
+        if len(points):
+            self._sort(0, len(points) - 1, 0)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _sort(self, left, right, depth):
+        stack = [(left, right, depth)]
+        while stack:
+            left, right, depth = stack.pop()
+            if right - left <= self.leaf_size:
+                continue
+            axis = depth % self.dims
+            mid = (left + right) // 2
+            # Partition the node's slice around its median on this axis
+            order = np.argpartition(self.coords[left:right + 1, axis], mid - left)
+            self.coords[left:right + 1] = self.coords[left:right + 1][order]
+            self.ids[left:right + 1] = self.ids[left:right + 1][order]
+            stack.append((left, mid - 1, depth + 1))
+            stack.append((mid + 1, right, depth + 1))
+
+    def range(self, mins, maxs):
+        """Indices of points inside the axis-aligned box [mins, maxs]"""
+        mins, maxs = np.asarray(mins, dtype=np.float64), np.asarray(maxs, dtype=np.float64)
+        found = []
+        stack = [(0, len(self.ids) - 1, 0)]
+        while stack:
+            left, right, depth = stack.pop()
+            if right < left:
+                continue
+            if right - left <= self.leaf_size:
+                block = self.coords[left:right + 1]
+                inside = np.all((block >= mins) & (block <= maxs), axis=1)
+                found.append(self.ids[left:right + 1][inside])
+                continue
+            mid = (left + right) // 2
+            axis = depth % self.dims
+            p = self.coords[mid]
+            if np.all((p >= mins) & (p <= maxs)):
+                found.append(self.ids[mid:mid + 1])
+            if mins[axis] <= p[axis]:
+                stack.append((left, mid - 1, depth + 1))
+            if maxs[axis] >= p[axis]:
+                stack.append((mid + 1, right, depth + 1))
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    def within(self, center, radius):
+        """Indices of points within Euclidean `radius` of `center`"""
+        center = np.asarray(center, dtype=np.float64)
+        found = []
+        r2 = radius * radius
+        stack = [(0, len(self.ids) - 1, 0)]
+        while stack:
+            left, right, depth = stack.pop()
+            if right < left:
+                continue
+            if right - left <= self.leaf_size:
+                block = self.coords[left:right + 1]
+                close = ((block - center) ** 2).sum(axis=1) <= r2
+                found.append(self.ids[left:right + 1][close])
+                continue
+            mid = (left + right) // 2
+            axis = depth % self.dims
+            p = self.coords[mid]
+            if ((p - center) ** 2).sum() <= r2:
+                found.append(self.ids[mid:mid + 1])
+            if center[axis] - radius <= p[axis]:
+                stack.append((left, mid - 1, depth + 1))
+            if center[axis] + radius >= p[axis]:
+                stack.append((mid + 1, right, depth + 1))
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    def knn(self, point, k):
+        """(indices, distances) of the k nearest points, nearest first"""
+        point = np.asarray(point, dtype=np.float64)
+        best = []  # max-heap of (-dist2, id)
+        stack = [(0, len(self.ids) - 1, 0, 0.0)]
+        while stack:
+            left, right, depth, bound = stack.pop()
+            if right < left or (len(best) == k and bound > -best[0][0]):
+                continue
+            if right - left <= self.leaf_size:
+                d2 = ((self.coords[left:right + 1] - point) ** 2).sum(axis=1)
+                for d, i in zip(d2.tolist(), self.ids[left:right + 1].tolist()):
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, i))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, i))
+                continue
+            mid = (left + right) // 2
+            axis = depth % self.dims
+            p = self.coords[mid]
+            d = float(((p - point) ** 2).sum())
+            if len(best) < k:
+                heapq.heappush(best, (-d, int(self.ids[mid])))
+            elif d < -best[0][0]:
+                heapq.heapreplace(best, (-d, int(self.ids[mid])))
+            diff = point[axis] - p[axis]
+            near, far = ((left, mid - 1), (mid + 1, right)) if diff <= 0 else ((mid + 1, right), (left, mid - 1))
+            # Visit the near side first (pushed last)
+            stack.append((far[0], far[1], depth + 1, diff * diff))
+            stack.append((near[0], near[1], depth + 1, 0.0))
+        best.sort(key=lambda item: -item[0])
+        ids = np.array([i for _, i in best], dtype=np.int64)
+        dists = np.sqrt(np.array([-d for d, _ in best]))
+        return ids, dists
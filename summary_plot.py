@@ -1,19 +1,33 @@
 # summary_plot.py
+import os
+
 import pandas as pd
 import plotly.express as px
 
-def make_summary(csv_file="combined_disaster_feed.csv"):
-    df = pd.read_csv(csv_file)
-    df["source"] = df["source"].fillna("Unknown")
-    count = df["source"].value_counts().reset_index()
-    count.columns = ["source", "count"]
+from instrumentation import stage
+
+def make_summary(csv_file="combined_disaster_feed.csv", output_file="summary.html", df=None, cube=None):
+    # RenderPipeline passes its shared cube; a standalone run just counts the column
+    if cube is not None:
+        total = len(cube)
+        count = pd.DataFrame(
+            [(source if source is not None else "Unknown", n) for source, n in cube.counts_by("source").items()],
+            columns=["source", "count"],
+        ).groupby("source", as_index=False)["count"].sum().sort_values("count", ascending=False)
+    else:
+        if df is None:
+            df = pd.read_csv(csv_file)
+        total = len(df)
+        count = df["source"].fillna("Unknown").value_counts().reset_index()
 
     fig = px.bar(count, x="source", y="count", color="source",
                  title="Active Disaster Events by Source",
                  text="count")
     fig.update_traces(textposition='outside')
-    fig.write_html("summary.html")
-    print("✅ Summary saved to summary.html")
+    with stage("render", "save", map="summary") as span:
+        fig.write_html(output_file)
+        span.rows_in, span.bytes_out = total, os.path.getsize(output_file)
+    print(f"✅ Summary saved to {output_file}")
 
 if __name__ == "__main__":
     make_summary()
\ No newline at end of file
@@ -0,0 +1,12 @@
+import os
+import subprocess
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_check_passes():
+    """Import-time budget, no heavy imports at startup, every subcommand parses"""
+    result = subprocess.run([sys.executable, 'disaster_tracker.py', 'check'], cwd=REPO,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+import facilities
+from facilities import FacilityIndex, chord_matrix, chord_to_km, to_xyz
+
+
+def make_facilities(n, rng, capacity=(50, 400)):
+    return pd.DataFrame({
+        'facility_id': [f'F{i}' for i in range(n)],
+        'name': [f'Shelter {i}' for i in range(n)],
+        'type': 'shelter',
+        'lat': rng.uniform(30, 40, n),
+        'lon': rng.uniform(-100, -85, n),
+        'capacity': rng.integers(*capacity, n).astype(float),
+    })
+
+
+def make_events(n, rng):
+    return [{'event_id': f'E{i}', 'lat': float(rng.uniform(30, 40)), 'lon': float(rng.uniform(-100, -85)),
+             'demand': float(rng.integers(20, 600))} for i in range(n)]
+
+
+def brute_nearest(fac, lat, lon, k):
+    km = chord_to_km(chord_matrix(to_xyz(lat, lon), to_xyz(fac['lat'], fac['lon'])))
+    order = np.argsort(km, axis=1, kind='stable')[:, :k]
+    return order, np.take_along_axis(km, order, axis=1)
+
+
+def brute_greedy(fac, events):
+    """Capacity-constrained greedy over every (event, facility) pair, shortest first"""
+    lat = [e['lat'] for e in events]
+    lon = [e['lon'] for e in events]
+    km = chord_to_km(chord_matrix(to_xyz(lat, lon), to_xyz(fac['lat'], fac['lon'])))
+    need = np.array([e['demand'] for e in events])
+    remaining = fac['capacity'].to_numpy(dtype=float).copy()
+    allocations = {}
+    for flat in np.argsort(km.ravel(), kind='stable'):
+        i, f = divmod(int(flat), km.shape[1])
+        amount = min(need[i], remaining[f])
+        if amount > 0:
+            need[i] -= amount
+            remaining[f] -= amount
+            allocations[(events[i]['event_id'], fac['facility_id'][f])] = amount
+    return allocations, {events[i]['event_id']: need[i] for i in range(len(events)) if need[i] > 0}
+
+
+def test_nearest_many_matches_brute_force(monkeypatch):
+    rng = np.random.default_rng(11)
+    fac = make_facilities(300, rng)
+    index = FacilityIndex(fac)
+    lat, lon = rng.uniform(29, 41, 150), rng.uniform(-101, -84, 150)
+    want_pos, want_km = brute_nearest(fac, lat, lon, 6)
+
+    for brute_force_max in (facilities.BRUTE_FORCE_MAX, 0):    # distance-matrix path, then tree path
+        monkeypatch.setattr(facilities, 'BRUTE_FORCE_MAX', brute_force_max)
+        positions, km = index.nearest_many(lat, lon, k=6)
+        np.testing.assert_allclose(km, want_km, rtol=1e-9)
+        np.testing.assert_array_equal(positions, want_pos)
+
+
+def test_assign_with_every_facility_matches_global_greedy():
+    rng = np.random.default_rng(5)
+    fac = make_facilities(40, rng)
+    events = make_events(60, rng)              # oversubscribed: some demand goes unmet
+    assignments, unmet = FacilityIndex(fac).assign(events, k=len(fac))
+
+    got = {(r.event_id, r.facility_id): r.allocated for r in assignments.itertuples()}
+    want, want_unmet = brute_greedy(fac, events)
+    assert got.keys() == want.keys()
+    assert all(np.isclose(got[key], want[key]) for key in want)
+    assert unmet.keys() == want_unmet.keys()
+    assert all(np.isclose(unmet[key], want_unmet[key]) for key in want_unmet)
+
+
+def test_assign_respects_capacity_and_demand():
+    rng = np.random.default_rng(9)
+    fac = make_facilities(500, rng, capacity=(20, 120))
+    events = make_events(200, rng)
+    assignments, unmet = FacilityIndex(fac).assign(events, k=4)
+
+    used = assignments.groupby('facility_id')['allocated'].sum()
+    capacity = fac.set_index('facility_id')['capacity']
+    assert (used <= capacity[used.index] + 1e-9).all()
+
+    allocated = assignments.groupby('event_id')['allocated'].sum()
+    for event in events:
+        total = allocated.get(event['event_id'], 0.0) + unmet.get(event['event_id'], 0.0)
+        assert np.isclose(total, event['demand'])
+    # Only short when every facility is full
+    if unmet:
+        assert np.isclose(used.sum(), capacity.sum())
+
+
+def test_assign_meets_all_demand_when_capacity_is_ample():
+    rng = np.random.default_rng(2)
+    fac = make_facilities(200, rng, capacity=(500, 1000))
+    assignments, unmet = FacilityIndex(fac).assign(make_events(50, rng), k=2)
+    assert not unmet
+    assert len(assignments)
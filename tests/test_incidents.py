@@ -0,0 +1,40 @@
+import numpy as np
+
+from facilities import chord_to_km, to_xyz
+from incidents import overlap_pairs
+
+
+def brute_pairs(lat, lon, radius_km):
+    xyz = to_xyz(lat, lon)
+    km = chord_to_km(np.sqrt(((xyz[:, None, :] - xyz[None, :, :]) ** 2).sum(axis=2)))
+    i, j = np.nonzero(np.triu(km <= radius_km[:, None] + radius_km[None, :], k=1))
+    return set(zip(i.tolist(), j.tolist()))
+
+
+def as_set(i, j):
+    return {(min(a, b), max(a, b)) for a, b in zip(i.tolist(), j.tolist())}
+
+
+def test_overlap_pairs_matches_brute_force():
+    rng = np.random.default_rng(3)
+    n = 1500
+    lat = rng.uniform(25, 49, n)
+    lon = rng.uniform(-124, -67, n)
+    # FIRMS pixels through large earthquakes, so every radius class is exercised
+    radius = rng.choice([0.5, 2.0, 10.0, 50.0, 200.0, 600.0], n, p=[0.5, 0.2, 0.1, 0.1, 0.07, 0.03])
+    # Exact duplicates and a dense cluster
+    lat[:20], lon[:20] = lat[20], lon[20]
+    lat[40:140] = 34.0 + rng.normal(0, 0.01, 100)
+    lon[40:140] = -118.0 + rng.normal(0, 0.01, 100)
+
+    i, j = overlap_pairs(lat, lon, radius)
+    pairs = as_set(i, j)
+    assert len(pairs) == len(i)             # each pair reported once
+    assert pairs == brute_pairs(lat, lon, radius)
+
+
+def test_overlap_pairs_near_antimeridian_and_pole():
+    lat = np.array([10.0, 10.0, 89.9, 89.9, -30.0])
+    lon = np.array([179.9, -179.9, 0.0, 180.0, 20.0])
+    radius = np.array([15.0, 15.0, 20.0, 20.0, 5.0])
+    assert as_set(*overlap_pairs(lat, lon, radius)) == brute_pairs(lat, lon, radius) == {(0, 1), (2, 3)}
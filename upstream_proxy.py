@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import requests
+
+from http_encoding import brotli, choose_encoding, compress
+
+DEFAULT_PORT = 8767
+PROXY_ENV = 'DISASTER_PROXY_URL'
+
+# route -> (upstream URL, TTL seconds)
+UPSTREAMS = {
+    'noaa/alerts': ("https://api.weather.gov/alerts/active", 60),
+    'usgs/significant_day': ("https://earthquake.usgs.gov/earthquakes/feed/v1.0/summary/significant_day.geojson", 60),
+    'usgs/significant_week': ("https://earthquake.usgs.gov/earthquakes/feed/v1.0/summary/significant_week.geojson", 300),
+    'usgs/2.5_week': ("https://earthquake.usgs.gov/earthquakes/feed/v1.0/summary/2.5_week.geojson", 300),
+    'firms/usa_24h': ("https://firms.modaps.eosdis.nasa.gov/data/active_fire/modis-c6.1/csv/"
+                      "MODIS_C6_1_USA_contiguous_and_Hawaii_24h.csv", 600),
+}
+
+
+class CachedResponse:
+    """One upstream body with its pre-compressed variants"""
+
+    def __init__(self, body, content_type, upstream_etag=None, last_modified=None):
+        self.body = body
+        self.content_type = content_type
+        self.upstream_etag = upstream_etag
+        self.last_modified = last_modified
+        self.fetched_at = time.time()
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        self.encoded = {'identity': body, 'gzip': compress(body, 'gzip')}
+        if brotli is not None:
+            self.encoded['br'] = compress(body, 'br')
+
+
+class UpstreamCache:
+    """
+    TTL cache in front of the NOAA / USGS / FIRMS feeds.
+
+    Each route is fetched at most once per TTL no matter how many clients
+    ask: concurrent misses for the same route wait on a per-route lock
+    while the first one fetches (single-flight), then all get the same
+    entry. Expired entries are revalidated with If-None-Match /
+    If-Modified-Since, and served stale if the upstream is down.
+    """
+
+    def __init__(self, upstreams=None, timeout=30, user_agent="disaster-signal-tracker proxy"):
+        self.upstreams = dict(upstreams or UPSTREAMS)
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = user_agent
+        self.entries = {}
+        self.stats = {'hits': 0, 'fetches': 0, 'revalidated': 0, 'stale': 0}
+        self._locks = {route: threading.Lock() for route in self.upstreams}
+
+    def _fresh(self, route):
+        entry = self.entries.get(route)
+        return entry is not None and time.time() - entry.fetched_at < self.upstreams[route][1]
+
+    def get(self, route):
+        """Cached response for a route; (entry, was_stale). Raises KeyError for unknown routes."""
+        if route not in self.upstreams:
+            raise KeyError(route)
+        if self._fresh(route):
+            self.stats['hits'] += 1
+            return self.entries[route], False
+
+        with self._locks[route]:
+            # Another thread may have refreshed it while we waited
+            if self._fresh(route):
+                self.stats['hits'] += 1
+                return self.entries[route], False
+            old = self.entries.get(route)
+            try:
+                entry = self._fetch(route, old)
+            except requests.RequestException as e:
+                if old is None:
+                    raise
+                print(f"⚠️ {route}: upstream failed ({e}); serving stale copy")
+                self.stats['stale'] += 1
+                return old, True
+            self.entries[route] = entry
+            return entry, False
+
+    def _fetch(self, route, old):
+        url = self.upstreams[route][0]
+        headers = {}
+        if old is not None:
+            if old.upstream_etag:
+                headers['If-None-Match'] = old.upstream_etag
+            if old.last_modified:
+                headers['If-Modified-Since'] = old.last_modified
+        r = self.session.get(url, headers=headers, timeout=self.timeout)
+        if r.status_code == 304 and old is not None:
+            old.fetched_at = time.time()
+            self.stats['revalidated'] += 1
+            return old
+        r.raise_for_status()
+        self.stats['fetches'] += 1
+        return CachedResponse(r.content, r.headers.get('Content-Type', 'application/octet-stream'),
+                              r.headers.get('ETag'), r.headers.get('Last-Modified'))
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    """GET /<route> (see UPSTREAMS) and GET /stats"""
+
+    server_version = "DisasterUpstreamProxy/1.0"
+    cache = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_GET(self):
+        route = urlsplit(self.path).path.strip('/')
+        if route == 'stats':
+            body = json.dumps(dict(self.cache.stats, routes=sorted(self.cache.upstreams))).encode('utf-8')
+            return self._send(200, body, {'Content-Type': 'application/json'})
+        try:
+            entry, stale = self.cache.get(route)
+        except KeyError:
+            return self._send(404, b'unknown route', {'Content-Type': 'text/plain'})
+        except requests.RequestException as e:
+            return self._send(502, str(e).encode('utf-8'), {'Content-Type': 'text/plain'})
+
+        ttl = self.cache.upstreams[route][1]
+        max_age = max(0, int(ttl - (time.time() - entry.fetched_at)))
+        headers = {'ETag': entry.etag, 'Cache-Control': f'max-age={max_age}', 'Vary': 'Accept-Encoding'}
+        if stale:
+            headers['Warning'] = '110 - "Response is Stale"'
+        if entry.etag in [t.strip() for t in self.headers.get('If-None-Match', '').split(',')]:
+            return self._send(304, headers=headers)
+
+        encoding = choose_encoding(self.headers.get('Accept-Encoding'))
+        headers['Content-Type'] = entry.content_type
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        self._send(200, entry.encoded[encoding], headers)
+
+    do_HEAD = do_GET
+
+
+def make_server(cache, host='127.0.0.1', port=DEFAULT_PORT):
+    handler = type('BoundProxyHandler', (ProxyHandler,), {'cache': cache})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def stand_in_upstreams(base_url, upstreams=UPSTREAMS):
+    """Point every route at base_url/<route> (e.g. a local test server), keeping the TTLs"""
+    base_url = base_url.rstrip('/')
+    return {route: (f"{base_url}/{route}", ttl) for route, (_, ttl) in upstreams.items()}
+
+
+def feed_url(route):
+    """URL the fetch scripts should use: through the proxy if $DISASTER_PROXY_URL is set"""
+    proxy = os.environ.get(PROXY_ENV)
+    if proxy:
+        return f"{proxy.rstrip('/')}/{route}"
+    return UPSTREAMS[route][0]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Caching proxy for the NOAA / USGS / FIRMS feeds")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--stand-in", help="serve every route from BASE_URL/<route> instead")
+    parser.add_argument("--upstream", action="append", default=[], metavar="ROUTE=URL",
+                        help="override one upstream URL")
+    args = parser.parse_args()
+
+    upstreams = stand_in_upstreams(args.stand_in) if args.stand_in else dict(UPSTREAMS)
+    for override in args.upstream:
+        route, url = override.split("=", 1)
+        upstreams[route] = (url, upstreams.get(route, (None, 60))[1])
+
+    server = make_server(UpstreamCache(upstreams), args.host, args.port)
+    print(f"🛰️ Upstream proxy on http://{args.host}:{args.port}/ ({', '.join(sorted(upstreams))})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Upstream proxy stopped")
+    finally:
+        server.server_close()